@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Pipeline Benchmarks
+Times each stage of the refresh-to-GeoJSON pipeline against generated fixtures:
+CompStat sheets served by a local mock HTTP server, a grid of synthetic ZIP and
+precinct polygons, and a synthetic crime table. Every stage is run at several
+scale-ups (1x = one sheet per precinct, one feature per ZIP code) and the results
+are saved as JSON and compared against a baseline run to flag regressions.
+
+    python src/helper/benchmark_pipeline.py                      # run, save results
+    python src/helper/benchmark_pipeline.py --save-baseline      # run, save as the new baseline
+    python src/helper/benchmark_pipeline.py --scales 1 10 100 1000
+"""
+
+import io
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from precinct_data_mapping import PRECINCT_IDS, ZIP_CODES, BOROUGHS, NEIGHBORHOODS, \
+    PRECINCT_BOROUGH_CODE, PRECINCT_NEIGHBORHOOD_CODE
+from precinct_neighborhood_mapper import download_and_convert_precinct, extract_crime_stats
+from precinct_downloader import create_session
+from crime_cache import BREAKDOWN_COLUMNS
+from safety_scoring import score_frame
+from spatial_join import build_weights
+from geojson_remapper import load_zip_geojson, map_crime_to_zipcodes, save_enriched_geojson
+
+# The sheet fixtures and stand-in server are shared with the test suite
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+from tests.fixtures import MockSheetServer, make_sheet
+
+RESULTS_FILE = './benchmarks/results.json'
+BASELINE_FILE = './benchmarks/baseline.json'
+
+SCALES = (1, 10, 100)
+REPEAT = 3
+# A stage is a regression when its best time is this much slower than the baseline's
+REGRESSION_TOLERANCE = 0.25
+# Sheets are fetched one request each, so downloads stop scaling here
+MAX_DOWNLOAD_SCALE = 10
+
+# Synthetic polygons: NYC-ish bounding box, edges densified to look like real boundaries
+FIXTURE_BOUNDS = (-74.26, 40.49, -73.70, 40.92)
+VERTICES_PER_EDGE = 8
+SEED = 20240101
+
+
+# --- Fixtures ---
+
+def grid_polygons(n, bounds=FIXTURE_BOUNDS):
+    """n square polygons tiling `bounds`, each edge densified to VERTICES_PER_EDGE points"""
+    columns = int(np.ceil(np.sqrt(n)))
+    rows = int(np.ceil(n / columns))
+    minx, miny, maxx, maxy = bounds
+    width, height = (maxx - minx) / columns, (maxy - miny) / rows
+    steps = np.linspace(0, 1, VERTICES_PER_EDGE, endpoint=False)
+
+    polygons = []
+    for i in range(n):
+        x0 = minx + (i % columns) * width
+        y0 = miny + (i // columns) * height
+        ring = np.vstack([
+            np.column_stack([x0 + steps * width, np.full_like(steps, y0)]),
+            np.column_stack([np.full_like(steps, x0 + width), y0 + steps * height]),
+            np.column_stack([x0 + width - steps * width, np.full_like(steps, y0 + height)]),
+            np.column_stack([np.full_like(steps, x0), y0 + height - steps * height]),
+        ])
+        ring = np.vstack([ring, ring[:1]])
+        polygons.append({'type': 'Polygon', 'coordinates': [ring.tolist()]})
+    return polygons
+
+
+def write_feature_collection(path, geometries, properties):
+    features = [{'type': 'Feature', 'properties': props, 'geometry': geometry}
+                for geometry, props in zip(geometries, properties)]
+    with open(path, 'w') as f:
+        json.dump({'type': 'FeatureCollection', 'features': features}, f)
+
+
+def make_zip_geojson(path, scale):
+    """ZIP polygons: every known ZIP code, repeated `scale` times"""
+    n = len(ZIP_CODES) * scale
+    zip_codes = np.tile(ZIP_CODES, scale).tolist()
+    write_feature_collection(path, grid_polygons(n), [{'postalCode': code} for code in zip_codes])
+    return n
+
+
+def make_precinct_geojson(path):
+    write_feature_collection(path, grid_polygons(len(PRECINCT_IDS)),
+                             [{'precinct': str(p)} for p in PRECINCT_IDS.tolist()])
+
+
+def make_crime_df(scale, rng):
+    """Consolidated crime table with random counts; scale-ups add precincts with new ids"""
+    n = len(PRECINCT_IDS) * scale
+    base = np.arange(n) % len(PRECINCT_IDS)
+    precincts = PRECINCT_IDS[base] + 1000 * (np.arange(n) // len(PRECINCT_IDS))
+    breakdowns = rng.integers(0, 30, size=(n, len(BREAKDOWN_COLUMNS)))
+
+    df = pd.DataFrame({
+        'precinct': precincts,
+        'borough': np.array(BOROUGHS)[PRECINCT_BOROUGH_CODE[base]],
+        'neighborhoods': np.array(NEIGHBORHOODS)[PRECINCT_NEIGHBORHOOD_CODE[base]],
+        'crimeCount': breakdowns.sum(axis=1) + rng.integers(0, 20, n),
+        'monthToDate': rng.integers(0, 400, n),
+        'yearToDate': rng.integers(0, 4000, n),
+    })
+    df[BREAKDOWN_COLUMNS] = breakdowns
+    return score_frame(df)
+
+
+# --- Timing ---
+
+def time_stage(fn, repeat=REPEAT, setup=None):
+    """Best / median wall time of fn() over `repeat` runs. Returns (timings, last result)"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        gc.collect()
+        start = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - start)
+    return {'best': min(times), 'median': statistics.median(times), 'runs': times}, result
+
+
+def quiet(fn):
+    """Run a pipeline function with its progress prints suppressed"""
+    def run(*args, **kwargs):
+        stdout, sys.stdout = sys.stdout, io.StringIO()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sys.stdout = stdout
+    return run
+
+
+def bench_scale(scale, workdir, repeat, rng):
+    """Run every stage at one scale-up. Returns {stage: timings + item count}"""
+    results = {}
+    workdir = Path(workdir)
+
+    def record(stage, items, timing):
+        results[stage] = {**timing, 'items': items, 'perItem': timing['best'] / max(items, 1)}
+        print(f"  {stage:<24} {timing['best'] * 1000:10.2f} ms  ({items} items)")
+
+    # Download + parse through the mock server, then stat extraction on the parsed sheets
+    if scale <= MAX_DOWNLOAD_SCALE:
+        precincts = list(range(1, len(PRECINCT_IDS) * scale + 1))
+        templates = [make_sheet(rng) for _ in range(8)]
+        sheets = {f"cs-en-us-{p:03d}pct.xlsx": templates[p % len(templates)] for p in precincts}
+        # Raw bytes go to a throwaway cache so runs never touch (or slow down on) the real one
+        with MockSheetServer(sheets) as server, tempfile.TemporaryDirectory() as raw_cache_dir:
+            session = create_session()
+            raw_index = {}
+            timing, frames = time_stage(quiet(lambda: [
+                download_and_convert_precinct(p, session, server.url_template,
+                                              raw_cache_dir=raw_cache_dir, raw_index=raw_index)
+                for p in precincts
+            ]), repeat)
+            session.close()
+        record('download_and_convert', len(precincts), timing)
+
+        timing, _ = time_stage(quiet(lambda: [extract_crime_stats(df) for df in frames]), repeat)
+        record('extract_crime_stats', len(frames), timing)
+
+    crime_df = make_crime_df(scale, rng)
+    timing, _ = time_stage(lambda: score_frame(crime_df), repeat)
+    record('scoring', len(crime_df), timing)
+
+    # Geometry stages: scaled ZIP layer over the fixed precinct grid, mapped with the real 1x crime table
+    zip_file, precinct_file = workdir / f'zips_{scale}x.geojson', workdir / 'precincts.geojson'
+    n_zips = make_zip_geojson(zip_file, scale)
+    if not precinct_file.exists():
+        make_precinct_geojson(precinct_file)
+    base_df = make_crime_df(1, rng)
+
+    timing, geojson = time_stage(quiet(lambda: load_zip_geojson(zip_file)), repeat)
+    record('load_zip_geojson', n_zips, timing)
+
+    timing, weights = time_stage(quiet(lambda: build_weights(zip_file, precinct_file)), repeat)
+    record('spatial_join', n_zips, timing)
+
+    timing, _ = time_stage(quiet(lambda: map_crime_to_zipcodes(base_df, geojson, weights)), repeat)
+    record('map_crime_to_zipcodes', n_zips, timing)
+
+    output = workdir / f'enriched_{scale}x.geojson'
+    timing, _ = time_stage(quiet(lambda: save_enriched_geojson(geojson, output)), repeat)
+    record('save_enriched_geojson', n_zips, timing)
+
+    for path in workdir.glob(f'*_{scale}x.geojson*'):
+        path.unlink()
+    return results
+
+
+def run_benchmarks(scales=SCALES, repeat=REPEAT, seed=SEED):
+    rng = np.random.default_rng(seed)
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'scales': {}
+    }
+    with tempfile.TemporaryDirectory(prefix='nyc-bench-') as workdir:
+        for scale in scales:
+            print(f"\n{scale}x")
+            results['scales'][f'{scale}x'] = bench_scale(scale, workdir, repeat, rng)
+    return results
+
+
+# --- Baseline comparison ---
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Stages (at scales present in both runs) whose best time grew by more than `tolerance`"""
+    regressions = []
+    for scale, stages in results['scales'].items():
+        for stage, timing in stages.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(stage)
+            if previous is None:
+                continue
+            ratio = timing['best'] / previous['best'] if previous['best'] > 0 else 1.0
+            if ratio > 1 + tolerance:
+                regressions.append({'scale': scale, 'stage': stage, 'baseline': previous['best'],
+                                    'current': timing['best'], 'ratio': ratio})
+    return regressions
+
+
+def save_json(data, path):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the refresh-to-GeoJSON pipeline")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(SCALES))
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--output', default=RESULTS_FILE)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE)
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.scales, args.repeat)
+    save_json(results, args.output)
+    print(f"\n✓ Saved results to {args.output}")
+
+    if args.save_baseline:
+        save_json(results, args.baseline)
+        print(f"✓ Saved baseline to {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print(f"No baseline at {args.baseline} (run with --save-baseline to create one)")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if not regressions:
+        print(f"✓ No regressions against {args.baseline}")
+        return 0
+    for r in regressions:
+        print(f"✗ {r['stage']} @ {r['scale']}: {r['baseline'] * 1000:.2f} ms -> {r['current'] * 1000:.2f} ms "
+              f"({r['ratio']:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
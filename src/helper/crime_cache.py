@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Columnar Crime Data Cache
+Typed binary cache for the consolidated precinct table. Each precinct is one fixed-width
+record and the crime breakdown is stored as one integer column per crime type, so loading
+is a memory map instead of a CSV parse plus a json.loads per row.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+CACHE_FILE = './public/crime_data_cache.npy'
+# Old JSON-in-CSV cache, only read by the one-time migration
+LEGACY_CSV_CACHE = './public/crime_data_cache.csv'
+
+# Crime types stored as breakdown columns (same order as the precinct sheets)
+BREAKDOWN_COLUMNS = [
+    'Murder',
+    'Rape',
+    'Robbery',
+    'Felony Assault',
+    'Burglary',
+    'Grand Larceny',
+    'Grand Larceny Auto'
+]
+
+# Explicit on-disk schema
+CACHE_DTYPE = np.dtype(
+    [
+        ('precinct', '<i4'),
+        ('borough', '<U16'),
+        ('neighborhoods', '<U64'),
+        ('crimeCount', '<i8'),
+        ('monthToDate', '<i8'),
+        ('yearToDate', '<i8'),
+    ]
+    + [(crime, '<i8') for crime in BREAKDOWN_COLUMNS]
+    + [
+        ('weightedCrimeVal', '<f8'),
+        ('safetyScore', '<f8'),
+    ]
+)
+
+
+def breakdown_matrix(df):
+    """Return the (precincts x crime types) count matrix from breakdown columns or crimeBreakdown dicts"""
+    if all(crime in df.columns for crime in BREAKDOWN_COLUMNS):
+        return df[BREAKDOWN_COLUMNS].to_numpy(dtype=np.int64)
+
+    breakdowns = [b if isinstance(b, dict) else {} for b in df['crimeBreakdown']]
+    return np.array([[b.get(crime, 0) for crime in BREAKDOWN_COLUMNS] for b in breakdowns],
+                    dtype=np.int64).reshape(len(breakdowns), len(BREAKDOWN_COLUMNS))
+
+
+def to_records(df):
+    """Convert a consolidated DataFrame to a CACHE_DTYPE record array"""
+    records = np.zeros(len(df), dtype=CACHE_DTYPE)
+    for name in CACHE_DTYPE.names:
+        if name in BREAKDOWN_COLUMNS:
+            continue
+        if name in df.columns:
+            records[name] = df[name].to_numpy()
+
+    # crimeBreakdown dicts (fresh downloads) win over stale breakdown columns
+    if 'crimeBreakdown' in df.columns:
+        matrix = breakdown_matrix(df.drop(columns=BREAKDOWN_COLUMNS, errors='ignore'))
+    else:
+        matrix = breakdown_matrix(df)
+    for i, crime in enumerate(BREAKDOWN_COLUMNS):
+        records[crime] = matrix[:, i]
+    return records
+
+
+def save_cache(df, cache_file=CACHE_FILE):
+    """Write the consolidated DataFrame to the binary cache (atomically, so readers never see a partial file)"""
+    tmp_file = f"{cache_file}.tmp.npy"
+    np.save(tmp_file, to_records(df), allow_pickle=False)
+    os.replace(tmp_file, cache_file)
+
+
+def load_cache_records(cache_file=CACHE_FILE):
+    """Memory-map the cache as a read-only record array (zero-copy)"""
+    return np.load(cache_file, mmap_mode='r', allow_pickle=False)
+
+
+def load_cache(cache_file=CACHE_FILE):
+    """Load the cache as a DataFrame with breakdown columns and crimeBreakdown dicts"""
+    records = load_cache_records(cache_file)
+    df = pd.DataFrame({name: np.asarray(records[name]) for name in CACHE_DTYPE.names})
+
+    # Keep the dict column downstream consumers expect, built in one pass
+    df['crimeBreakdown'] = df[BREAKDOWN_COLUMNS].to_dict('records')
+    return df
+
+
+def migrate_csv_cache(csv_file=LEGACY_CSV_CACHE, cache_file=CACHE_FILE):
+    """One-time migration of the old JSON-in-CSV cache to the binary cache"""
+    df = pd.read_csv(csv_file)
+    df['crimeBreakdown'] = df['crimeBreakdown'].apply(
+        lambda x: json.loads(x) if isinstance(x, str) else x
+    )
+    save_cache(df, cache_file)
+    print(f"✓ Migrated {len(df)} precincts from {csv_file} to {cache_file}")
+
+
+def ensure_cache(cache_file=CACHE_FILE, csv_file=LEGACY_CSV_CACHE):
+    """Make sure the binary cache exists, migrating the legacy CSV if needed. Returns True if available"""
+    if Path(cache_file).exists():
+        return True
+    if Path(csv_file).exists():
+        migrate_csv_cache(csv_file, cache_file)
+        return True
+    return False
+
+
+if __name__ == "__main__":
+    migrate_csv_cache()
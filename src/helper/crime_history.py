@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Historical Crime Snapshot Store
+Append-only weekly snapshots of the consolidated precinct table, partitioned by ISO week.
+Each partition is a memory-mappable .npy file sorted by precinct, and rolling aggregates
+are kept up to date incrementally as each new week arrives.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from crime_cache import BREAKDOWN_COLUMNS, to_records
+
+HISTORY_DIR = './data/crime_history'
+ROLLING_STATE_FILE = 'rolling_state.npz'
+
+# Metrics tracked over time
+METRIC_COLUMNS = ['crimeCount', 'monthToDate', 'yearToDate'] + BREAKDOWN_COLUMNS + ['weightedCrimeVal']
+
+# Rolling windows (in recorded weeks) maintained on every append
+ROLLING_WINDOWS = (4, 13, 52)
+
+
+def week_key(date=None):
+    """ISO week key used as the partition name, e.g. '2026-W03'"""
+    year, week, _ = (date or datetime.now()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def partition_path(week, history_dir=HISTORY_DIR):
+    return Path(history_dir) / f"week={week}.npy"
+
+
+def list_weeks(history_dir=HISTORY_DIR):
+    """All recorded weeks in chronological order"""
+    if not Path(history_dir).exists():
+        return []
+    return sorted(p.stem.split('=', 1)[1] for p in Path(history_dir).glob('week=*.npy'))
+
+
+def load_week(week, history_dir=HISTORY_DIR):
+    """Memory-map one weekly partition (records sorted by precinct)"""
+    return np.load(partition_path(week, history_dir), mmap_mode='r', allow_pickle=False)
+
+
+def metric_matrix(records):
+    """(rows x METRIC_COLUMNS) float matrix for a record array"""
+    return np.column_stack([np.asarray(records[name], dtype=float) for name in METRIC_COLUMNS])
+
+
+def weeks_in_range(start_week=None, end_week=None, history_dir=HISTORY_DIR):
+    return [w for w in list_weeks(history_dir)
+            if (start_week is None or w >= start_week) and (end_week is None or w <= end_week)]
+
+
+# --- Rolling aggregates ---
+
+def empty_rolling_state():
+    return {window: {'weeks': [], 'sums': {}, 'counts': {}} for window in ROLLING_WINDOWS}
+
+
+def load_rolling_state(history_dir=HISTORY_DIR):
+    """Load rolling sums; keyed by window -> weeks in window, per-precinct sums and counts"""
+    state_file = Path(history_dir) / ROLLING_STATE_FILE
+    if not state_file.exists():
+        return None
+
+    data = np.load(state_file, allow_pickle=False)
+    state = {}
+    for window in ROLLING_WINDOWS:
+        if f'weeks_{window}' not in data:
+            return None  # Window added since the state was written, rebuild
+        precincts = data[f'precincts_{window}']
+        sums = data[f'sums_{window}']
+        counts = data[f'counts_{window}']
+        state[window] = {
+            'weeks': [str(w) for w in data[f'weeks_{window}']],
+            'sums': {int(p): sums[i] for i, p in enumerate(precincts)},
+            'counts': {int(p): int(counts[i]) for i, p in enumerate(precincts)}
+        }
+    return state
+
+
+def save_rolling_state(state, history_dir=HISTORY_DIR):
+    arrays = {}
+    for window, entry in state.items():
+        precincts = sorted(entry['sums'])
+        arrays[f'weeks_{window}'] = np.array(entry['weeks'], dtype='<U8')
+        arrays[f'precincts_{window}'] = np.array(precincts, dtype=np.int32)
+        arrays[f'sums_{window}'] = np.array([entry['sums'][p] for p in precincts],
+                                            dtype=float).reshape(len(precincts), len(METRIC_COLUMNS))
+        arrays[f'counts_{window}'] = np.array([entry['counts'][p] for p in precincts], dtype=np.int64)
+
+    state_file = Path(history_dir) / ROLLING_STATE_FILE
+    tmp_file = state_file.with_name(f".tmp-{state_file.name}")
+    np.savez(tmp_file, **arrays)
+    os.replace(tmp_file, state_file)
+
+
+def apply_week(entry, records, sign):
+    """Add (sign=1) or remove (sign=-1) one week's values from a window's running sums"""
+    values = metric_matrix(records)
+    for i, precinct in enumerate(records['precinct']):
+        precinct = int(precinct)
+        entry['sums'][precinct] = entry['sums'].get(precinct, np.zeros(len(METRIC_COLUMNS))) + sign * values[i]
+        entry['counts'][precinct] = entry['counts'].get(precinct, 0) + sign
+        if entry['counts'][precinct] == 0:
+            del entry['sums'][precinct], entry['counts'][precinct]
+
+
+def rebuild_rolling_state(history_dir=HISTORY_DIR):
+    """Recompute rolling sums from the partitions (when the state file is missing or behind them)"""
+    state = empty_rolling_state()
+    weeks = list_weeks(history_dir)
+    for window, entry in state.items():
+        entry['weeks'] = weeks[-window:]
+        for week in entry['weeks']:
+            apply_week(entry, load_week(week, history_dir), 1)
+    save_rolling_state(state, history_dir)
+    return state
+
+
+def covers(state, weeks):
+    """Whether every window holds exactly the latest of `weeks` (not so after a crash between a
+    partition write and the state save, which leaves the state a week or more behind)"""
+    return state is not None and all(entry['weeks'] == weeks[-window:] for window, entry in state.items())
+
+
+def current_rolling_state(history_dir=HISTORY_DIR):
+    """Rolling state for every recorded week, rebuilt from the partitions if it fell behind"""
+    state = load_rolling_state(history_dir)
+    return state if covers(state, list_weeks(history_dir)) else rebuild_rolling_state(history_dir)
+
+
+def update_rolling_state(week, records, history_dir=HISTORY_DIR):
+    """Slide every window forward by one week: add the new week, subtract the one falling out"""
+    state = load_rolling_state(history_dir)
+    if not covers(state, [w for w in list_weeks(history_dir) if w != week]):
+        return rebuild_rolling_state(history_dir)
+
+    for window, entry in state.items():
+        apply_week(entry, records, 1)
+        entry['weeks'].append(week)
+        while len(entry['weeks']) > window:
+            apply_week(entry, load_week(entry['weeks'].pop(0), history_dir), -1)
+
+    save_rolling_state(state, history_dir)
+    return state
+
+
+# --- Writes ---
+
+def append_snapshot(df, date=None, history_dir=HISTORY_DIR):
+    """
+    Record the consolidated table as this week's snapshot.
+    Partitions are write-once: a week that is already recorded is left untouched.
+    """
+    week = week_key(date)
+    path = partition_path(week, history_dir)
+    if path.exists():
+        current_rolling_state(history_dir)  # Catch up if the last append died before saving it
+        print(f"✓ History already has week {week}")
+        return False
+
+    if list_weeks(history_dir) and week < list_weeks(history_dir)[-1]:
+        print(f"✗ Week {week} is older than the latest snapshot, not appending")
+        return False
+
+    Path(history_dir).mkdir(parents=True, exist_ok=True)
+    records = np.sort(to_records(df), order='precinct')
+
+    tmp_file = path.with_name(f".tmp-{path.name}")
+    np.save(tmp_file, records, allow_pickle=False)
+    os.replace(tmp_file, path)
+
+    update_rolling_state(week, records, history_dir)
+    print(f"✓ Appended week {week} to history ({len(records)} precincts)")
+    return True
+
+
+# --- Queries ---
+
+def precinct_trend(precinct, weeks=52, end_week=None, history_dir=HISTORY_DIR):
+    """Time series for one precinct over the last `weeks` recorded weeks (one row per week)"""
+    selected = weeks_in_range(end_week=end_week, history_dir=history_dir)[-weeks:]
+    rows = []
+    for week in selected:
+        records = load_week(week, history_dir)
+        i = np.searchsorted(records['precinct'], precinct)
+        if i < len(records) and records['precinct'][i] == precinct:
+            rows.append([week] + [records[name][i] for name in METRIC_COLUMNS + ['safetyScore']])
+
+    return pd.DataFrame(rows, columns=['week'] + METRIC_COLUMNS + ['safetyScore']).set_index('week')
+
+
+def rolling_aggregates(window=ROLLING_WINDOWS[0], history_dir=HISTORY_DIR):
+    """Per-precinct mean of each metric over the last `window` recorded weeks"""
+    entry = current_rolling_state(history_dir)[window]
+    precincts = sorted(entry['sums'])
+
+    means = np.array([entry['sums'][p] / entry['counts'][p] for p in precincts]).reshape(len(precincts), -1)
+    df = pd.DataFrame(means, columns=METRIC_COLUMNS)
+    df.insert(0, 'precinct', precincts)
+    df['weeks'] = [entry['counts'][p] for p in precincts]
+    return df
+
+
+def week_over_week(week=None, history_dir=HISTORY_DIR):
+    """Change in each metric between a week (default: latest) and the week recorded before it"""
+    weeks = list_weeks(history_dir)
+    week = week or (weeks[-1] if weeks else None)
+    if week not in weeks or weeks.index(week) == 0:
+        return pd.DataFrame(columns=['precinct'] + METRIC_COLUMNS)
+
+    current = load_week(week, history_dir)
+    previous = load_week(weeks[weeks.index(week) - 1], history_dir)
+
+    # Only precincts present in both weeks
+    common, cur_idx, prev_idx = np.intersect1d(current['precinct'], previous['precinct'], return_indices=True)
+    deltas = metric_matrix(current)[cur_idx] - metric_matrix(previous)[prev_idx]
+
+    df = pd.DataFrame(deltas, columns=METRIC_COLUMNS)
+    df.insert(0, 'precinct', common)
+    return df
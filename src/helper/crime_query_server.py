@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+NYC Crime Query Server
+Small read-only asyncio HTTP service over the consolidated crime cache. Data is held in
+memory with lookup indexes, responses are kept in an LRU cache with ETags, and the
+service reloads itself when the cache file changes on disk.
+
+Endpoints:
+    GET /precinct/<id>
+    GET /zip/<zipcode>
+    GET /borough/<name>
+    GET /ranking?top=<n>&order=safest|least_safe&profile=<scoring profile>
+    GET /point?lat=<lat>&lon=<lon>
+    GET /health
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs, unquote
+from precinct_data_mapping import BOROUGH_TO_PRECINCTS, PRECINCT_TO_ZIPS, zip_precincts
+from crime_cache import CACHE_FILE, BREAKDOWN_COLUMNS, breakdown_matrix, ensure_cache, load_cache
+from safety_scoring import get_safety_label, safety_ranks, score_profiles
+from point_lookup import PointLookup
+
+HOST = '127.0.0.1'
+PORT = 8787
+LRU_SIZE = 1024
+RELOAD_INTERVAL = 1.0  # seconds between cache file mtime checks
+MAX_DISCARD = 64 * 1024  # largest request body skipped to keep a connection open (no endpoint reads one)
+
+STATUS_TEXT = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               500: 'Internal Server Error'}
+
+
+class CrimeIndex:
+    """In-memory, indexed snapshot of the crime cache"""
+    def __init__(self, df):
+        df = df.copy()
+        df['safetyRank'] = safety_ranks(df['weightedCrimeVal'])
+        df['safetyLabel'] = df['safetyScore'].apply(get_safety_label)
+
+        records = df[['precinct', 'borough', 'neighborhoods', 'crimeCount', 'monthToDate', 'yearToDate',
+                      'weightedCrimeVal', 'safetyScore', 'safetyRank', 'safetyLabel']].to_dict('records')
+        breakdowns = breakdown_matrix(df).tolist()
+        for record, counts in zip(records, breakdowns):
+            record['crimeBreakdown'] = dict(zip(BREAKDOWN_COLUMNS, counts))
+            record['zips'] = list(PRECINCT_TO_ZIPS.get(int(record['precinct']), ()))
+
+        self.by_precinct = {int(r['precinct']): r for r in records}
+        self.by_borough = {
+            borough.lower(): [self.by_precinct[p] for p in precincts if p in self.by_precinct]
+            for borough, precincts in BOROUGH_TO_PRECINCTS.items()
+        }
+        self.ranking = sorted(records, key=lambda r: (r['safetyRank'], r['precinct']))
+
+        # Same ranking under each named scoring profile
+        names, values, scores, ranks = score_profiles(breakdowns)
+        self.profile_rankings = {}
+        for i, name in enumerate(names):
+            ranked = [
+                {'precinct': r['precinct'], 'borough': r['borough'], 'neighborhoods': r['neighborhoods'],
+                 'weightedCrimeVal': float(values[row, i]), 'safetyScore': float(scores[row, i]),
+                 'safetyRank': int(ranks[row, i]), 'safetyLabel': get_safety_label(scores[row, i])}
+                for row, r in enumerate(records)
+            ]
+            self.profile_rankings[name] = sorted(ranked, key=lambda r: (r['safetyRank'], r['precinct']))
+
+    def precinct(self, precinct):
+        return self.by_precinct.get(precinct)
+
+    def zip_code(self, zip_code):
+        record = self.by_precinct.get(int(zip_precincts([zip_code])[0]))
+        if record is None:
+            return None
+        return {'zip': zip_code, **record}
+
+    def borough(self, name):
+        records = self.by_borough.get(name.lower())
+        if not records:
+            return None
+        ranked = sorted(records, key=lambda r: r['safetyRank'])
+        return {
+            'borough': records[0]['borough'],
+            'precincts': len(records),
+            'crimeCount': sum(r['crimeCount'] for r in records),
+            'monthToDate': sum(r['monthToDate'] for r in records),
+            'yearToDate': sum(r['yearToDate'] for r in records),
+            'crimeBreakdown': {c: sum(r['crimeBreakdown'][c] for r in records) for c in BREAKDOWN_COLUMNS},
+            'meanSafetyScore': sum(r['safetyScore'] for r in records) / len(records),
+            'safestPrecinct': ranked[0]['precinct'],
+            'leastSafePrecinct': ranked[-1]['precinct']
+        }
+
+    def top(self, n, order='safest', profile=None):
+        ranking = self.ranking if profile is None else self.profile_rankings[profile]
+        if order != 'safest':
+            ranking = ranking[::-1]
+        return ranking[:n]
+
+
+class CrimeQueryServer:
+    def __init__(self, cache_file=CACHE_FILE, host=HOST, port=PORT, lru_size=LRU_SIZE):
+        self.cache_file = cache_file
+        self.host = host
+        self.port = port
+        self.lru_size = lru_size
+        self.responses = OrderedDict()  # request target -> (status, etag, body)
+        self.index = None
+        self.mtime = None
+        self.points = None  # PointLookup over the boundary files (static, built once)
+
+    # --- Data ---
+
+    def build(self):
+        """Read the cache file into a fresh (index, mtime). Touches no server state, so it can run off the loop"""
+        if not ensure_cache(self.cache_file):
+            raise FileNotFoundError(self.cache_file)
+        mtime = os.stat(self.cache_file).st_mtime_ns
+        return CrimeIndex(load_cache(self.cache_file)), mtime
+
+    def install(self, index, mtime):
+        """Swap in a built index and drop every cached response (on the event loop thread)"""
+        self.index, self.mtime = index, mtime
+        self.responses.clear()
+        print(f"✓ Loaded {len(index.by_precinct)} precincts from {self.cache_file}")
+
+    def load(self):
+        """Load the cache file (and the boundary files for /point) before serving"""
+        self.install(*self.build())
+        
+        if self.points is None:
+            try:
+                self.points = PointLookup()
+            except FileNotFoundError as e:
+                print(f"✗ Point lookup unavailable: {e}")
+
+    async def watch(self):
+        """Hot reload: poll the cache file and swap in a fresh index when it changes"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(RELOAD_INTERVAL)
+            try:
+                if os.stat(self.cache_file).st_mtime_ns != self.mtime:
+                    # Parse and index in a worker thread; the swap and LRU clear happen here, on the loop
+                    index, mtime = await loop.run_in_executor(None, self.build)
+                    self.install(index, mtime)
+            except (OSError, ValueError) as e:
+                print(f"✗ Reload failed: {e}")
+
+    # --- Routing ---
+
+    def route(self, target):
+        """Resolve a request target to (status, payload)"""
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = parse_qs(url.query)
+        index = self.index
+
+        if parts == ['health']:
+            return 200, {'status': 'ok', 'precincts': len(index.by_precinct)}
+
+        if len(parts) == 2 and parts[0] == 'precinct':
+            if not parts[1].isdecimal():
+                return 400, {'error': 'precinct must be a number'}
+            record = index.precinct(int(parts[1]))
+            return (200, record) if record else (404, {'error': f'precinct {parts[1]} not found'})
+
+        if len(parts) == 2 and parts[0] == 'zip':
+            record = index.zip_code(parts[1])
+            return (200, record) if record else (404, {'error': f'zip {parts[1]} not found'})
+
+        if len(parts) == 2 and parts[0] == 'borough':
+            rollup = index.borough(parts[1])
+            return (200, rollup) if rollup else (404, {'error': f'borough {parts[1]} not found'})
+
+        if parts == ['ranking']:
+            try:
+                top = int(query.get('top', ['10'])[0])
+            except ValueError:
+                return 400, {'error': 'top must be a number'}
+            order = query.get('order', ['safest'])[0]
+            if order not in ('safest', 'least_safe'):
+                return 400, {'error': 'order must be safest or least_safe'}
+            profile = query.get('profile', [None])[0]
+            if profile is not None and profile not in index.profile_rankings:
+                return 400, {'error': f"profile must be one of {', '.join(index.profile_rankings)}"}
+            payload = {'order': order, 'precincts': index.top(max(top, 0), order, profile)}
+            if profile is not None:
+                payload['profile'] = profile
+            return 200, payload
+
+        if parts == ['point']:
+            try:
+                lat, lon = float(query['lat'][0]), float(query['lon'][0])
+            except (KeyError, ValueError):
+                return 400, {'error': 'lat and lon must be numbers'}
+            if self.points is None:
+                return 404, {'error': 'point lookup unavailable'}
+            precincts, zips = self.points.locate([lat], [lon])
+            record = index.precinct(int(precincts[0]))
+            if record is None and not zips[0]:
+                return 404, {'error': f'no precinct or ZIP at {lat},{lon}'}
+            return 200, {'lat': lat, 'lon': lon, 'zip': str(zips[0]) or None, **(record or {'precinct': None})}
+
+        return 404, {'error': 'not found'}
+
+    def respond(self, target):
+        """Cached (status, etag, body) for a request target"""
+        cached = self.responses.get(target)
+        if cached is not None:
+            self.responses.move_to_end(target)
+            return cached
+
+        status, payload = self.route(target)
+        body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        cached = (status, etag, body)
+
+        self.responses[target] = cached
+        if len(self.responses) > self.lru_size:
+            self.responses.popitem(last=False)
+        return cached
+
+    # --- HTTP ---
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                # Skip any request body (a POST to a read-only endpoint) so the next request on the
+                # connection starts where it should; bodies we can't size or won't read end the connection
+                length = headers.get('content-length', '0')
+                if 'transfer-encoding' in headers or not length.isdigit() or int(length) > MAX_DISCARD:
+                    keep_alive = False
+                elif keep_alive and int(length):
+                    await reader.readexactly(int(length))
+
+                if method not in ('GET', 'HEAD'):
+                    status, etag, body = 405, None, b'{"error":"method not allowed"}'
+                else:
+                    try:
+                        status, etag, body = self.respond(target)
+                    except Exception as e:
+                        print(f"✗ {target}: {type(e).__name__}: {e}")
+                        status, etag, body = 500, None, b'{"error":"internal server error"}'
+                    if status == 200 and headers.get('if-none-match') == etag:
+                        status, body = 304, b''
+
+                response_headers = [
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                    "Content-Type: application/json",
+                    f"Content-Length: {len(body)}",
+                    "Cache-Control: no-cache",
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}",
+                ]
+                if etag:
+                    response_headers.append(f"ETag: {etag}")
+                if status == 405:
+                    response_headers.append("Allow: GET, HEAD")
+                writer.write(('\r\n'.join(response_headers) + '\r\n\r\n').encode('latin-1'))
+                if method != 'HEAD':
+                    writer.write(body)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        self.load()
+        server = await asyncio.start_server(self.handle, self.host, self.port)
+        watcher = asyncio.create_task(self.watch())
+        print(f"✓ Serving crime data on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+if __name__ == "__main__":
+    asyncio.run(CrimeQueryServer().serve())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Batch Consolidation
+Runs several sheet sources (dataset specs) through shared workers in one pass: one download
+pool with a single connection cap and rate limit across every source, one parse process pool,
+then a vectorized scoring pass per dataset written to that dataset's binary cache. Adding a
+source means adding a spec (JSON, see dataset_spec.py), not another copy of the scripts.
+
+    python src/helper/dataset_batch.py [--dataset NAME ...] [--spec-file FILE ...]
+                                       [--max-workers N] [--rate R] [--parse-workers N]
+"""
+
+import sys
+import argparse
+import pandas as pd
+from pathlib import Path
+from crime_cache import save_cache
+from safety_scoring import score_frame
+from pipeline_metrics import PipelineMetrics
+from precinct_downloader import MAX_WORKERS, REQUESTS_PER_SECOND
+from precinct_neighborhood_mapper import NYPD_PRECINCTS, fetch_sheets, parse_sheets
+from dataset_spec import load_specs
+import raw_cache
+
+# Built-in datasets (more can be passed as spec files)
+DATASETS = {NYPD_PRECINCTS.name: NYPD_PRECINCTS}
+
+
+def resolve_specs(names=(), spec_files=()):
+    """Specs for the named built-in datasets plus every spec file (NYPD precincts if none given)"""
+    unknown = [name for name in names if name not in DATASETS]
+    if unknown:
+        raise ValueError(f"Unknown datasets: {', '.join(unknown)} (known: {', '.join(DATASETS)})")
+    specs = [DATASETS[name] for name in names]
+    for spec_file in spec_files:
+        specs += load_specs(spec_file)
+    specs = specs or [NYPD_PRECINCTS]
+
+    names = [spec.name for spec in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate dataset names: {', '.join(sorted({n for n in names if names.count(n) > 1}))}")
+    caches = [spec.cache_file for spec in specs]
+    if len(set(caches)) != len(caches):
+        raise ValueError("Two datasets write the same cache file")
+    # Sheets are keyed by URL through download and parse, so each belongs to one dataset
+    urls = [url for spec in specs for url in spec.urls()]
+    if len(set(urls)) != len(urls):
+        raise ValueError("Two datasets share sheet URLs")
+    return specs
+
+
+def run_batch(specs, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, parse_workers=None,
+              raw_cache_dir=raw_cache.RAW_CACHE_DIR, metrics=None):
+    """
+    Download, parse and score every spec. max_workers / rate / parse_workers are global limits
+    (shared by all datasets), not per dataset. Returns {dataset name: scored DataFrame}.
+    """
+    metrics = metrics or PipelineMetrics.from_env('batch')
+    print("=" * 70 + f"\nBATCH CONSOLIDATION ({', '.join(spec.name for spec in specs)})\n" + "=" * 70)
+
+    with metrics.stage('download'):
+        sheets = fetch_sheets(specs, max_workers, rate, raw_cache_dir, metrics)
+    with metrics.stage('parse'):
+        parsed = parse_sheets(sheets, None, specs, raw_cache_dir, parse_workers, metrics)
+
+    frames = {}
+    with metrics.stage('score'):
+        for spec in specs:
+            rows = [parsed[url]['row'] for url in spec.urls() if url in parsed]
+            if not rows:
+                print(f"✗ {spec.name}: no sheets could be parsed")
+                continue
+            df = pd.DataFrame(rows)
+            score_frame(df)
+            Path(spec.cache_file).parent.mkdir(parents=True, exist_ok=True)
+            save_cache(df, spec.cache_file)
+            frames[spec.name] = df
+            metrics.count(f'rows_{spec.name}', len(df))
+            print(f"✓ {spec.name}: {len(df)}/{len(spec.units)} units scored to {spec.cache_file}")
+
+    metrics.flush()
+    print(metrics.summary())
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consolidate several crime sheet sources with shared workers")
+    parser.add_argument('--dataset', action='append', default=[], help=f"built-in dataset ({', '.join(DATASETS)})")
+    parser.add_argument('--spec-file', action='append', default=[], help="JSON dataset spec(s)")
+    parser.add_argument('--max-workers', type=int, default=MAX_WORKERS, help="concurrent downloads, all datasets")
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="requests per second, all datasets")
+    parser.add_argument('--parse-workers', type=int, default=None, help="parse processes, all datasets")
+    args = parser.parse_args()
+
+    specs = resolve_specs(args.dataset, args.spec_file)
+    frames = run_batch(specs, args.max_workers, args.rate, args.parse_workers)
+    return 0 if len(frames) == len(specs) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
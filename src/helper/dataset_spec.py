@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Dataset Specs
+Describes one family of CompStat-style sheets: the URL each unit's sheet is downloaded from,
+where the counts sit in the sheet, and the list of units. The NYPD precinct spec is built from
+the constants in precinct_neighborhood_mapper; other sources (transit districts, housing bureau
+PSAs, another city's sheets) are described in JSON and run through the same download, parse
+and score workers by dataset_batch.py:
+
+    {
+      "name": "nypd_transit",
+      "url_template": "https://.../cs-en-us-td{unit}.xlsx",
+      "unit_digits": 2,
+      "units": [{"Precinct": "1", "Borough": "Manhattan", "Neighborhoods": "Transit District 1"}, ...],
+      "layout": {"crime_types": {"Murder": 13, ...}, "crime_row_start": 13, "crime_row_end": 33,
+                 "stat_columns": [2, 5, 8]}
+    }
+"""
+
+import json
+import numpy as np
+from crime_cache import BREAKDOWN_COLUMNS
+
+# Fields every unit carries (same shape as PRECINCT_DATA)
+UNIT_FIELDS = ('Precinct', 'Borough', 'Neighborhoods')
+# Scored caches of specs that don't name one (generated data, kept out of public/)
+SPEC_CACHE_DIR = './.cache'
+
+
+class SheetLayout:
+    """Where the counts sit in a sheet (0-based row / column indices, as the sheet is read)"""
+    def __init__(self, crime_types, crime_row_start, crime_row_end, stat_columns, sheet_rows=None, sheet_cols=None):
+        self.crime_types = dict(crime_types)     # crime type -> row holding its counts
+        self.crime_row_start = crime_row_start   # totals are summed over rows [start, end)
+        self.crime_row_end = crime_row_end
+        self.stat_columns = list(stat_columns)   # week to date, 28 day, year to date
+        self.sheet_rows = sheet_rows or crime_row_end
+        self.sheet_cols = sheet_cols or max(self.stat_columns) + 1
+        self.breakdown_rows = np.array(list(self.crime_types.values()))
+        self.validate()
+
+    def validate(self):
+        if set(self.crime_types) != set(BREAKDOWN_COLUMNS):
+            raise ValueError(f"Layout crime types must be exactly {BREAKDOWN_COLUMNS} (the cache and scoring schema)")
+        if len(self.stat_columns) != 3:
+            raise ValueError("Layout needs three stat columns: week to date, 28 day, year to date")
+        if not 0 <= self.crime_row_start < self.crime_row_end <= self.sheet_rows:
+            raise ValueError(f"Crime rows {self.crime_row_start}-{self.crime_row_end} do not fit in {self.sheet_rows} rows")
+        outside = [crime for crime, row in self.crime_types.items()
+                   if not self.crime_row_start <= row < self.crime_row_end]
+        if outside:
+            raise ValueError(f"Crime type rows outside the crime block: {', '.join(outside)}")
+        if min(self.stat_columns) < 0 or max(self.stat_columns) >= self.sheet_cols:
+            raise ValueError(f"Stat columns {self.stat_columns} do not fit in {self.sheet_cols} columns")
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['crime_types'], data['crime_row_start'], data['crime_row_end'], data['stat_columns'],
+                   data.get('sheet_rows'), data.get('sheet_cols'))
+
+
+class DatasetSpec:
+    """A sheet source: URL template, sheet layout and unit list, plus the cache its rows are scored into"""
+    def __init__(self, name, url_template, units, layout, unit_digits=3, cache_file=None):
+        self.name = name
+        self.url_template = url_template   # '{unit}' (or '{precinct}') is the zero-padded unit id
+        self.units = list(units)
+        self.layout = layout
+        self.unit_digits = unit_digits
+        self.cache_file = cache_file or f'{SPEC_CACHE_DIR}/{name}_cache.npy'
+        self.validate()
+
+    def validate(self):
+        if '{unit}' not in self.url_template and '{precinct}' not in self.url_template:
+            raise ValueError(f"{self.name}: URL template has no {{unit}} placeholder")
+        ids = [unit.get('Precinct') for unit in self.units]
+        if not ids:
+            raise ValueError(f"{self.name}: no units")
+        missing = [i for i, unit in enumerate(self.units) if any(field not in unit for field in UNIT_FIELDS)]
+        if missing:
+            raise ValueError(f"{self.name}: units {missing[:5]} need {', '.join(UNIT_FIELDS)}")
+        if len(set(ids)) != len(ids):
+            raise ValueError(f"{self.name}: duplicate unit ids")
+
+    def unit_code(self, unit_id):
+        """Zero-padded id as it appears in the sheet URL"""
+        return str(int(unit_id)).zfill(self.unit_digits)
+
+    def url(self, unit_id):
+        code = self.unit_code(unit_id)
+        return self.url_template.format(unit=code, precinct=code)
+
+    def urls(self):
+        """Sheet URL of every unit, in unit order"""
+        return [self.url(unit['Precinct']) for unit in self.units]
+
+    def with_url_template(self, url_template):
+        """The same dataset downloaded from another host (a mirror, or a stand-in server in tests)"""
+        return DatasetSpec(self.name, url_template, self.units, self.layout, self.unit_digits, self.cache_file)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['name'], data['url_template'], data['units'], SheetLayout.from_dict(data['layout']),
+                   data.get('unit_digits', 3), data.get('cache_file'))
+
+    def __repr__(self):
+        return f"DatasetSpec({self.name}, {len(self.units)} units)"
+
+
+def load_specs(path):
+    """Specs from a JSON file holding one spec object or a list of them"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [DatasetSpec.from_dict(item) for item in (data if isinstance(data, list) else [data])]
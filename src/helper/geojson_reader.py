@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Streaming GeoJSON Reader
+Iterates over a FeatureCollection one feature at a time with JSONDecoder.raw_decode over
+a sliding text buffer, so memory is bounded by the largest feature rather than the file.
+Polygon geometries can be packed into contiguous float64 coordinate arrays with ring /
+polygon offsets (about 16 bytes per point instead of ~100+ for nested lists of floats).
+"""
+
+import json
+import numpy as np
+import shapely
+from shapely.geometry import shape
+from itertools import chain
+from collections.abc import Mapping
+
+# Text read per refill (1 MiB); grows geometrically while a single feature doesn't fit.
+# Smaller chunks mean more partial decodes of features that straddle a refill
+CHUNK_SIZE = 1 << 20
+
+WHITESPACE = ' \t\n\r'
+
+
+class StreamReader:
+    """Sliding-window JSON tokenizer over a text file"""
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Drop consumed text and read more. Returns False at end of file"""
+        if self.eof:
+            return False
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        chunk = self.f.read(max(self.chunk_size, len(self.buf)))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Next non-whitespace character (not consumed)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of GeoJSON")
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed GeoJSON: expected {char!r}, found {found!r}")
+        self.pos += 1
+
+    def decode(self, decoder):
+        """Decode the next complete JSON value, reading more text until it fits"""
+        while True:
+            self.peek()
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and not isinstance(value, (dict, list, str)):
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_features(path, packed=False, chunk_size=CHUNK_SIZE):
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time.
+    With packed=True, Polygon / MultiPolygon geometries come back as PackedGeometry.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = StreamReader(f, chunk_size)
+        reader.expect('{')
+        while True:
+            char = reader.peek()
+            if char == '}':
+                return
+            if char == ',':
+                reader.pos += 1
+                continue
+
+            key = reader.decode(decoder)
+            reader.expect(':')
+            if key != 'features':
+                reader.decode(decoder)  # type, crs, bbox, ... are not needed
+                continue
+
+            reader.expect('[')
+            while True:
+                char = reader.peek()
+                if char == ']':
+                    reader.pos += 1
+                    break
+                if char == ',':
+                    reader.pos += 1
+                    continue
+                feature = reader.decode(decoder)
+                if packed:
+                    feature['geometry'] = pack_geometry(feature.get('geometry'))
+                yield feature
+
+
+def read_feature_collection(path, packed=True, chunk_size=CHUNK_SIZE):
+    """Whole FeatureCollection built from the streaming reader (packed coordinates by default)"""
+    return {'type': 'FeatureCollection', 'features': list(iter_features(path, packed, chunk_size))}
+
+
+# --- Packed geometry ---
+
+class PackedGeometry(Mapping):
+    """
+    Polygon / MultiPolygon with coordinates in one (points x dims) float64 array.
+    Rings are coords[ring_offsets[i]:ring_offsets[i + 1]] and polygon j owns rings
+    polygon_offsets[j]:polygon_offsets[j + 1] (the layout shapely.from_ragged_array takes).
+    Behaves as a read-only GeoJSON geometry dict; 'coordinates' is rebuilt on access.
+    """
+    __slots__ = ('type', 'coords', 'ring_offsets', 'polygon_offsets')
+
+    def __init__(self, geometry_type, coords, ring_offsets, polygon_offsets):
+        self.type = geometry_type
+        self.coords = coords
+        self.ring_offsets = ring_offsets
+        self.polygon_offsets = polygon_offsets
+
+    def rings(self):
+        """Ring arrays (views into coords), grouped per polygon"""
+        rings = [self.coords[a:b] for a, b in zip(self.ring_offsets[:-1], self.ring_offsets[1:])]
+        return [rings[a:b] for a, b in zip(self.polygon_offsets[:-1], self.polygon_offsets[1:])]
+
+    def map_rings(self, fn):
+        """GeoJSON coordinates with fn applied to every ring array"""
+        polygons = [[fn(ring) for ring in polygon] for polygon in self.rings()]
+        return polygons[0] if self.type == 'Polygon' else polygons
+
+    def to_geojson(self):
+        return {'type': self.type, 'coordinates': self.map_rings(np.ndarray.tolist)}
+
+    def to_shapely(self):
+        if self.type == 'Polygon':
+            return shapely.from_ragged_array(shapely.GeometryType.POLYGON, self.coords,
+                                             (self.ring_offsets, np.array([0, len(self.ring_offsets) - 1])))[0]
+        return shapely.from_ragged_array(shapely.GeometryType.MULTIPOLYGON, self.coords,
+                                         (self.ring_offsets, self.polygon_offsets,
+                                          np.array([0, len(self.polygon_offsets) - 1])))[0]
+
+    @property
+    def nbytes(self):
+        return self.coords.nbytes + self.ring_offsets.nbytes + self.polygon_offsets.nbytes
+
+    @property
+    def __geo_interface__(self):
+        return self.to_geojson()
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.type
+        if key == 'coordinates':
+            return self.map_rings(np.ndarray.tolist)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(('type', 'coordinates'))
+
+    def __len__(self):
+        return 2
+
+    def __repr__(self):
+        return f"PackedGeometry({self.type}, {len(self.coords)} points, {len(self.ring_offsets) - 1} rings)"
+
+
+def pack_geometry(geometry):
+    """Pack a Polygon / MultiPolygon dict; anything else (or mixed dimensions) is returned as is"""
+    if not geometry or geometry.get('type') not in ('Polygon', 'MultiPolygon'):
+        return geometry
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    rings = [ring for polygon in polygons for ring in polygon]
+    if not rings or any(not ring for ring in rings):
+        return geometry
+
+    dims = len(rings[0][0])
+    n_points = sum(len(ring) for ring in rings)
+    coords = np.fromiter(chain.from_iterable(chain.from_iterable(rings)), dtype=np.float64)
+    if len(coords) != n_points * dims:
+        return geometry  # Mixed 2D / 3D positions
+    coords = coords.reshape(n_points, dims)
+    ring_offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    np.cumsum([len(ring) for ring in rings], out=ring_offsets[1:])
+    polygon_offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum([len(polygon) for polygon in polygons], out=polygon_offsets[1:])
+    return PackedGeometry(geometry['type'], coords, ring_offsets, polygon_offsets)
+
+
+def to_shapely(geometry):
+    """Shapely geometry for a packed or plain GeoJSON geometry"""
+    if isinstance(geometry, PackedGeometry):
+        return geometry.to_shapely()
+    return shape(geometry)
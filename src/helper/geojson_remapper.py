@@ -2,124 +2,287 @@
 """
 Map NYC Crime Data to ZIP Codes
 Takes consolidated crime data and maps it to ZIP code GeoJSON for 3D visualization.
+
+    python src/helper/geojson_remapper.py            # GeoJSON, TopoJSON, split layers and tiles
+    python src/helper/geojson_remapper.py --stream   # GeoJSON only, never holding the ZIP layer in memory
 """
 
-import json
-import pandas as pd
+import argparse
 import numpy as np
-import random
 from pathlib import Path
-from precinct_data_mapping import zip_to_precinct
+from precinct_data_mapping import zip_precincts
+from crime_cache import CACHE_FILE, BREAKDOWN_COLUMNS, breakdown_matrix, ensure_cache, load_cache
+from spatial_join import PRECINCT_GEOJSON, ZIP_GEOJSON, load_zip_precinct_weights, zip_shares
+from geojson_reader import iter_features, read_feature_collection
+from geojson_writer import COORDINATE_PRECISION, write_features, write_geojson, write_topojson, write_split_layers
+from tile_pyramid import TILES_DIR, build_tile_pyramid
+from sparse_aggregation import column_index, covered_rows, dominant_columns, sparse_matmul
+from safety_scoring import get_safety_label
+from pipeline_metrics import PipelineMetrics
 
-# File paths
-CRIME_CACHE = './public/crime_data_cache.csv'
-ZIP_GEOJSON = './public/nyc-zip-code-tabulation-areas-polygons.geojson'
+# File paths (inputs are defined by the modules that own them: crime_cache, spatial_join)
+CRIME_CACHE = CACHE_FILE
 OUTPUT_GEOJSON = './public/nyc_zipcodes_with_crime.geojson'
+OUTPUT_TOPOJSON = './public/nyc_zipcodes_with_crime.topojson'
+# Split output: immutable zip_geometry.<hash>.geojson + per-refresh zip_attributes.json
+OUTPUT_DIR = './public'
+SPLIT_LAYER_NAME = 'zip'
+# Everything export_layers writes (the split geometry file name carries its content hash)
+EXPORT_OUTPUTS = [OUTPUT_GEOJSON, OUTPUT_TOPOJSON, f'{OUTPUT_DIR}/{SPLIT_LAYER_NAME}_layers.json', TILES_DIR]
 
-class NYCDataEncoder(json.JSONEncoder):
-    """Custom encoder to handle Pandas/Numpy types for JSON export"""
-    def default(self, obj):
-        if isinstance(obj, (np.int64, np.int32, np.integer)):
-            return int(obj)
-        if isinstance(obj, (np.float64, np.float32, np.floating)):
-            return float(obj)
-        if isinstance(obj, (np.ndarray,)):
-            return obj.tolist()
-        return super(NYCDataEncoder, self).default(obj)
+# Precinct metrics carried onto ZIPs; count fields are rounded back to whole numbers
+COUNT_FIELDS = ['crimeCount', 'monthToDate', 'yearToDate']
+METRIC_FIELDS = ['weightedCrimeVal', 'safetyScore'] + COUNT_FIELDS
+# Properties that change with every refresh (everything else on a ZIP feature is static)
+ATTRIBUTE_FIELDS = ['neighborhood', 'precinct'] + METRIC_FIELDS + ['safetyLabel', 'crimeBreakdown', 'precinctShares']
 
 def load_crime_data():
     """Load consolidated crime data from cache"""
-    if not Path(CRIME_CACHE).exists():
+    if not ensure_cache(CRIME_CACHE):
         print(f"Error: {CRIME_CACHE} not found!")
         return None
     
-    df = pd.read_csv(CRIME_CACHE)
-    
-    if 'crimeBreakdown' in df.columns:
-        df['crimeBreakdown'] = df['crimeBreakdown'].apply(
-            lambda x: json.loads(x) if isinstance(x, str) else x
-        )
+    df = load_cache(CRIME_CACHE)
     
     print(f"✓ Loaded {len(df)} precincts from {CRIME_CACHE}")
     return df
 
-def load_zip_geojson():
+def load_zip_geojson(zip_geojson=ZIP_GEOJSON):
     """Load ZIP code GeoJSON"""
-    if not Path(ZIP_GEOJSON).exists():
-        print(f"Error: {ZIP_GEOJSON} not found!")
+    if not Path(zip_geojson).exists():
+        print(f"Error: {zip_geojson} not found!")
         return None
     
-    with open(ZIP_GEOJSON, 'r') as f:
-        geojson = json.load(f)
+    # Streamed feature by feature, with coordinates packed into float64 arrays
+    geojson = read_feature_collection(zip_geojson)
     
-    print(f"✓ Loaded {len(geojson['features'])} ZIP codes from {ZIP_GEOJSON}")
+    print(f"✓ Loaded {len(geojson['features'])} ZIP codes from {zip_geojson}")
     return geojson
 
-def get_safety_label(score):
-    if score > 0.8: return "Very Safe"
-    if score > 0.6: return "Safe"
-    if score > 0.4: return "Moderate"
-    if score > 0.2: return "High Crime"
-    return "Extreme Alert"
+def precinct_metric_matrix(crime_df):
+    """Dense (precincts x METRIC_FIELDS + breakdown) matrix, rows sorted by precinct id"""
+    crime_df = crime_df.sort_values('precinct')
+    metrics = np.hstack([
+        crime_df[METRIC_FIELDS].to_numpy(dtype=float),
+        breakdown_matrix(crime_df).astype(float)
+    ])
+    return crime_df['precinct'].to_numpy(dtype=np.int64), metrics, crime_df['neighborhoods'].tolist()
 
-def map_crime_to_zipcodes(crime_df, zip_geojson):
-    """Map crime data to ZIP codes using a precise ZIP-to-Precinct Bridge"""
+def zip_assignment(zip_codes, precinct_ids, weights=None):
+    """
+    Sparse ZIP x precinct weight matrix as COO arrays (rows, cols, values, spatial_rows).
+    Rows covered by the spatial join get area shares; the rest fall back to the
+    ZIP-to-Precinct Bridge with weight 1.
+    """
+    n_zips = len(zip_codes)
+    rows = np.zeros(0, dtype=np.int64)
+    cols = np.zeros(0, dtype=np.int64)
+    values = np.zeros(0)
     
-    # Create a lookup: Precinct ID -> Data Row
-    precinct_lookup = crime_df.set_index('precinct').to_dict('index')
+    if weights is not None and len(weights['zip_codes']) != n_zips:
+        print("✗ Spatial weights do not match the ZIP GeoJSON, using ZIP lookup only")
+        weights = None
+    
+    if weights is not None:
+        rows, share_precincts, values = zip_shares(weights, precinct_ids)
+        cols = column_index(precinct_ids, share_precincts)
+    spatial_rows = covered_rows(rows, n_zips)
+    
+    # ZIP-to-Precinct Bridge for everything the spatial join did not cover
+    lookup_cols = column_index(precinct_ids, zip_precincts(zip_codes))
+    lookup_rows = np.flatnonzero(~spatial_rows & (lookup_cols >= 0))
+    
+    rows = np.concatenate([rows, lookup_rows]).astype(np.int64)
+    cols = np.concatenate([cols, lookup_cols[lookup_rows]]).astype(np.int64)
+    values = np.concatenate([values, np.ones(len(lookup_rows))])
+    return rows, cols, values, spatial_rows
 
-    random.seed(42) 
-    enriched_count = 0
+def zip_codes_of(features):
+    return [str(f['properties'].get('postalCode', '')) for f in features]
+
+def map_crime_to_zipcodes(crime_df, zip_geojson, weights=None):
+    """
+    Map crime data to ZIP codes. With spatial `weights` each ZIP gets the area-weighted
+    blend of every precinct it overlaps; otherwise (or for ZIPs outside every precinct)
+    the precise ZIP-to-Precinct Bridge is used.
+    """
+    features = zip_geojson['features']
+    enrich = zip_enricher(crime_df, zip_codes_of(features), weights)
+    for i, feature in enumerate(features):
+        enrich(i, feature['properties'])
+    return zip_geojson
+
+def zip_enricher(crime_df, zip_codes, weights=None):
+    """
+    Compute every ZIP's metrics up front and return enrich(i, props), which writes
+    ZIP i's values onto its feature properties. Only the small per-ZIP metric arrays
+    are held, so features can be enriched as they stream past.
+    """
+    n_zips = len(zip_codes)
     
-    for feature in zip_geojson['features']:
-        props = feature['properties']
-        zip_code = str(props.get('postalCode', ''))
-        
-        target_precinct = zip_to_precinct.get(zip_code)
-        
-        if target_precinct and target_precinct in precinct_lookup:
-            data = precinct_lookup[target_precinct]
-            
-            props['neighborhood'] = data['neighborhoods'] 
-            props['precinct'] = target_precinct
-            props['weightedCrimeVal'] = data['weightedCrimeVal']
-            props['crimeCount'] = data['crimeCount']
-            props['safetyScore'] = data['safetyScore']
-            props['monthToDate'] = data['monthToDate']
-            props['yearToDate'] = data['yearToDate']
-            props['crimeBreakdown'] = data['crimeBreakdown']
-            
-            enriched_count += 1
+    # 1. Precinct metrics as a dense matrix, ZIP mapping as a sparse weight matrix
+    precinct_ids, metrics, neighborhoods = precinct_metric_matrix(crime_df)
+    rows, cols, values, spatial_rows = zip_assignment(zip_codes, precinct_ids, weights)
+    
+    # 2. Every ZIP metric from one product
+    zip_metrics = sparse_matmul(rows, cols, values, metrics, n_zips)
+    dominant = dominant_columns(rows, cols, values, n_zips)
+    
+    blended_count = int((np.bincount(rows, minlength=n_zips) > 1).sum())
+    print(f"✓ Mapped {int((dominant >= 0).sum())} ZIP codes to Precincts successfully ({blended_count} span several precincts).")
+    
+    # 3. Batched conversion to native Python values, so per-feature writeback is plain dict work
+    return zip_property_writer(zip_metrics, dominant, precinct_ids, neighborhoods,
+                               rows, cols, values, spatial_rows, crime_df['weightedCrimeVal'].mean())
+
+def zip_property_writer(zip_metrics, dominant, precinct_ids, neighborhoods,
+                        rows, cols, values, spatial_rows, fallback_weighted_val):
+    """Writer for the aggregated ZIP metrics: enrich(i, props) fills in ZIP i's properties"""
+    n_metrics = len(METRIC_FIELDS)
+    weighted_vals = zip_metrics[:, 0].tolist()
+    safety_scores = zip_metrics[:, 1].tolist()
+    counts = np.rint(zip_metrics[:, 2:n_metrics]).astype(np.int64).tolist()
+    breakdowns = np.rint(zip_metrics[:, n_metrics:]).astype(np.int64).tolist()
+    dominant_ids = np.where(dominant >= 0, precinct_ids[dominant], -1).tolist()
+    
+    # Per-ZIP precinct shares for the area-weighted rows
+    shares = {}
+    spatial = spatial_rows[rows]
+    for row, col, value in zip(rows[spatial].tolist(), cols[spatial].tolist(), values[spatial].tolist()):
+        shares.setdefault(row, {})[str(precinct_ids[col])] = round(value, 4)
+    
+    def enrich(i, props):
+        if dominant_ids[i] >= 0:
+            props['neighborhood'] = neighborhoods[dominant[i]]
+            props['precinct'] = dominant_ids[i]
+            props['weightedCrimeVal'] = weighted_vals[i]
+            props['safetyScore'] = safety_scores[i]
+            props.update(zip(COUNT_FIELDS, counts[i]))
+            props['crimeBreakdown'] = dict(zip(BREAKDOWN_COLUMNS, breakdowns[i]))
+            if i in shares:
+                props['precinctShares'] = shares[i]
         else:
             props['neighborhood'] = props.get('PO_NAME', 'NYC Area')
             props['safetyScore'] = 0.5
-            props['weightedCrimeVal'] = crime_df['weightedCrimeVal'].mean()
+            props['weightedCrimeVal'] = fallback_weighted_val
             props['crimeCount'] = 0
             props['crimeBreakdown'] = {}
+        
+        props['safetyLabel'] = get_safety_label(props['safetyScore'])
+    return enrich
 
-        props['safetyLabel'] = get_safety_label(props.get('safetyScore', 0.5))
-            
-    print(f"✓ Mapped {enriched_count} ZIP codes to Precincts successfully.")
-    return zip_geojson
+def stream_enriched_geojson(crime_df, zip_geojson=ZIP_GEOJSON, output_file=OUTPUT_GEOJSON, weights=None,
+                            precision=COORDINATE_PRECISION):
+    """
+    Enrich-and-write without holding the collection: one streaming pass collects the
+    ZIP codes, a second enriches each feature and hands it straight to the writer.
+    Memory stays flat in the number of features (for tract / block sized boundary sets).
+    """
+    zip_codes = zip_codes_of(iter_features(zip_geojson))
+    enrich = zip_enricher(crime_df, zip_codes, weights)
+    
+    def enriched():
+        for i, feature in enumerate(iter_features(zip_geojson, packed=True)):
+            enrich(i, feature['properties'])
+            yield feature
+    
+    count = write_features(enriched(), output_file, precision)
+    print(f"✓ Streamed {count} enriched features to: {output_file}")
+    return count
 
-def save_enriched_geojson(geojson, output_file):
-    with open(output_file, 'w') as f:
-        json.dump(geojson, f, indent=2, cls=NYCDataEncoder)
+def save_enriched_geojson(geojson, output_file, precision=COORDINATE_PRECISION, topojson_file=None):
+    """Stream the enriched GeoJSON compactly with rounded coordinates, plus .gz/.br siblings"""
+    write_geojson(geojson, output_file, precision)
     print(f"✓ Saved enriched GeoJSON to: {output_file}")
+    
+    if topojson_file:
+        arc_count = write_topojson(geojson, topojson_file)
+        print(f"✓ Saved TopoJSON ({arc_count} shared arcs) to: {topojson_file}")
+
+def save_split_layers(geojson, output_dir=OUTPUT_DIR, precision=COORDINATE_PRECISION):
+    """Save static ZIP geometry (content-hashed) and the per-refresh crime attributes separately"""
+    manifest = write_split_layers(geojson, output_dir, SPLIT_LAYER_NAME, ATTRIBUTE_FIELDS,
+                                  BREAKDOWN_COLUMNS, precision)
+    print(f"✓ Saved split layers: {manifest['geometry']} + {manifest['attributes']}")
+
+def precinct_features(crime_df, precinct_geojson=PRECINCT_GEOJSON):
+    """Precinct polygons carrying that precinct's crime metrics (for the tile pyramid)"""
+    features = iter_features(precinct_geojson, packed=True)
+    
+    precinct_lookup = crime_df.set_index('precinct').to_dict('index')
+    enriched = []
+    for feature in features:
+        precinct = int(float(feature['properties']['precinct']))
+        data = precinct_lookup.get(precinct)
+        if data is None:
+            continue
+        props = {'precinct': precinct, 'borough': data['borough'], 'neighborhood': data['neighborhoods']}
+        props.update({field: data[field] for field in METRIC_FIELDS})
+        props['safetyLabel'] = get_safety_label(data['safetyScore'])
+        props['crimeBreakdown'] = data['crimeBreakdown']
+        enriched.append({'type': 'Feature', 'properties': props, 'geometry': feature['geometry']})
+    return enriched
+
+def export_layers(crime_df, zip_geojson, weights=None, metrics=None):
+    """Export stage: enrich the ZIPs, then write the GeoJSON, TopoJSON, split layers and vector tiles"""
+    metrics = metrics or PipelineMetrics('export')
+    with metrics.stage('map'):
+        enriched_geojson = map_crime_to_zipcodes(crime_df, zip_geojson, weights)
+    with metrics.stage('write_geojson'):
+        save_enriched_geojson(enriched_geojson, OUTPUT_GEOJSON, topojson_file=OUTPUT_TOPOJSON)
+    with metrics.stage('write_split_layers'):
+        save_split_layers(enriched_geojson)
+    for output in (OUTPUT_GEOJSON, OUTPUT_TOPOJSON):
+        metrics.count('bytes_written', Path(output).stat().st_size)
+    
+    # Vector tile pyramid of the enriched layers
+    with metrics.stage('tiles'):
+        tile_layers = {'zipcodes': enriched_geojson['features']}
+        if Path(PRECINCT_GEOJSON).exists():
+            tile_layers['precincts'] = precinct_features(crime_df)
+        metrics.count('tiles', build_tile_pyramid(tile_layers))
 
 def main():
+    parser = argparse.ArgumentParser(description="Map the crime cache onto the ZIP code layer")
+    parser.add_argument('--stream', action='store_true',
+                        help="write only the enriched GeoJSON, streaming features instead of loading the "
+                             "ZIP layer (for boundary sets too large to hold in memory)")
+    args = parser.parse_args()
+    
     print("="*70 + "\nNYC CRIME TO ZIP CODE MAPPER\n" + "="*70)
+    metrics = PipelineMetrics.from_env('geojson')
     
-    crime_df = load_crime_data()
-    if crime_df is None: return
+    with metrics.stage('load'):
+        crime_df = load_crime_data()
+        if crime_df is None: return
+        
+        zip_geojson = None
+        if not args.stream:
+            zip_geojson = load_zip_geojson()
+            if zip_geojson is None: return
+        elif not Path(ZIP_GEOJSON).exists():
+            print(f"Error: {ZIP_GEOJSON} not found!")
+            return
+    metrics.count('precincts', len(crime_df))
     
-    zip_geojson = load_zip_geojson()
-    if zip_geojson is None: return
+    # Area-overlap weights from the precinct boundaries (cached until either file changes)
+    weights = None
+    if Path(PRECINCT_GEOJSON).exists():
+        with metrics.stage('spatial_join'):
+            weights = load_zip_precinct_weights(ZIP_GEOJSON, PRECINCT_GEOJSON)
     
-    enriched_geojson = map_crime_to_zipcodes(crime_df, zip_geojson)
-    save_enriched_geojson(enriched_geojson, OUTPUT_GEOJSON)
+    if args.stream:
+        # TopoJSON, split layers and tiles need every feature at once, so only the GeoJSON is written
+        with metrics.stage('stream_geojson'):
+            metrics.count('zip_features', stream_enriched_geojson(crime_df, ZIP_GEOJSON, OUTPUT_GEOJSON, weights))
+        metrics.count('bytes_written', Path(OUTPUT_GEOJSON).stat().st_size)
+    else:
+        metrics.count('zip_features', len(zip_geojson['features']))
+        export_layers(crime_df, zip_geojson, weights, metrics)
     
+    metrics.flush()
+    print(metrics.summary())
     print("\n✓ Processing Complete. Run 'npm run dev' to visualize.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,352 @@
+#!/usr/bin/env python3
+"""
+Compact GeoJSON / TopoJSON Writer
+Streams features one at a time with compact separators and rounded coordinates,
+writing pre-compressed gzip (and brotli, when installed) siblings in the same pass.
+Can also emit TopoJSON, where borders shared by neighbouring polygons are stored once.
+"""
+
+import os
+import gzip
+import json
+import hashlib
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+from geojson_reader import PackedGeometry
+
+try:
+    import brotli
+except ImportError:  # Optional: only needed for .br siblings
+    brotli = None
+
+# 5 decimal places is ~1.1 m at NYC's latitude, well below what the 3D view can show
+COORDINATE_PRECISION = 5
+# TopoJSON grid resolution per axis
+TOPOJSON_QUANTIZATION = 100000
+
+COMPACT_SEPARATORS = (',', ':')
+
+
+def to_native(obj):
+    """json `default` hook for NumPy scalars/arrays and packed geometries that slipped through"""
+    if isinstance(obj, PackedGeometry):
+        return obj.to_geojson()
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def round_ring(ring, precision):
+    """Round a ring's coordinates and drop consecutive points that collapse onto each other"""
+    points = np.round(np.asarray(ring, dtype=float), precision)
+    if len(points) > 1:
+        keep = np.r_[True, np.any(points[1:] != points[:-1], axis=1)]
+        if keep.sum() >= 4:  # A closed ring needs at least 4 positions
+            points = points[keep]
+    return points.tolist()
+
+
+def round_coordinates(coordinates, precision):
+    """Round nested coordinate lists (Point, LineString, Polygon, Multi*) to `precision` decimals"""
+    if not coordinates:
+        return coordinates
+    if isinstance(coordinates[0], (int, float)):
+        return [round(c, precision) for c in coordinates]
+    if isinstance(coordinates[0][0], (int, float)):
+        return round_ring(coordinates, precision)
+    return [round_coordinates(part, precision) for part in coordinates]
+
+
+def quantize_feature(feature, precision):
+    """Shallow copy of a feature with rounded coordinates (input is left untouched)"""
+    geometry = feature.get('geometry')
+    if isinstance(geometry, PackedGeometry):
+        return {**feature, 'geometry': {'type': geometry.type,
+                                        'coordinates': geometry.map_rings(lambda ring: round_ring(ring, precision))}}
+    if not geometry or 'coordinates' not in geometry:
+        return feature
+    return {**feature, 'geometry': {**geometry, 'coordinates': round_coordinates(geometry['coordinates'], precision)}}
+
+
+class CompressedTee:
+    """File-like sink that writes the same text to the plain file and its compressed siblings"""
+    def __init__(self, output_file, compress=('gzip',)):
+        self.files = [open(output_file, 'wb')]
+        self.brotli_file = None
+        self.brotli_compressor = None
+
+        if 'gzip' in compress:
+            self.files.append(gzip.open(f"{output_file}.gz", 'wb', compresslevel=9))
+        if 'brotli' in compress and brotli is not None:
+            self.brotli_file = open(f"{output_file}.br", 'wb')
+            self.brotli_compressor = brotli.Compressor(quality=11)
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        for f in self.files:
+            f.write(data)
+        if self.brotli_compressor is not None:
+            self.brotli_file.write(self.brotli_compressor.process(data))
+
+    def close(self):
+        for f in self.files:
+            f.close()
+        if self.brotli_compressor is not None:
+            self.brotli_file.write(self.brotli_compressor.finish())
+            self.brotli_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_features(features, output_file, precision=COORDINATE_PRECISION, compress=('gzip', 'brotli')):
+    """
+    Stream an iterable of features to a compact FeatureCollection.
+    Only one feature is serialized at a time, so `features` can be a generator.
+    Returns the number of features written.
+    """
+    count = 0
+    with CompressedTee(output_file, compress) as out:
+        out.write('{"type":"FeatureCollection","features":[')
+        for feature in features:
+            if precision is not None:
+                feature = quantize_feature(feature, precision)
+            out.write((',' if count else '') + json.dumps(feature, separators=COMPACT_SEPARATORS, default=to_native))
+            count += 1
+        out.write(']}')
+    return count
+
+
+def write_geojson(geojson, output_file, precision=COORDINATE_PRECISION, compress=('gzip', 'brotli')):
+    """Write a FeatureCollection compactly (see write_features)"""
+    return write_features(geojson['features'], output_file, precision, compress)
+
+
+# --- Split geometry / attributes ---
+
+def write_compressed_siblings(output_file, data, compress=('gzip', 'brotli')):
+    """Write .gz / .br siblings for bytes that are already serialized"""
+    if 'gzip' in compress:
+        with gzip.open(f"{output_file}.gz", 'wb', compresslevel=9) as f:
+            f.write(data)
+    if 'brotli' in compress and brotli is not None:
+        with open(f"{output_file}.br", 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def geometry_features(features, attribute_fields):
+    """Features stripped of per-refresh attributes, tagged with a stable integer id"""
+    for i, feature in enumerate(features):
+        props = {k: v for k, v in feature.get('properties', {}).items() if k not in attribute_fields}
+        yield {'type': 'Feature', 'id': i, 'properties': props, 'geometry': feature.get('geometry')}
+
+
+def attribute_table(features, attribute_fields, breakdown_fields=()):
+    """Columnar attribute payload: one array per field, aligned with the geometry feature ids"""
+    columns = {}
+    for field in attribute_fields:
+        if field in ('crimeBreakdown', 'precinctShares'):
+            continue
+        values = [feature['properties'].get(field) for feature in features]
+        columns[field] = [round(v, 4) if isinstance(v, float) else v for v in values]
+
+    # Breakdown as one integer column per crime type instead of a dict per feature
+    breakdowns = [feature['properties'].get('crimeBreakdown') or {} for feature in features]
+    for crime in breakdown_fields:
+        columns[crime] = [b.get(crime) for b in breakdowns]
+
+    table = {
+        'ids': list(range(len(features))),
+        'columns': columns,
+        'breakdownFields': list(breakdown_fields)
+    }
+    if 'precinctShares' in attribute_fields:
+        table['precinctShares'] = {
+            i: feature['properties']['precinctShares']
+            for i, feature in enumerate(features) if 'precinctShares' in feature['properties']
+        }
+    return table
+
+
+def write_split_layers(geojson, output_dir, name, attribute_fields, breakdown_fields=(),
+                       precision=COORDINATE_PRECISION, compress=('gzip', 'brotli')):
+    """
+    Write the static geometry as an immutable content-hashed asset ({name}_geometry.<hash>.geojson),
+    the per-refresh metrics as a small {name}_attributes.json, and a {name}_layers.json manifest
+    pointing at both. The geometry file is only rewritten when its content changes.
+    Returns the manifest.
+    """
+    output_dir = Path(output_dir)
+    features = geojson['features']
+
+    # Geometry: write to a temp name, then move into place under its content hash
+    tmp_file = output_dir / f".tmp-{name}_geometry.geojson"
+    write_features(geometry_features(features, set(attribute_fields)), tmp_file, precision, compress=())
+    with open(tmp_file, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:16]
+    geometry_file = output_dir / f"{name}_geometry.{digest}.geojson"
+
+    if geometry_file.exists():
+        tmp_file.unlink()
+    else:
+        write_compressed_siblings(geometry_file, data, compress)
+        os.replace(tmp_file, geometry_file)
+        # Older geometry versions are no longer referenced by the manifest
+        for old in output_dir.glob(f"{name}_geometry.*.geojson*"):
+            if not old.name.startswith(geometry_file.name):
+                old.unlink()
+
+    # Attributes: small, rewritten every refresh
+    attributes_file = output_dir / f"{name}_attributes.json"
+    table = attribute_table(features, attribute_fields, breakdown_fields)
+    with CompressedTee(attributes_file, compress) as out:
+        out.write(json.dumps(table, separators=COMPACT_SEPARATORS, default=to_native))
+    with open(attributes_file, 'rb') as f:
+        attributes_digest = hashlib.sha256(f.read()).hexdigest()[:16]
+
+    manifest = {
+        'geometry': geometry_file.name,
+        'attributes': f"{attributes_file.name}?v={attributes_digest}",
+        'updated': datetime.now().isoformat(timespec='seconds')
+    }
+    with open(output_dir / f"{name}_layers.json", 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# --- TopoJSON ---
+
+def polygon_parts(geometry):
+    """List of polygons (each a list of rings) for Polygon / MultiPolygon geometries"""
+    if geometry is None:
+        return []
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+def quantize_rings(features, quantization):
+    """Snap every ring to an integer grid. Returns (rings per feature, transform)"""
+    all_points = [np.asarray(ring, dtype=float)[:, :2]
+                  for feature in features
+                  for polygon in polygon_parts(feature.get('geometry'))
+                  for ring in polygon]
+    stacked = np.vstack(all_points) if all_points else np.zeros((1, 2))
+    x0, y0 = stacked.min(axis=0)
+    x1, y1 = stacked.max(axis=0)
+    kx = (x1 - x0) / (quantization - 1) or 1.0
+    ky = (y1 - y0) / (quantization - 1) or 1.0
+
+    quantized = []
+    for feature in features:
+        polygons = []
+        for polygon in polygon_parts(feature.get('geometry')):
+            rings = []
+            for ring in polygon:
+                points = np.asarray(ring, dtype=float)[:, :2]
+                grid = np.rint((points - (x0, y0)) / (kx, ky)).astype(np.int64)
+                keep = np.r_[True, np.any(grid[1:] != grid[:-1], axis=1)]
+                grid = [tuple(p) for p in grid[keep].tolist()]
+                if len(grid) > 1 and grid[0] == grid[-1]:
+                    grid = grid[:-1]  # Rings are handled cyclically below
+                rings.append(grid)
+            polygons.append(rings)
+        quantized.append(polygons)
+
+    return quantized, {'scale': [kx, ky], 'translate': [x0, y0]}
+
+
+def find_junctions(quantized):
+    """Points where rings stop sharing a border: seen again with different neighbours"""
+    neighbours = {}
+    junctions = set()
+    for polygons in quantized:
+        for rings in polygons:
+            for ring in rings:
+                n = len(ring)
+                for i, point in enumerate(ring):
+                    pair = (ring[i - 1], ring[(i + 1) % n])
+                    seen = neighbours.setdefault(point, pair)
+                    if seen != pair and seen != pair[::-1]:
+                        junctions.add(point)
+    return junctions
+
+
+def cut_ring(ring, junctions):
+    """Split a cyclic ring into arcs at its junction points (each arc keeps both endpoints)"""
+    cuts = [i for i, point in enumerate(ring) if point in junctions]
+    if not cuts:
+        # Isolated ring: rotate to a canonical start so identical rings dedupe
+        start = ring.index(min(ring))
+        rotated = ring[start:] + ring[:start]
+        return [rotated + [rotated[0]]]
+
+    rotated = ring[cuts[0]:] + ring[:cuts[0]] + [ring[cuts[0]]]
+    offsets = [c - cuts[0] for c in cuts] + [len(ring)]
+    return [rotated[a:b + 1] for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+def build_topology(features, quantization=TOPOJSON_QUANTIZATION, object_name='zipcodes'):
+    """Convert polygon features to a TopoJSON Topology with shared, delta-encoded arcs"""
+    quantized, transform = quantize_rings(features, quantization)
+    junctions = find_junctions(quantized)
+
+    arcs = []
+    arc_index = {}  # tuple(points) -> arc id (reverse direction maps to ~id)
+
+    def arc_id(points):
+        key = tuple(points)
+        if key in arc_index:
+            return arc_index[key]
+        reverse = key[::-1]
+        if reverse in arc_index:
+            return ~arc_index[reverse]
+        arc_index[key] = len(arcs)
+        arcs.append(points)
+        return arc_index[key]
+
+    geometries = []
+    for feature, polygons in zip(features, quantized):
+        topo_polygons = [[[arc_id(arc) for arc in cut_ring(ring, junctions)] for ring in rings if len(ring) >= 3]
+                         for rings in polygons]
+        geometry_type = (feature.get('geometry') or {}).get('type')
+        geometry = {'type': geometry_type, 'properties': feature.get('properties', {})}
+        if geometry_type == 'Polygon':
+            geometry['arcs'] = topo_polygons[0]
+        elif geometry_type == 'MultiPolygon':
+            geometry['arcs'] = topo_polygons
+        else:
+            geometry['type'] = None
+        geometries.append(geometry)
+
+    # Delta-encode arcs (first position absolute, rest relative to the previous one)
+    encoded = []
+    for points in arcs:
+        array = np.asarray(points, dtype=np.int64)
+        encoded.append(np.vstack([array[:1], np.diff(array, axis=0)]).tolist())
+
+    return {
+        'type': 'Topology',
+        'transform': transform,
+        'objects': {object_name: {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': encoded
+    }
+
+
+def write_topojson(geojson, output_file, quantization=TOPOJSON_QUANTIZATION, compress=('gzip', 'brotli')):
+    """Write a FeatureCollection as compact TopoJSON (plus compressed siblings)"""
+    topology = build_topology(geojson['features'], quantization)
+    with CompressedTee(output_file, compress) as out:
+        out.write(json.dumps(topology, separators=COMPACT_SEPARATORS, default=to_native))
+    return len(topology['arcs'])
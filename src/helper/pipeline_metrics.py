@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Pipeline Instrumentation
+Stage timers, counters and peak RSS for the refresh and GeoJSON scripts, written out as
+one JSON line per run and/or a Prometheus textfile-collector file. Profiling is opt-in per
+stage: cProfile dumps a .prof file and tracemalloc records the stage's peak allocation.
+
+Configured from the environment so scheduled refreshes need no code changes:
+    PIPELINE_METRICS_JSON   append one JSON record per run to this file
+    PIPELINE_METRICS_PROM   write a Prometheus .prom file here (atomically)
+    PIPELINE_PROFILE        comma-separated stage names to run under cProfile ('all' for every stage;
+                            one stage is profiled at a time, stages nested in it are part of its profile)
+    PIPELINE_TRACEMALLOC    comma-separated stage names to trace allocations for ('all' for every stage)
+    PIPELINE_PROFILE_DIR    where .prof files go (default ./.cache/profiles)
+"""
+
+import os
+import sys
+import json
+import time
+import cProfile
+import resource
+import threading
+import tracemalloc
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+PROFILE_DIR = './.cache/profiles'
+PROMETHEUS_PREFIX = 'nyc_pipeline'
+
+# tracemalloc is process-wide: stages tracing in parallel share one session, which is
+# stopped only when the last of them exits (and only if a stage started it)
+_trace_lock = threading.Lock()
+_tracing_stages = 0
+_started_tracing = False
+
+# Only one cProfile profiler may be active at a time (Python 3.12+ raises on a second one),
+# so a stage that starts while another is being profiled runs unprofiled
+_profile_lock = threading.Lock()
+_profiling = False
+
+
+def peak_rss_bytes(who=resource.RUSAGE_SELF):
+    """Peak resident set size so far (RUSAGE_CHILDREN: the largest finished worker process)"""
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def start_tracing():
+    global _tracing_stages, _started_tracing
+    with _trace_lock:
+        if _tracing_stages == 0:
+            _started_tracing = not tracemalloc.is_tracing()
+            if _started_tracing:
+                tracemalloc.start()
+        _tracing_stages += 1
+
+
+def stop_tracing():
+    """Peak traced bytes so far (shared by overlapping stages); stops tracing after the last stage"""
+    global _tracing_stages
+    with _trace_lock:
+        peak = tracemalloc.get_traced_memory()[1]
+        _tracing_stages -= 1
+        if _tracing_stages == 0 and _started_tracing:
+            tracemalloc.stop()
+    return peak
+
+
+def start_profiler():
+    """An enabled cProfile profiler, or None while another stage (or tool) is profiling"""
+    global _profiling
+    with _profile_lock:
+        if _profiling:
+            return None
+        _profiling = True
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:  # Another profiling tool (a debugger, coverage) holds the hook
+        stop_profiler(None)
+        return None
+    return profiler
+
+
+def stop_profiler(profiler):
+    global _profiling
+    if profiler:
+        profiler.disable()
+    with _profile_lock:
+        _profiling = False
+
+
+def stage_set(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+class PipelineMetrics:
+    def __init__(self, pipeline, json_file=None, prometheus_file=None, profile=(), trace=(),
+                 profile_dir=PROFILE_DIR):
+        self.pipeline = pipeline
+        self.json_file = json_file
+        self.prometheus_file = prometheus_file
+        self.profile = set(profile)
+        self.trace = set(trace)
+        self.profile_dir = profile_dir
+        self.started = time.time()
+        # name -> {'seconds', 'selfSeconds', 'calls', 'parent', 'peakRssBytes', ['tracemallocPeakBytes']}
+        # A stage opened inside another on the same thread is its child: 'seconds' includes the
+        # children's time, 'selfSeconds' does not
+        self.stages = {}
+        self.counters = {}  # name -> number
+        self.lock = threading.Lock()  # stages may run on several threads (pipeline_runner)
+        self.open_stages = threading.local()  # per-thread stack of the stages being timed
+
+    @classmethod
+    def from_env(cls, pipeline):
+        return cls(
+            pipeline,
+            json_file=os.environ.get('PIPELINE_METRICS_JSON'),
+            prometheus_file=os.environ.get('PIPELINE_METRICS_PROM'),
+            profile=stage_set(os.environ.get('PIPELINE_PROFILE')),
+            trace=stage_set(os.environ.get('PIPELINE_TRACEMALLOC')),
+            profile_dir=os.environ.get('PIPELINE_PROFILE_DIR', PROFILE_DIR),
+        )
+
+    def wants(self, selected, name):
+        return 'all' in selected or name in selected
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block (repeated stages accumulate), optionally under cProfile / tracemalloc"""
+        stack = self.open_stages.__dict__.setdefault('stack', [])
+        parent = stack[-1] if stack else None
+        frame = {'name': name, 'childSeconds': 0.0}
+        stack.append(frame)
+
+        profiling = self.wants(self.profile, name)
+        profiler = start_profiler() if profiling else None
+        if profiling and profiler is None:
+            print(f"✗ {name}: another stage is being profiled, not profiling this one")
+        tracing = self.wants(self.trace, name)
+        if tracing:
+            start_tracing()
+
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            if parent:
+                parent['childSeconds'] += elapsed
+            if profiler:
+                stop_profiler(profiler)
+                Path(self.profile_dir).mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(Path(self.profile_dir) / f"{self.pipeline}-{name}.prof")
+
+            traced_peak = stop_tracing() if tracing else None
+            with self.lock:
+                entry = self.stages.setdefault(name, {'seconds': 0.0, 'selfSeconds': 0.0, 'calls': 0,
+                                                      'parent': parent['name'] if parent else None})
+                entry['seconds'] += elapsed
+                entry['selfSeconds'] += elapsed - frame['childSeconds']
+                entry['calls'] += 1
+                entry['peakRssBytes'] = peak_rss_bytes()
+                if traced_peak is not None:
+                    entry['tracemallocPeakBytes'] = traced_peak
+
+    def count(self, name, value=1):
+        """Add to a counter (bytes downloaded, rows parsed, features written, ...)"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        return {
+            'pipeline': self.pipeline,
+            'timestamp': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+            'durationSeconds': time.time() - self.started,
+            'peakRssBytes': peak_rss_bytes(),
+            'peakWorkerRssBytes': peak_rss_bytes(resource.RUSAGE_CHILDREN),
+            'stages': self.stages,
+            'counters': self.counters,
+        }
+
+    def prometheus_text(self):
+        """Prometheus exposition format, for the node_exporter textfile collector"""
+        snapshot = self.snapshot()
+        labels = f'pipeline="{self.pipeline}"'
+        lines = [
+            f"# TYPE {PROMETHEUS_PREFIX}_duration_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_duration_seconds{{{labels}}} {snapshot['durationSeconds']:.6f}",
+            f"# TYPE {PROMETHEUS_PREFIX}_peak_rss_bytes gauge",
+            f"{PROMETHEUS_PREFIX}_peak_rss_bytes{{{labels}}} {snapshot['peakRssBytes']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_peak_worker_rss_bytes gauge",
+            f"{PROMETHEUS_PREFIX}_peak_worker_rss_bytes{{{labels}}} {snapshot['peakWorkerRssBytes']}",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f"{PROMETHEUS_PREFIX}_last_run_timestamp_seconds{{{labels}}} {self.started:.0f}",
+            f"# TYPE {PROMETHEUS_PREFIX}_stage_seconds gauge",
+        ]
+        lines += [f'{PROMETHEUS_PREFIX}_stage_seconds{{{labels},stage="{name}"}} {entry["seconds"]:.6f}'
+                  for name, entry in self.stages.items()]
+        # Summing stage_seconds double-counts nested stages; self seconds add up to the run
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_self_seconds gauge")
+        lines += [f'{PROMETHEUS_PREFIX}_stage_self_seconds{{{labels},stage="{name}"}} {entry["selfSeconds"]:.6f}'
+                  for name, entry in self.stages.items()]
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_stage_peak_rss_bytes gauge")
+        lines += [f'{PROMETHEUS_PREFIX}_stage_peak_rss_bytes{{{labels},stage="{name}"}} {entry["peakRssBytes"]}'
+                  for name, entry in self.stages.items()]
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_count gauge")
+        lines += [f'{PROMETHEUS_PREFIX}_count{{{labels},counter="{name}"}} {value}'
+                  for name, value in self.counters.items()]
+        return '\n'.join(lines) + '\n'
+
+    def flush(self):
+        """Write the configured outputs. Returns the snapshot"""
+        snapshot = self.snapshot()
+        if self.json_file:
+            Path(self.json_file).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.json_file, 'a') as f:
+                f.write(json.dumps(snapshot, separators=(',', ':')) + '\n')
+        if self.prometheus_file:
+            # Written via rename so the collector never scrapes a half-written file
+            path = Path(self.prometheus_file)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = path.with_name(f".tmp-{path.name}")
+            tmp_file.write_text(self.prometheus_text())
+            os.replace(tmp_file, path)
+        return snapshot
+
+    def summary(self):
+        """One line per stage (nested stages indented under their parent), for the end of a run"""
+        top = [name for name, entry in self.stages.items() if entry['parent'] not in self.stages]
+        # Shares are of the top-level stages' time, so nested stages are not counted twice
+        total = sum(self.stages[name]['seconds'] for name in top) or 1.0
+        lines, listed = [], set()
+
+        def add(names, depth):
+            for name in names:
+                if name in listed:
+                    continue  # A stage seen under two parents is listed once, under the first
+                listed.add(name)
+                entry = self.stages[name]
+                label = '  ' * depth + name
+                lines.append(f"  {label:<20} {entry['seconds']:8.3f}s  {entry['seconds'] / total:6.1%}")
+                add([child for child, e in self.stages.items() if e['parent'] == name], depth + 1)
+
+        add(top, 0)
+        add(list(self.stages), 0)  # Stages only ever nested in each other
+        lines.append(f"  peak RSS {peak_rss_bytes() / 2 ** 20:.1f} MiB")
+        return '\n'.join(lines)
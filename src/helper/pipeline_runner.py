@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner
+Runs the weekly refresh as one DAG of stages (download -> parse -> score -> history and
+join -> export) instead of two hand-run scripts. Each stage declares the files it reads and
+writes; dependencies follow from those declarations. A stage is skipped when the content
+hashes of its inputs and code match its last successful run and its outputs are still on
+disk, and stages whose inputs are ready run in parallel (the spatial join does not wait for
+the downloads).
+
+Download and history are also keyed on the ISO week, so they run once a week. In a week with
+no changed sheets every download is a 304 and every stage after it is skipped.
+
+    python src/helper/pipeline_runner.py [--force [STAGE ...]] [--dry-run] [--workers N]
+"""
+
+import sys
+import json
+import hashlib
+import argparse
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from crime_cache import CACHE_FILE, save_cache
+from crime_history import HISTORY_DIR, append_snapshot, week_key
+from spatial_join import PRECINCT_GEOJSON, ZIP_GEOJSON, WEIGHTS_CACHE, file_hash, load_zip_precinct_weights
+from safety_scoring import score_frame
+from pipeline_metrics import PipelineMetrics
+from precinct_neighborhood_mapper import fetch_sheets, parse_sheets, save_cache_date
+from geojson_remapper import EXPORT_OUTPUTS, export_layers, load_crime_data, load_zip_geojson
+import raw_cache
+
+# Intermediate stage outputs and the memo of past runs
+PIPELINE_DIR = './.cache/pipeline'
+SHEETS_FILE = f'{PIPELINE_DIR}/sheets.json'       # url -> sha256 of the sheet in the raw cache
+ROWS_FILE = f'{PIPELINE_DIR}/parsed_rows.json'    # {'parser': code hash, 'sheets': {url: {'sha256', 'row'}}}
+STATE_FILE = f'{PIPELINE_DIR}/state.json'
+
+# Stage code lives next to this file; a change to it invalidates the stage
+HELPER_DIR = Path(__file__).resolve().parent
+# Parsing reads the sheet layout from dataset_spec and shapes rows by crime_cache's breakdown columns
+PARSE_CODE = ['precinct_neighborhood_mapper.py', 'precinct_data_mapping.py', 'dataset_spec.py', 'crime_cache.py']
+
+
+class Stage:
+    """One pipeline step: run(metrics) reads `inputs` and writes `outputs` (file or directory paths)"""
+    def __init__(self, name, run, inputs=(), outputs=(), code=(), key=None):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)  # module files under HELPER_DIR
+        self.key = key          # optional callable: extra memo key (e.g. the ISO week)
+
+
+def read_json(path, default=None):
+    if not Path(path).exists():
+        return default
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def write_json(path, data):
+    raw_cache.write_atomic(Path(path), json.dumps(data, indent=1).encode('utf-8'))
+
+
+# --- Stages ---
+
+def download_stage(metrics):
+    sheets = fetch_sheets(metrics=metrics)
+    if not sheets:
+        raise RuntimeError("No precinct sheets could be fetched")
+    save_cache_date()
+    write_json(SHEETS_FILE, sheets)
+
+
+def parse_stage(metrics):
+    # Rows of unchanged sheets are reused, unless the parsing code itself changed
+    parser = hashlib.sha256(''.join(file_hash(HELPER_DIR / name) for name in PARSE_CODE).encode()).hexdigest()
+    previous = read_json(ROWS_FILE, {})
+    previous = previous['sheets'] if previous.get('parser') == parser else {}
+    parsed = parse_sheets(read_json(SHEETS_FILE), previous, metrics=metrics)
+    if not parsed:
+        raise RuntimeError("No precinct sheets could be parsed")
+    metrics.count('rows', len(parsed))
+    write_json(ROWS_FILE, {'parser': parser, 'sheets': parsed})
+
+
+def score_stage(metrics):
+    df = pd.DataFrame([entry['row'] for entry in read_json(ROWS_FILE)['sheets'].values()])
+    score_frame(df)
+    save_cache(df, CACHE_FILE)
+
+
+def history_stage(metrics):
+    append_snapshot(load_crime_data())
+
+
+def join_stage(metrics):
+    load_zip_precinct_weights(ZIP_GEOJSON, PRECINCT_GEOJSON)
+
+
+def export_stage(metrics):
+    crime_df = load_crime_data()
+    zip_geojson = load_zip_geojson()
+    weights = load_zip_precinct_weights(ZIP_GEOJSON, PRECINCT_GEOJSON)
+    export_layers(crime_df, zip_geojson, weights, metrics)
+
+
+STAGES = [
+    Stage('download', download_stage, outputs=[SHEETS_FILE], key=week_key),
+    Stage('parse', parse_stage, inputs=[SHEETS_FILE], outputs=[ROWS_FILE],
+          code=PARSE_CODE),
+    Stage('score', score_stage, inputs=[ROWS_FILE], outputs=[CACHE_FILE],
+          code=['safety_scoring.py', 'crime_cache.py']),
+    Stage('history', history_stage, inputs=[CACHE_FILE], outputs=[HISTORY_DIR], code=['crime_history.py'],
+          key=week_key),
+    Stage('join', join_stage, inputs=[ZIP_GEOJSON, PRECINCT_GEOJSON], outputs=[WEIGHTS_CACHE],
+          code=['spatial_join.py', 'geojson_reader.py']),
+    Stage('export', export_stage, inputs=[CACHE_FILE, ZIP_GEOJSON, PRECINCT_GEOJSON, WEIGHTS_CACHE],
+          outputs=EXPORT_OUTPUTS,
+          code=['geojson_remapper.py', 'geojson_writer.py', 'geojson_reader.py', 'tile_pyramid.py',
+                'sparse_aggregation.py', 'safety_scoring.py']),
+]
+
+
+# --- Runner ---
+
+def output_signature(path):
+    """Cheap fingerprint of an output: (size, mtime) for files, 'dir' for directories, None if missing"""
+    path = Path(path)
+    if path.is_dir():
+        return 'dir'
+    if not path.exists():
+        return None
+    stat = path.stat()
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class PipelineRunner:
+    def __init__(self, stages=STAGES, state_file=STATE_FILE, force=(), max_workers=None, metrics=None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.force = set(force)
+        self.max_workers = max_workers or len(self.stages)
+        self.metrics = metrics or PipelineMetrics.from_env('pipeline')
+        self.state = read_json(state_file, {}) or {}
+        self.state.setdefault('hashes', {})
+        self.state.setdefault('stages', {})
+        self.dependencies = self.build_dependencies()
+
+    def build_dependencies(self):
+        """Upstream stages of each stage (the producers of its inputs); rejects clashes and cycles"""
+        producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in producers:
+                    raise ValueError(f"{output} is written by both {producers[output]} and {stage.name}")
+                producers[output] = stage.name
+        unknown = self.force - set(self.stages) - {'all'}
+        if unknown:
+            raise ValueError(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+        dependencies = {stage.name: {producers[i] for i in stage.inputs if i in producers}
+                        for stage in self.stages.values()}
+        resolved = set()
+        while len(resolved) < len(dependencies):
+            ready = {name for name, deps in dependencies.items() if name not in resolved and deps <= resolved}
+            if not ready:
+                raise ValueError(f"Stage cycle among: {', '.join(sorted(set(dependencies) - resolved))}")
+            resolved |= ready
+        return dependencies
+
+    def content_hash(self, path):
+        """sha256 of a file, re-read only when its size or mtime changed since the last run"""
+        signature = output_signature(path)
+        if signature is None or signature == 'dir':
+            return signature
+        cached = self.state['hashes'].get(str(path))
+        if cached and cached['signature'] == signature:
+            return cached['sha256']
+        digest = file_hash(path)
+        self.state['hashes'][str(path)] = {'signature': signature, 'sha256': digest}
+        return digest
+
+    def stage_key(self, stage):
+        """Memo key: hashes of the stage's inputs and code, plus its extra key"""
+        return hashlib.sha256(json.dumps({
+            'inputs': {path: self.content_hash(path) for path in stage.inputs},
+            'code': {name: self.content_hash(HELPER_DIR / name) for name in stage.code},
+            'key': stage.key() if stage.key else None,
+        }, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def is_fresh(self, stage, key):
+        record = self.state['stages'].get(stage.name)
+        if record is None or record['key'] != key:
+            return False
+        return all(output_signature(path) == signature for path, signature in record['outputs'].items())
+
+    def forced(self, stage):
+        return 'all' in self.force or stage.name in self.force
+
+    def execute(self, stage):
+        missing = [path for path in stage.inputs if not Path(path).exists()]
+        if missing:
+            raise FileNotFoundError(f"missing input {', '.join(missing)}")
+        for output in stage.outputs:
+            Path(output).parent.mkdir(parents=True, exist_ok=True)
+        with self.metrics.stage(stage.name):
+            stage.run(self.metrics)
+
+    def save_state(self):
+        write_json(self.state_file, self.state)
+
+    def plan(self):
+        """Dry run: what each stage would do with the files as they are now"""
+        plan = {}
+        for name in self.order():
+            stage = self.stages[name]
+            stale_upstream = [dep for dep in self.dependencies[name] if plan[dep] != 'up to date']
+            if self.forced(stage):
+                plan[name] = 'forced'
+            elif stale_upstream:
+                plan[name] = f"after {', '.join(sorted(stale_upstream))}"
+            else:
+                plan[name] = 'up to date' if self.is_fresh(stage, self.stage_key(stage)) else 'stale'
+        return plan
+
+    def order(self):
+        """Stage names in dependency order"""
+        ordered = []
+        while len(ordered) < len(self.dependencies):
+            ordered += [name for name, deps in self.dependencies.items()
+                        if name not in ordered and deps <= set(ordered)]
+        return ordered
+
+    def run(self):
+        """Run every stale stage, independent ones in parallel. Returns {stage: 'ran' | 'cached' | 'failed' | 'skipped'}"""
+        status = {}
+        running = {}  # future -> (stage, key)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while len(status) < len(self.stages):
+                active = {stage.name for stage, _ in running.values()}
+                for name in self.order():
+                    if name in status or name in active:
+                        continue
+                    deps = self.dependencies[name]
+                    if any(status.get(dep) in ('failed', 'skipped') for dep in deps):
+                        status[name] = 'skipped'
+                        print(f"✗ {name:<10} skipped (upstream failed)")
+                        continue
+                    if not all(dep in status for dep in deps):
+                        continue
+
+                    stage = self.stages[name]
+                    key = self.stage_key(stage)
+                    if not self.forced(stage) and self.is_fresh(stage, key):
+                        status[name] = 'cached'
+                        print(f"✓ {name:<10} up to date")
+                        continue
+                    print(f"→ {name:<10} running")
+                    running[pool.submit(self.execute, stage)] = (stage, key)
+
+                if not running:
+                    continue  # Newly cached / skipped stages may have unblocked others
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, key = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        status[stage.name] = 'failed'
+                        print(f"✗ {stage.name:<10} failed: {e}")
+                        continue
+                    status[stage.name] = 'ran'
+                    self.state['stages'][stage.name] = {
+                        'key': key,
+                        'outputs': {path: output_signature(path) for path in stage.outputs},
+                        'finished': datetime.now().isoformat(timespec='seconds'),
+                    }
+                    self.save_state()
+                    print(f"✓ {stage.name:<10} done")
+
+        self.save_state()
+        return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the crime data pipeline, skipping up-to-date stages")
+    parser.add_argument('--force', nargs='*', default=None, metavar='STAGE',
+                        help="re-run these stages even if up to date (no names: every stage)")
+    parser.add_argument('--dry-run', action='store_true', help="show which stages would run")
+    parser.add_argument('--workers', type=int, default=None, help="stages run at the same time")
+    args = parser.parse_args()
+
+    force = () if args.force is None else (args.force or ['all'])
+    runner = PipelineRunner(force=force, max_workers=args.workers)
+    if args.dry_run:
+        for name, action in runner.plan().items():
+            print(f"  {name:<10} {action}")
+        return 0
+
+    print("=" * 70 + "\nNYC CRIME DATA PIPELINE\n" + "=" * 70)
+    status = runner.run()
+    runner.metrics.flush()
+    print(runner.metrics.summary())
+    return 1 if any(s in ('failed', 'skipped') for s in status.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
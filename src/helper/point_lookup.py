@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Point-in-Polygon Lookup
+Classifies lat/lon points (geocoded incidents, listings, addresses) into police precincts and
+ZIP codes, then attaches each precinct's safety metrics. Both boundary layers are loaded once
+into prepared geometries behind an STRtree; a batch is one vectorized tree query per chunk,
+and points outside a layer's bounding box (or with missing coordinates) never reach the tree.
+
+    python src/helper/point_lookup.py --lat 40.7128 --lon -74.0060
+    python src/helper/point_lookup.py points.csv tagged.csv [--lat-col lat] [--lon-col lon]
+"""
+
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import shapely
+from spatial_join import PRECINCT_GEOJSON, ZIP_GEOJSON, load_geometries
+from crime_cache import CACHE_FILE, ensure_cache, load_cache
+from safety_scoring import safety_labels, safety_ranks
+
+# Points per tree query: bounds the temporary shapely points and match arrays for huge batches
+CHUNK_SIZE = 1 << 18
+# Polygons are cut into quadrant pieces of at most this many vertices before indexing
+MAX_PIECE_VERTICES = 64
+MAX_SUBDIVIDE_DEPTH = 12
+
+# Columns classify() adds for every point (-1 / '' / NaN where a point is outside the layers)
+LOOKUP_COLUMNS = ['precinct', 'zip', 'borough', 'neighborhoods', 'safetyScore', 'weightedCrimeVal',
+                  'safetyRank', 'safetyLabel']
+
+
+def subdivide(geometries, max_vertices=MAX_PIECE_VERTICES, max_depth=MAX_SUBDIVIDE_DEPTH):
+    """
+    Cut polygons into quadrants until every piece has at most max_vertices vertices.
+    A point-in-polygon test costs time linear in the vertex count, so a tree over many small
+    pieces with tight boxes is far cheaper to query than a few detailed boundaries.
+    Returns (pieces, row of the source polygon for each piece).
+    """
+    pieces, parents = [], []
+    work, rows = geometries, np.arange(len(geometries))
+    for _ in range(max_depth):
+        large = shapely.get_num_coordinates(work) > max_vertices
+        pieces.append(work[~large])
+        parents.append(rows[~large])
+        work, rows = work[large], rows[large]
+        if not len(work):
+            break
+
+        xmin, ymin, xmax, ymax = shapely.bounds(work).T
+        xmid, ymid = (xmin + xmax) / 2, (ymin + ymax) / 2
+        quadrants = np.concatenate([shapely.box(xmin, ymin, xmid, ymid), shapely.box(xmid, ymin, xmax, ymid),
+                                    shapely.box(xmin, ymid, xmid, ymax), shapely.box(xmid, ymid, xmax, ymax)])
+        work, rows = shapely.intersection(np.tile(work, 4), quadrants), np.tile(rows, 4)
+        # Cuts along an edge leave zero-area slivers; the neighbouring piece covers those points
+        keep = shapely.area(work) > 0
+        work, rows = work[keep], rows[keep]
+    pieces.append(work)
+    parents.append(rows)
+    return np.concatenate(pieces), np.concatenate(parents)
+
+
+class PolygonLayer:
+    """One boundary file as prepared, subdivided polygons behind an STRtree, plus its bounding box"""
+    def __init__(self, geometries, keys, max_vertices=MAX_PIECE_VERTICES):
+        self.geometries = geometries
+        self.keys = np.asarray(keys)
+        self.pieces, self.parents = subdivide(geometries, max_vertices)
+        shapely.prepare(self.pieces)
+        self.tree = shapely.STRtree(self.pieces)
+        self.bounds = shapely.total_bounds(self.geometries)  # xmin, ymin, xmax, ymax
+
+    @classmethod
+    def from_geojson(cls, geojson_file, key):
+        """Layer keyed by a feature property (key(properties) -> value)"""
+        properties, geometries = load_geometries(geojson_file)
+        return cls(geometries, [key(props) for props in properties])
+
+    def locate(self, lon, lat, chunk_size=CHUNK_SIZE):
+        """Row of the polygon containing each point, -1 where none does"""
+        lon = np.asarray(lon, dtype=float)
+        lat = np.asarray(lat, dtype=float)
+        rows = np.full(len(lon), -1, dtype=np.int64)
+
+        # Bounding-box prefilter (NaN coordinates fail every comparison and drop out too)
+        xmin, ymin, xmax, ymax = self.bounds
+        candidates = np.flatnonzero((lon >= xmin) & (lon <= xmax) & (lat >= ymin) & (lat <= ymax))
+
+        for start in range(0, len(candidates), chunk_size):
+            chunk = candidates[start:start + chunk_size]
+            point_idx, piece_idx = self.tree.query(shapely.points(lon[chunk], lat[chunk]), predicate='intersects')
+            polygon_idx = self.parents[piece_idx]
+
+            # A point on a shared boundary matches both sides: the lowest polygon row wins
+            order = np.lexsort((polygon_idx, point_idx))
+            point_idx, polygon_idx = point_idx[order], polygon_idx[order]
+            first = np.ones(len(point_idx), dtype=bool)
+            first[1:] = point_idx[1:] != point_idx[:-1]
+            rows[chunk[point_idx[first]]] = polygon_idx[first]
+        return rows
+
+    def keys_at(self, rows, missing):
+        """Keys for located rows, `missing` where a point is outside every polygon"""
+        keys = self.keys[np.maximum(rows, 0)] if len(self.keys) else np.full(len(rows), missing)
+        return np.where(rows >= 0, keys, missing)
+
+
+class PointLookup:
+    """Precinct / ZIP / safety lookup for single points or arrays of millions of points"""
+    def __init__(self, precinct_geojson=PRECINCT_GEOJSON, zip_geojson=ZIP_GEOJSON):
+        self.precincts = PolygonLayer.from_geojson(precinct_geojson, lambda p: int(float(p['precinct'])))
+        self.zips = PolygonLayer.from_geojson(zip_geojson, lambda p: str(p.get('postalCode', '')))
+        print(f"✓ Indexed {len(self.precincts.keys)} precincts and {len(self.zips.keys)} ZIP codes")
+
+    def locate(self, lat, lon, chunk_size=CHUNK_SIZE):
+        """(precinct ids, ZIP codes) arrays for the points; -1 / '' outside the boundaries"""
+        precincts = self.precincts.keys_at(self.precincts.locate(lon, lat, chunk_size), -1)
+        zips = self.zips.keys_at(self.zips.locate(lon, lat, chunk_size), '')
+        return precincts.astype(np.int64), zips.astype(str)
+
+    def classify(self, lat, lon, crime_df=None, chunk_size=CHUNK_SIZE):
+        """DataFrame of LOOKUP_COLUMNS, one row per point, with the precinct's safety metrics"""
+        precincts, zips = self.locate(lat, lon, chunk_size)
+        result = precinct_metrics(precincts, load_crime_df() if crime_df is None else crime_df)
+        result.insert(1, 'zip', zips)
+        return result[LOOKUP_COLUMNS]
+
+    def lookup(self, lat, lon, crime_df=None):
+        """Single point as a dict (None values outside the boundaries)"""
+        row = {k: (v.item() if isinstance(v, np.generic) else v)
+               for k, v in self.classify([lat], [lon], crime_df).iloc[0].to_dict().items()}
+        missing = {'precinct': -1, 'zip': '', 'borough': '', 'neighborhoods': '', 'safetyRank': -1, 'safetyLabel': ''}
+        return {
+            'lat': lat, 'lon': lon,
+            **{k: (None if v == missing.get(k) or (isinstance(v, float) and np.isnan(v)) else v)
+               for k, v in row.items()}
+        }
+
+    def tag_frame(self, df, lat_col='lat', lon_col='lon', crime_df=None):
+        """Copy of df with LOOKUP_COLUMNS appended (bulk tagging of incidents / listings)"""
+        tags = self.classify(df[lat_col].to_numpy(dtype=float), df[lon_col].to_numpy(dtype=float), crime_df)
+        tagged = df.reset_index(drop=True).copy()
+        for column in LOOKUP_COLUMNS:
+            tagged[column] = tags[column].to_numpy()
+        return tagged
+
+
+def load_crime_df(cache_file=CACHE_FILE):
+    if not ensure_cache(cache_file):
+        raise FileNotFoundError(cache_file)
+    return load_cache(cache_file)
+
+
+def precinct_metrics(precincts, crime_df):
+    """Per-point precinct metrics by a sorted-id join (no per-point Python work)"""
+    crime_df = crime_df.sort_values('precinct')
+    ids = crime_df['precinct'].to_numpy(dtype=np.int64)
+    ranks = (crime_df['safetyRank'].to_numpy() if 'safetyRank' in crime_df
+             else safety_ranks(crime_df['weightedCrimeVal']))
+
+    pos = np.clip(np.searchsorted(ids, precincts), 0, max(len(ids) - 1, 0))
+    found = (ids[pos] == precincts) & (precincts >= 0) if len(ids) else np.zeros(len(precincts), dtype=bool)
+
+    def column(values, missing):
+        values = np.asarray(values)
+        return np.where(found, values[pos], missing) if len(ids) else np.full(len(precincts), missing)
+
+    scores = column(crime_df['safetyScore'].to_numpy(dtype=float), np.nan)
+    return pd.DataFrame({
+        'precinct': precincts,
+        'borough': column(crime_df['borough'].to_numpy(dtype=object), ''),
+        'neighborhoods': column(crime_df['neighborhoods'].to_numpy(dtype=object), ''),
+        'safetyScore': scores,
+        'weightedCrimeVal': column(crime_df['weightedCrimeVal'].to_numpy(dtype=float), np.nan),
+        'safetyRank': column(np.asarray(ranks, dtype=np.int64), -1),
+        'safetyLabel': np.where(found, safety_labels(np.nan_to_num(scores)), ''),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precinct / ZIP / safety lookup for lat-lon points")
+    parser.add_argument('input', nargs='?', help="CSV of points to tag")
+    parser.add_argument('output', nargs='?', help="tagged CSV (default: <input>.tagged.csv)")
+    parser.add_argument('--lat', type=float, help="single point latitude")
+    parser.add_argument('--lon', type=float, help="single point longitude")
+    parser.add_argument('--lat-col', default='lat')
+    parser.add_argument('--lon-col', default='lon')
+    args = parser.parse_args()
+
+    if (args.lat is None) == (args.input is None) or (args.lat is None) != (args.lon is None):
+        parser.error("give either --lat and --lon, or an input CSV")
+
+    lookup = PointLookup()
+    if args.input is None:
+        print(json.dumps(lookup.lookup(args.lat, args.lon), indent=2))
+        return 0
+
+    points = pd.read_csv(args.input)
+    start = time.perf_counter()
+    tagged = lookup.tag_frame(points, args.lat_col, args.lon_col)
+    elapsed = time.perf_counter() - start
+    output = args.output or f"{args.input.rsplit('.', 1)[0]}.tagged.csv"
+    tagged.to_csv(output, index=False)
+    located = int((tagged['precinct'] >= 0).sum())
+    print(f"✓ Tagged {len(tagged)} points ({located} inside a precinct) in {elapsed:.2f}s "
+          f"({len(tagged) / max(elapsed, 1e-9):,.0f} points/s) -> {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
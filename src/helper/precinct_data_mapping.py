@@ -1,3 +1,6 @@
+import numpy as np
+from types import MappingProxyType
+
 
 # Define all NYC precincts with their info
 PRECINCT_DATA = [
@@ -75,6 +78,7 @@ PRECINCT_DATA = [
     {'Precinct': '114', 'Borough': 'Queens', 'Neighborhoods': 'Astoria, Long Island City'},
     {'Precinct': '115', 'Borough': 'Queens', 'Neighborhoods': 'Jackson heights, North Corona'},
     {'Precinct': '120', 'Borough': 'Staten Island', 'Neighborhoods': 'Stapleton, Port Richmond'},
+    {'Precinct': '121', 'Borough': 'Staten Island', 'Neighborhoods': 'Mariners Harbor, Graniteville, Travis'},
     {'Precinct': '122', 'Borough': 'Staten Island', 'Neighborhoods': 'New Springville, South Beach'},
     {'Precinct': '123', 'Borough': 'Staten Island', 'Neighborhoods': 'Tottenville, Woodrow, Great Kills'}
 ]
@@ -114,4 +118,88 @@ zip_to_precinct = {
         # STATEN ISLAND
         "10301": 120, "10302": 121, "10303": 121, "10304": 120, "10305": 122, "10306": 122,
         "10307": 123, "10308": 122, "10309": 123, "10310": 120, "10312": 123, "10314": 121
-    }
\ No newline at end of file
+    }
+
+
+# --- Index layer: built once at import, validated, read-only ---
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+def _build_index():
+    """Array-backed lookup tables derived from PRECINCT_DATA and zip_to_precinct"""
+    ids = [int(p['Precinct']) for p in PRECINCT_DATA]
+    if len(set(ids)) != len(ids):
+        raise ValueError("PRECINCT_DATA has duplicate precinct ids")
+    
+    precinct_ids = np.array(ids, dtype=np.int32)
+    precinct_row = np.full(precinct_ids.max() + 1, -1, dtype=np.int32)
+    precinct_row[precinct_ids] = np.arange(len(precinct_ids), dtype=np.int32)
+    
+    boroughs = tuple(dict.fromkeys(p['Borough'] for p in PRECINCT_DATA))
+    neighborhoods = tuple(dict.fromkeys(p['Neighborhoods'] for p in PRECINCT_DATA))
+    borough_code = np.array([boroughs.index(p['Borough']) for p in PRECINCT_DATA], dtype=np.int8)
+    neighborhood_code = np.array([neighborhoods.index(p['Neighborhoods']) for p in PRECINCT_DATA], dtype=np.int16)
+    
+    bad_zips = [z for z in zip_to_precinct if not (len(z) == 5 and z.isdigit())]
+    if bad_zips:
+        raise ValueError(f"zip_to_precinct has malformed ZIP codes: {bad_zips}")
+    unknown = sorted({p for p in zip_to_precinct.values() if p >= len(precinct_row) or precinct_row[p] < 0})
+    if unknown:
+        raise ValueError(f"zip_to_precinct points at precincts missing from PRECINCT_DATA: {unknown}")
+    
+    zip_codes = np.array(sorted(zip_to_precinct))
+    zip_precinct = np.array([zip_to_precinct[z] for z in zip_codes], dtype=np.int32)
+    
+    precinct_to_zips = {int(p): () for p in precinct_ids}
+    for zip_code, precinct in zip(zip_codes.tolist(), zip_precinct.tolist()):
+        precinct_to_zips[precinct] += (zip_code,)
+    borough_to_precincts = {
+        borough: tuple(int(p) for p in precinct_ids[borough_code == code])
+        for code, borough in enumerate(boroughs)
+    }
+    
+    return {
+        'PRECINCT_IDS': _frozen(precinct_ids),
+        'PRECINCT_ROW': _frozen(precinct_row),
+        'BOROUGHS': boroughs,
+        'PRECINCT_BOROUGH_CODE': _frozen(borough_code),
+        'NEIGHBORHOODS': neighborhoods,
+        'PRECINCT_NEIGHBORHOOD_CODE': _frozen(neighborhood_code),
+        'ZIP_CODES': _frozen(zip_codes),
+        'ZIP_PRECINCT': _frozen(zip_precinct),
+        'PRECINCT_TO_ZIPS': MappingProxyType(precinct_to_zips),
+        'BOROUGH_TO_PRECINCTS': MappingProxyType(borough_to_precincts),
+    }
+
+_index = _build_index()
+
+# Precinct table: row i describes PRECINCT_IDS[i]; PRECINCT_ROW[precinct] -> row (or -1)
+PRECINCT_IDS = _index['PRECINCT_IDS']
+PRECINCT_ROW = _index['PRECINCT_ROW']
+# Integer-coded borough / neighborhood per precinct row
+BOROUGHS = _index['BOROUGHS']
+PRECINCT_BOROUGH_CODE = _index['PRECINCT_BOROUGH_CODE']
+NEIGHBORHOODS = _index['NEIGHBORHOODS']
+PRECINCT_NEIGHBORHOOD_CODE = _index['PRECINCT_NEIGHBORHOOD_CODE']
+# Sorted ZIP codes and the precinct each one maps to
+ZIP_CODES = _index['ZIP_CODES']
+ZIP_PRECINCT = _index['ZIP_PRECINCT']
+# Reverse maps
+PRECINCT_TO_ZIPS = _index['PRECINCT_TO_ZIPS']
+BOROUGH_TO_PRECINCTS = _index['BOROUGH_TO_PRECINCTS']
+
+def precinct_rows(precincts):
+    """Vectorized precinct id -> precinct table row (-1 for unknown ids)"""
+    precincts = np.asarray(precincts, dtype=np.int64)
+    in_range = (precincts >= 0) & (precincts < len(PRECINCT_ROW))
+    return np.where(in_range, PRECINCT_ROW[np.where(in_range, precincts, 0)], -1)
+
+def zip_precincts(zip_codes):
+    """Vectorized ZIP code -> precinct id (-1 for ZIPs not in zip_to_precinct)"""
+    # No fixed width: casting to ZIP_CODES' <U5 would truncate '100011' or '10001-1234' into a match
+    zip_codes = np.asarray(zip_codes).astype(str)
+    valid = np.char.str_len(zip_codes) == 5
+    positions = np.searchsorted(ZIP_CODES, np.where(valid, zip_codes, '')).clip(0, len(ZIP_CODES) - 1)
+    return np.where(valid & (ZIP_CODES[positions] == zip_codes), ZIP_PRECINCT[positions], -1)
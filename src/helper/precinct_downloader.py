@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Concurrent Precinct Downloader
+Fetches many source files over one pooled HTTP session using a bounded thread pool,
+a token-bucket rate limit and per-URL retry with exponential backoff.
+"""
+
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Concurrency / politeness defaults for nyc.gov
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 4.0
+MAX_RETRIES = 3
+BACKOFF_SECONDS = 1.0
+REQUEST_TIMEOUT = 30
+
+# Responses worth retrying (throttling and transient server errors)
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: allows `rate` requests per second with bursts up to `capacity`"""
+    def __init__(self, rate=REQUESTS_PER_SECOND, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then consume it"""
+        if self.rate <= 0:
+            return  # Rate limiting disabled
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def create_session(pool_size=MAX_WORKERS):
+    """Create one HTTP session whose connection pool is sized for the worker count"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_with_retry(session, url, bucket, retries=MAX_RETRIES, backoff=BACKOFF_SECONDS, timeout=REQUEST_TIMEOUT,
+                     headers=None):
+    """GET a URL with rate limiting and exponential backoff. Returns (response, error)"""
+    error = None
+    for attempt in range(retries + 1):
+        bucket.acquire()
+        try:
+            response = session.get(url, timeout=timeout, headers=headers)
+            if response.status_code not in RETRY_STATUS_CODES:
+                return response, None
+            error = f"HTTP {response.status_code}"
+        except requests.RequestException as e:
+            error = str(e)
+
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt))
+
+    return None, error
+
+
+def iter_fetch(urls, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, retries=MAX_RETRIES,
+               backoff=BACKOFF_SECONDS, session=None, headers=None):
+    """
+    Fetch every URL in `urls` (a dict of key -> url) concurrently.
+    `headers` optionally maps a key to extra request headers (e.g. conditional GET headers).
+    Yields (key, response, error) in completion order; exactly one of response/error is None.
+    """
+    headers = headers or {}
+    own_session = session is None
+    if own_session:
+        session = create_session(pool_size=max_workers)
+    bucket = TokenBucket(rate)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {
+                executor.submit(fetch_with_retry, session, url, bucket, retries, backoff,
+                                REQUEST_TIMEOUT, headers.get(key)): key
+                for key, url in urls.items()
+            }
+            for future in as_completed(futures):
+                response, error = future.result()
+                yield futures[future], response, error
+    finally:
+        if own_session:
+            session.close()
+
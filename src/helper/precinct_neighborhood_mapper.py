@@ -5,18 +5,69 @@ Downloads weekly crime stats for all precincts and creates unified dataset with
 """
 
 import json
+import time
 import requests
+import openpyxl
+import numpy as np
 import pandas as pd
 from pathlib import Path
-import time
 from io import BytesIO
-from precinct_data_mapping import PRECINCT_DATA
+from concurrent.futures import ProcessPoolExecutor
+from precinct_data_mapping import PRECINCT_DATA, PRECINCT_IDS, precinct_rows
+from precinct_downloader import iter_fetch, MAX_WORKERS, REQUESTS_PER_SECOND
+from crime_cache import CACHE_FILE, ensure_cache, load_cache, save_cache
+from crime_history import append_snapshot
+from safety_scoring import ScoreBoard, safety_ranks, score_frame
+from pipeline_metrics import PipelineMetrics
+from dataset_spec import SheetLayout, DatasetSpec
+import raw_cache
 # Import precinct data
 
 
-# Cache file for storing crime data
-CACHE_FILE = './public/crime_data_cache.csv'
+# Cache file for storing crime data (CACHE_FILE is the binary cache from crime_cache)
 CACHE_DATE_FILE = './public/crime_data_cache_date.txt'
+# Older runs wrote the date next to wherever the script was started from
+LEGACY_CACHE_DATE_FILE = './crime_data_cache_date.txt'
+# Per-URL ETag / Last-Modified / content hash used for conditional refreshes
+MANIFEST_FILE = './.cache/crime_data_manifest.json'
+# Older runs kept the manifest in public/, next to the published data
+LEGACY_MANIFEST_FILE = './public/crime_data_manifest.json'
+
+# NYPD CompStat sheet for a single precinct
+PRECINCT_URL_TEMPLATE = 'https://www.nyc.gov/assets/nypd/downloads/excel/crime_statistics/cs-en-us-{precinct}pct.xlsx'
+
+# Only this top-left block of each sheet is read (crime rows end at row 32, YTD is column 8)
+SHEET_ROWS = 33
+SHEET_COLS = 9
+# Crime types mapping (row indices in the sheet); column 2 is "Week to Date"
+CRIME_TYPES = {
+    'Murder': 13,
+    'Rape': 14,
+    'Robbery': 15,
+    'Felony Assault': 16,
+    'Burglary': 17,
+    'Grand Larceny': 18,
+    'Grand Larceny Auto': 19
+}
+
+# Totals are summed over rows 13-32: Column 2 = Week to Date, Column 5 = 28 Day, Column 8 = Year to Date
+CRIME_ROW_START = 13
+CRIME_ROW_END = 33
+STAT_COLUMNS = [2, 5, 8]
+
+# Per-precinct fields produced by a refresh (weights and scores are derived from these)
+ROW_COLUMNS = ['precinct', 'borough', 'neighborhoods', 'crimeCount', 'monthToDate', 'yearToDate', 'crimeBreakdown']
+
+# Column layout of extract_crime_stats_batch output
+STATS_COLUMNS = ['weekToDate', 'monthToDate', 'yearToDate'] + list(CRIME_TYPES)
+
+# NYPD precinct sheets as a dataset spec (other sheet sources: dataset_spec / dataset_batch)
+NYPD_LAYOUT = SheetLayout(CRIME_TYPES, CRIME_ROW_START, CRIME_ROW_END, STAT_COLUMNS, SHEET_ROWS, SHEET_COLS)
+NYPD_PRECINCTS = DatasetSpec('nypd_precincts', PRECINCT_URL_TEMPLATE, PRECINCT_DATA, NYPD_LAYOUT, cache_file=CACHE_FILE)
+
+# Placeholder strings pd.read_excel treats as missing (kept so counts match the old reader)
+NA_STRINGS = {'', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+              '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'}
 
 def should_refresh_cache():
     """Check if cache should be refreshed based on week"""
@@ -25,12 +76,13 @@ def should_refresh_cache():
     if not Path(CACHE_FILE).exists():
         return True  # No cache, need to download
     
-    if not Path(CACHE_DATE_FILE).exists():
+    date_file = next((f for f in (CACHE_DATE_FILE, LEGACY_CACHE_DATE_FILE) if Path(f).exists()), None)
+    if date_file is None:
         return True  # No date file, need to download
     
     # Read last download date
     try:
-        with open(CACHE_DATE_FILE, 'r') as f:
+        with open(date_file, 'r') as f:
             last_download = datetime.fromisoformat(f.read().strip())
     except:
         return True  # Can't read date, refresh
@@ -59,49 +111,6 @@ def save_cache_date():
     with open(CACHE_DATE_FILE, 'w') as f:
         f.write(datetime.now().isoformat())
     print(f"✓ Cache timestamp saved")
-CACHE_DATE_FILE = 'crime_data_cache_date.txt'
-
-def should_refresh_cache():
-    """Check if cache should be refreshed based on week"""
-    from datetime import datetime, timedelta
-    
-    if not Path(CACHE_FILE).exists():
-        return True  # No cache, need to download
-    
-    if not Path(CACHE_DATE_FILE).exists():
-        return True  # No date file, need to download
-    
-    # Read last download date
-    try:
-        with open(CACHE_DATE_FILE, 'r') as f:
-            last_download = datetime.fromisoformat(f.read().strip())
-    except:
-        return True  # Can't read date, refresh
-    
-    current_date = datetime.now()
-    
-    days_since = (current_date - last_download).days
-    
-    # loading fresh data
-    if days_since >= 7:
-        return True
-    
-    # Check if current day is Monday and last download was before this Monday
-    if current_date.weekday() == 0:  # Monday
-        # Get last Monday
-        days_since_monday = current_date.weekday()
-        last_monday = current_date - timedelta(days=days_since_monday)
-        
-        if last_download.date() < last_monday.date():
-            return True
-    
-    return False
-
-def save_cache_date():
-    """Save current date as cache date"""
-    from datetime import datetime
-    with open(CACHE_DATE_FILE, 'w') as f:
-        f.write(datetime.now().isoformat())
 
 def format_precinct_number(precinct):
     """Format precinct number with leading zeros"""
@@ -113,17 +122,53 @@ def format_precinct_number(precinct):
     else:
         return f"00{precinct_num}"
 
-def download_and_convert_precinct(precinct):
-    """Download XLSX from URL and return as DataFrame"""
+def precinct_url(precinct, url_template=PRECINCT_URL_TEMPLATE):
+    """Build the source URL for a precinct's CompStat sheet"""
+    return url_template.format(precinct=format_precinct_number(precinct))
+
+def parse_precinct_xlsx(content, layout=NYPD_LAYOUT):
+    """Read only the block extract_crime_stats uses (first 33 rows x 9 columns for NYPD) from raw XLSX bytes"""
+    # Streaming read-only mode skips the styles/cell model pd.read_excel builds for the whole sheet
+    workbook = openpyxl.load_workbook(BytesIO(content), read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = [
+            [None if isinstance(value, str) and value in NA_STRINGS else value for value in row]
+            for row in sheet.iter_rows(max_row=layout.sheet_rows, max_col=layout.sheet_cols, values_only=True)
+        ]
+    finally:
+        workbook.close()
+    return pd.DataFrame(rows)
+
+def parse_and_extract(content, layout=NYPD_LAYOUT):
+    """Parse-stage worker: raw XLSX bytes in, crime stats out (runs in a process pool)"""
+    return extract_crime_stats(parse_precinct_xlsx(content, layout), layout)
+
+def parse_and_extract_timed(content, layout=NYPD_LAYOUT):
+    """parse_and_extract plus the worker's own CPU-side time, for the parse metrics"""
+    start = time.perf_counter()
+    return parse_and_extract(content, layout), time.perf_counter() - start
+
+def download_and_convert_precinct(precinct, session=None, url_template=PRECINCT_URL_TEMPLATE, spec=None,
+                                  raw_cache_dir=None, raw_index=None):
+    """
+    Download XLSX from URL and return as DataFrame (from `spec`'s URL and layout when given).
+    The raw bytes are kept in the raw cache only when raw_cache_dir is given; pass a loaded
+    raw_index to batch index writes (the caller saves it).
+    """
     formatted_precinct = format_precinct_number(precinct)
-    base_url = f'https://www.nyc.gov/assets/nypd/downloads/excel/crime_statistics/cs-en-us-{formatted_precinct}pct.xlsx'
+    base_url = spec.url(precinct) if spec else precinct_url(precinct, url_template)
+    layout = spec.layout if spec else NYPD_LAYOUT
     
     try:
-        response = requests.get(base_url, timeout=30)
+        response = (session or requests).get(base_url, timeout=30)
         
         if response.status_code == 200:
+            # Keep the raw bytes so parsing changes can be replayed without downloading again
+            if raw_cache_dir is not None:
+                raw_cache.store(base_url, response.content, cache_dir=raw_cache_dir, index=raw_index)
             # Read XLSX from bytes directly into DataFrame
-            df = pd.read_excel(BytesIO(response.content), header=None)
+            df = parse_precinct_xlsx(response.content, layout)
             return df
         else:
             print(f"✗ {formatted_precinct} - HTTP {response.status_code}")
@@ -134,172 +179,370 @@ def download_and_convert_precinct(precinct):
         return None
 
 
-def extract_crime_stats(df):
+def crime_block(df, layout=NYPD_LAYOUT):
+    """Slice the crime rows (13-32 for NYPD) x stat columns (week, 28 day, YTD) as a (20, 3) object array"""
+    block = df.iloc[layout.crime_row_start:layout.crime_row_end].reindex(columns=layout.stat_columns).to_numpy(dtype=object)
+    
+    # Short sheets: pad missing rows with blanks so every block has the same shape
+    missing = (layout.crime_row_end - layout.crime_row_start) - len(block)
+    if missing > 0:
+        block = np.vstack([block, np.full((missing, len(layout.stat_columns)), None, dtype=object)])
+    return block
+
+def extract_crime_stats_batch(frames, layout=NYPD_LAYOUT):
+    """
+    Extract stats from many precinct DataFrames at once.
+    Returns an int64 array of shape (len(frames), len(STATS_COLUMNS)):
+    week / 28 day / YTD totals followed by the week-to-date count per crime type.
+    """
+    if not frames:
+        return np.zeros((0, len(layout.stat_columns) + len(layout.crime_types)), dtype=np.int64)
+    
+    # One bulk conversion over every cell of every sheet
+    raw = np.stack([crime_block(df, layout) for df in frames])                    # (n, 20, 3)
+    values = pd.to_numeric(raw.ravel(), errors='coerce').astype(float).reshape(raw.shape)
+    values = np.trunc(values)
+    
+    # Rows holding junk text are left out of the totals (blank cells count as 0)
+    junk = pd.notna(raw) & np.isnan(values)
+    valid_rows = ~junk.any(axis=2)                                        # (n, 20)
+    values = np.nan_to_num(values, nan=0.0)
+    
+    totals = (values * valid_rows[:, :, None]).sum(axis=1)               # (n, 3)
+    breakdown = values[:, layout.breakdown_rows - layout.crime_row_start, 0]            # (n, 7) week to date
+    return np.hstack([totals, breakdown]).astype(np.int64)
+
+def stats_from_row(row, layout=NYPD_LAYOUT):
+    """Convert one row of extract_crime_stats_batch output to the stats dict"""
+    row = [int(value) for value in row]
+    return {
+        'weekToDate': row[0],
+        'monthToDate': row[1],
+        'yearToDate': row[2],
+        'crimeBreakdown': dict(zip(layout.crime_types, row[3:]))
+    }
+
+def extract_crime_stats(df, layout=NYPD_LAYOUT):
     """Extract crime statistics from precinct DataFrame including breakdown by type"""
     try:
-        # Crime types mapping (row indices in the CSV)
-        crime_types = {
-            'Murder': 13,
-            'Rape': 14,
-            'Robbery': 15,
-            'Felony Assault': 16,
-            'Burglary': 17,
-            'Grand Larceny': 18,
-            'Grand Larceny Auto': 19
-        }
-        
-        # Extract individual crime counts
-        crime_breakdown = {}
-        for crime_name, row_idx in crime_types.items():
-            try:
-                # Column 2 is "Week to Date" 2026
-                count = int(float(df.iloc[row_idx, 2])) if pd.notna(df.iloc[row_idx, 2]) else 0
-                crime_breakdown[crime_name] = count
-            except (IndexError, ValueError):
-                crime_breakdown[crime_name] = 0
-        
-        # Extract totals from rows 13-32
-        crime_data = df.iloc[13:33]
-        
-        week_to_date_total = 0
-        month_to_date_total = 0
-        year_to_date_total = 0
-        
-        for idx, row in crime_data.iterrows():
-            try:
-                # Column 2 = Week to Date, Column 5 = 28 Day, Column 8 = Year to Date
-                week_val = int(float(row[2])) if pd.notna(row[2]) else 0
-                month_val = int(float(row[5])) if pd.notna(row[5]) else 0
-                year_val = int(float(row[8])) if pd.notna(row[8]) else 0
-                
-                week_to_date_total += week_val
-                month_to_date_total += month_val
-                year_to_date_total += year_val
-            except (ValueError, TypeError):
-                continue
-        
-        return {
-            'weekToDate': week_to_date_total,
-            'monthToDate': month_to_date_total,
-            'yearToDate': year_to_date_total,
-            'crimeBreakdown': crime_breakdown
-        }
+        return stats_from_row(extract_crime_stats_batch([df], layout)[0], layout)
     except Exception as e:
         print(f"Error extracting stats: {e}")
         return None
 
 
-def consolidate_all_data(force_refresh=False):
-    """Consolidate all precinct crime data into a single DataFrame"""
+def load_cached_data():
+    """Load the consolidated crime data cache (crimeBreakdown comes back as dicts)"""
+    return load_cache(CACHE_FILE)
+
+def load_manifest():
+    """Load the per-URL refresh manifest (ETag, Last-Modified, content hash)"""
+    manifest_file = next((f for f in (MANIFEST_FILE, LEGACY_MANIFEST_FILE) if Path(f).exists()), None)
+    if manifest_file is None:
+        return {}
+    try:
+        with open(manifest_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}  # Unreadable manifest, treat every precinct as unseen
+
+def save_manifest(manifest):
+    """Save the per-URL refresh manifest"""
+    Path(MANIFEST_FILE).parent.mkdir(parents=True, exist_ok=True)
+    with open(MANIFEST_FILE, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    Path(LEGACY_MANIFEST_FILE).unlink(missing_ok=True)
+
+def conditional_headers(entry):
+    """Build If-None-Match / If-Modified-Since headers from a manifest entry"""
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('lastModified'):
+        headers['If-Modified-Since'] = entry['lastModified']
+    return headers
+
+def sheet_row(data, stats):
+    """Cache row for one precinct (PRECINCT_DATA entry) from its extracted sheet stats"""
+    return {
+        'precinct': int(data['Precinct']),
+        'borough': data['Borough'],
+        'neighborhoods': data['Neighborhoods'],
+        'crimeCount': stats['weekToDate'],
+        'monthToDate': stats['monthToDate'],
+        'yearToDate': stats['yearToDate'],
+        'crimeBreakdown': stats['crimeBreakdown']
+    }
+
+def sheet_units(specs):
+    """(spec, unit, url) for every unit of every spec, in spec then unit order"""
+    return [(spec, unit, spec.url(unit['Precinct'])) for spec in specs for unit in spec.units]
+
+def unit_label(spec, unit_id, specs):
+    """Unit id for log lines (prefixed with the dataset name when several run together)"""
+    code = spec.unit_code(unit_id)
+    return code if len(specs) == 1 else f"{spec.name}/{code}"
+
+def fetch_sheets(specs=(NYPD_PRECINCTS,), max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                 raw_cache_dir=raw_cache.RAW_CACHE_DIR, metrics=None):
+    """
+    Download stage on its own (pipeline_runner, dataset_batch): fetch every sheet of every spec
+    into the raw download cache over one pool, so max_workers and rate are limits across all
+    sources. Returns {url: sha256} of each sheet's current bytes, in spec / unit order.
+    Sheets whose last bytes are still cached are requested conditionally; a 304, or a failed
+    request, keeps the last cached fetch.
+    """
+    metrics = metrics or PipelineMetrics('download')
+    manifest = load_manifest()
+    raw_index = raw_cache.load_index(raw_cache_dir)
+    units = sheet_units(specs)
+    urls = {(spec.name, unit['Precinct']): url for spec, unit, url in units}
+    spec_by_name = {spec.name: spec for spec in specs}
+    headers = {
+        key: conditional_headers(manifest[url])
+        for key, url in urls.items()
+        if manifest.get(url, {}).get('sha256')
+        and raw_cache.blob_path(manifest[url]['sha256'], raw_cache_dir).exists()
+    }
+    
+    fetched = {}
+    for key, response, error in iter_fetch(urls, max_workers=max_workers, rate=rate, headers=headers):
+        url = urls[key]
+        if response is not None and response.status_code == 200:
+            metrics.count('sheets_downloaded')
+            metrics.count('bytes_downloaded', len(response.content))
+            fetched[url] = raw_cache.store(url, response.content, cache_dir=raw_cache_dir, index=raw_index)
+            manifest[url] = {
+                'etag': response.headers.get('ETag'),
+                'lastModified': response.headers.get('Last-Modified'),
+                'sha256': fetched[url]
+            }
+            continue
+        if response is not None and response.status_code == 304 and key in headers:
+            metrics.count('sheets_not_modified')
+            fetched[url] = manifest[url]['sha256']
+            continue
+        
+        # One bad request should not drop a unit that has been fetched before
+        metrics.count('sheets_failed')
+        label = unit_label(spec_by_name[key[0]], key[1], specs)
+        reason = error if response is None else f"HTTP {response.status_code}"
+        cached = raw_cache.lookup(url, cache_dir=raw_cache_dir, index=raw_index)
+        if cached is None:
+            print(f"✗ {label} - Error: {reason}")
+            continue
+        print(f"✗ {label} - Error: {reason}, using the fetch from {cached['date']}")
+        fetched[url] = cached['sha256']
+    
+    save_manifest(manifest)
+    raw_cache.save_index(raw_index, raw_cache_dir)
+    freed = raw_cache.evict(cache_dir=raw_cache_dir)
+    if freed:
+        print(f"✓ Evicted {freed / 2 ** 20:.1f} MiB of old raw downloads")
+    return {url: fetched[url] for _, _, url in units if url in fetched}
+
+def replay_sheets(specs=(NYPD_PRECINCTS,), replay_date=None, raw_cache_dir=raw_cache.RAW_CACHE_DIR, metrics=None):
+    """
+    Offline stand-in for fetch_sheets: {url: sha256} of the latest raw cache fetch of every
+    sheet (on or before `replay_date`), with no network access.
+    """
+    metrics = metrics or PipelineMetrics('replay')
+    raw_index = raw_cache.load_index(raw_cache_dir)
+    replayed = {}
+    for spec, data, url in sheet_units(specs):
+        entry = raw_cache.lookup(url, replay_date, raw_cache_dir, raw_index)
+        if entry is None:
+            print(f"✗ {unit_label(spec, data['Precinct'], specs)} - Not in raw cache")
+            metrics.count('sheets_failed')
+            continue
+        metrics.count('sheets_replayed')
+        metrics.count('bytes_replayed', entry['size'])
+        replayed[url] = entry['sha256']
+    return replayed
+
+def parse_sheets(sheets, previous=None, specs=(NYPD_PRECINCTS,), raw_cache_dir=raw_cache.RAW_CACHE_DIR,
+                 parse_workers=None, metrics=None):
+    """
+    Parse stage on its own (pipeline_runner, dataset_batch): cache rows for the fetched `sheets`
+    ({url: sha256}) of every spec, read back from the raw download cache and parsed with each
+    spec's layout on one process pool. Rows in `previous` ({url: {'sha256', 'row'}}) whose sheet
+    bytes are unchanged are reused without parsing. Returns {url: {'sha256', 'row'}}.
+    """
+    metrics = metrics or PipelineMetrics('parse')
+    previous = previous or {}
+    units = sheet_units(specs)
+    parsed = {}
+    
+    with ProcessPoolExecutor(max_workers=parse_workers) as parse_pool:
+        futures = {}
+        for spec, data, url in units:
+            digest = sheets.get(url)
+            if digest is None:
+                continue
+            if previous.get(url, {}).get('sha256') == digest:
+                parsed[url] = previous[url]
+                metrics.count('rows_reused')
+                continue
+            
+            path = raw_cache.blob_path(digest, raw_cache_dir)
+            content = path.read_bytes() if path.exists() else None
+            if content is None or raw_cache.content_hash(content) != digest:
+                print(f"✗ {unit_label(spec, data['Precinct'], specs)} - Sheet {digest[:12]} missing from raw cache")
+                metrics.count('sheets_failed')
+                continue
+            futures[url] = (spec, data, digest, parse_pool.submit(parse_and_extract_timed, content, spec.layout))
+        
+        for url, (spec, data, digest, future) in futures.items():
+            try:
+                stats, parse_seconds = future.result()
+            except Exception as e:
+                print(f"✗ {unit_label(spec, data['Precinct'], specs)} - Error: {str(e)}")
+                metrics.count('sheets_failed')
+                continue
+            metrics.count('sheets_parsed')
+            metrics.count('parse_worker_seconds', parse_seconds)
+            if stats:
+                parsed[url] = {'sha256': digest, 'row': sheet_row(data, stats)}
+    
+    # Same order as the unit lists, so cache layouts are stable
+    return {url: parsed[url] for _, _, url in units if url in parsed}
+
+def consolidate_all_data(force_refresh=False, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                         url_template=PRECINCT_URL_TEMPLATE, incremental=True, parse_workers=None,
+                         metrics=None, offline=False, replay_date=None, raw_cache_dir=raw_cache.RAW_CACHE_DIR):
+    """
+    Consolidate all precinct crime data into a single DataFrame.
+    offline=True rebuilds the cache from the raw download cache (latest fetch on or before
+    `replay_date`) with no network access, e.g. after a change to the parsing code.
+    """
+    # Stage timings / counters (outputs are configured by PIPELINE_* environment variables)
+    metrics = metrics or PipelineMetrics.from_env('refresh')
     
-    if not force_refresh:
+    # One-time upgrade of an old JSON-in-CSV cache
+    ensure_cache(CACHE_FILE)
+    
+    if not force_refresh and not offline:
         force_refresh = should_refresh_cache()
     
-    if not force_refresh and Path(CACHE_FILE).exists():
+    if not force_refresh and not offline and Path(CACHE_FILE).exists():
         print("=" * 70 + "\nLOADING CACHED CRIME DATA\n" + "=" * 70)
-        consolidated_df = pd.read_csv(CACHE_FILE)
-        
-        # Ensure crimeBreakdown is parsed back to dictionary
-        if 'crimeBreakdown' in consolidated_df.columns:
-            consolidated_df['crimeBreakdown'] = consolidated_df['crimeBreakdown'].apply(
-                lambda x: json.loads(x) if isinstance(x, str) else x
-            )
-        
+        with metrics.stage('load_cache'):
+            consolidated_df = load_cached_data()
+            consolidated_df['safetyRank'] = safety_ranks(consolidated_df['weightedCrimeVal'])
+        metrics.count('rows', len(consolidated_df))
+        metrics.flush()
         print(f"✓ Loaded {len(consolidated_df)} precincts from cache")
         return consolidated_df
     
     # --- Download Fresh Data ---
-    print("=" * 70 + "\nNYC CRIME DATA CONSOLIDATOR\n" + "=" * 70)
+    print("=" * 70 + f"\nNYC CRIME DATA CONSOLIDATOR{' (OFFLINE REPLAY)' if offline else ''}\n" + "=" * 70)
+    spec = NYPD_PRECINCTS.with_url_template(url_template)
+    units = sheet_units([spec])
+    
+    # Rows from the previous refresh can be reused for precincts whose sheet has not changed
+    # (a replay re-parses everything: it exists to pick up parsing changes). The manifest hash
+    # names the sheet bytes each cached row was parsed from.
+    # The spec's units are the precinct table's rows in order, so cached rows are aligned to
+    # them through the index layer: cached_at[i] is unit i's row in the cache (or -1)
+    cached_records = []
+    cached_at = np.full(len(PRECINCT_IDS), -1)
+    previous = {}
+    if incremental and not offline and Path(CACHE_FILE).exists():
+        manifest = load_manifest()
+        cached_df = load_cached_data()[ROW_COLUMNS]
+        cached_records = cached_df.to_dict('records')
+        table_rows = precinct_rows(cached_df['precinct'])
+        known = table_rows >= 0
+        cached_at[table_rows[known]] = np.flatnonzero(known)
+        previous = {
+            url: {'sha256': manifest[url]['sha256'], 'row': cached_records[cached_at[i]]}
+            for i, (_, _, url) in enumerate(units)
+            if cached_at[i] >= 0 and manifest.get(url, {}).get('sha256')
+        }
+    
+    # Same download and parse stages as pipeline_runner / dataset_batch: sheets are fetched
+    # conditionally into the raw download cache (or replayed from it), then parsed on a process pool
+    if offline:
+        with metrics.stage('replay'):
+            sheets = replay_sheets([spec], replay_date, raw_cache_dir, metrics)
+    else:
+        with metrics.stage('download'):
+            sheets = fetch_sheets([spec], max_workers, rate, raw_cache_dir, metrics)
+    with metrics.stage('parse'):
+        parsed = parse_sheets(sheets, previous, [spec], raw_cache_dir, parse_workers, metrics)
+    
+    # Assemble in PRECINCT_DATA order so the cache layout is stable
     all_data = []
+    changed_rows = []
+    manifest = load_manifest()
+    for i, (_, data, url) in enumerate(units):
+        entry = parsed.get(url)
+        if entry is None:
+            # Manifest entries only describe sheets whose rows made it into the cache
+            if url in sheets:
+                manifest.pop(url, None)
+            # Keep last refresh's numbers rather than drop the precinct from the map
+            if cached_at[i] >= 0:
+                all_data.append(cached_records[cached_at[i]])
+                print(f"✗ {format_precinct_number(data['Precinct'])} - No new data, keeping cached data")
+            continue
+        if manifest.get(url, {}).get('sha256') != entry['sha256']:
+            manifest.pop(url, None)  # A replay of an older fetch
+        all_data.append(entry['row'])
+        if entry is not previous.get(url):
+            changed_rows.append(entry['row'])
     
-    for data in PRECINCT_DATA:
-        precinct = data['Precinct']
-        df = download_and_convert_precinct(precinct)
-        
-        if df is not None:
-            stats = extract_crime_stats(df)
-            if stats:
-                all_data.append({
-                    'precinct': int(precinct),
-                    'borough': data['Borough'],
-                    'neighborhoods': data['Neighborhoods'],
-                    'crimeCount': stats['weekToDate'],
-                    'monthToDate': stats['monthToDate'],
-                    'yearToDate': stats['yearToDate'],
-                    'crimeBreakdown': stats['crimeBreakdown']
-                })
-                print(f"✓ {format_precinct_number(precinct)} processed")
-        
-        time.sleep(0.5)
+    print(f"✓ {len(changed_rows)} precincts changed, {len(all_data) - len(changed_rows)} reused from cache")
     
     consolidated_df = pd.DataFrame(all_data)
-    
+    metrics.count('rows', len(consolidated_df))
+
+    # Nothing fetched or parsed: keep the existing cache rather than overwrite it with no rows
+    if consolidated_df.empty:
+        print("✗ No precinct data could be fetched or parsed, cache left unchanged")
+        metrics.flush()
+        print(metrics.summary())
+        return consolidated_df
+
     # --- CRITICAL FIX: CALCULATE WEIGHTS BEFORE SAVING ---
     if not consolidated_df.empty:
         print("\nCalculating weighted safety metrics...")
         
-        # 1. Apply weighting logic
-        consolidated_df['weightedCrimeVal'] = consolidated_df['crimeBreakdown'].apply(calculate_weighted_score)
+        with metrics.stage('score'):
+            if cached_records:
+                # Start from the previous refresh and re-weight only what changed
+                board = ScoreBoard.from_frame(cached_df)
+                for precinct in set(board.values) - set(consolidated_df['precinct']):
+                    board.remove(precinct)
+                for row in changed_rows:
+                    board.update(row['precinct'], row['crimeBreakdown'])
+                board.apply(consolidated_df)
+            else:
+                score_frame(consolidated_df)
+
+    with metrics.stage('save'):
+        # Save to cache with all new columns included
+        save_cache(consolidated_df, CACHE_FILE)
         
-        # 2. Normalize Safety Score
-        min_val = consolidated_df['weightedCrimeVal'].min()
-        max_val = consolidated_df['weightedCrimeVal'].max()
+        # Keep this week's numbers once the cache is overwritten (replays are not new weeks)
+        if not consolidated_df.empty and not offline:
+            append_snapshot(consolidated_df)
         
-        if max_val > min_val:
-            consolidated_df['safetyScore'] = 1 - ((consolidated_df['weightedCrimeVal'] - min_val) / (max_val - min_val))
-        else:
-            consolidated_df['safetyScore'] = 1.0
-
-    # 3. Save to cache with all new columns included
-    df_to_save = consolidated_df.copy()
-    df_to_save['crimeBreakdown'] = df_to_save['crimeBreakdown'].apply(json.dumps)
-    df_to_save.to_csv(CACHE_FILE, index=False)
-    
-    save_cache_date()
+        save_manifest(manifest)
+        if not offline:
+            save_cache_date()
     print(f"✓ Data fully consolidated and cached with Weighted Metrics.")
     
+    metrics.flush()
+    print(metrics.summary())
     return consolidated_df
 
-def calculate_weighted_score(breakdown):
-    """Calculates a total weighted crime value for a precinct"""
-    # Severity weights: Violent crimes carry much more weight than property theft
-    weights = {
-        'Murder': 50,
-        'Rape': 25,
-        'Robbery': 10,
-        'Felony Assault': 8,
-        'Burglary': 5,
-        'Grand Larceny Auto': 3,
-        'Grand Larceny': 1
-    }
-    
-    if not isinstance(breakdown, dict):
-        return 0
-        
-    return sum(breakdown.get(crime, 0) * weight for crime, weight in weights.items())
-
 if __name__ == "__main__":
     # 1. Load data (Cache or Fresh)
     consolidated_df = consolidate_all_data(force_refresh=False)
     
     if not consolidated_df.empty:
-        # 2. Apply Weighting
-        # This converts specific crime counts into a single "Severity Value"
-        consolidated_df['weightedCrimeVal'] = consolidated_df['crimeBreakdown'].apply(calculate_weighted_score)
-        
-        # 3. Normalize the Safety Score (0.0 to 1.0)
-        # 1.0 = Safest (lowest weighted crime), 0.0 = Least Safe (highest weighted crime)
-        min_val = consolidated_df['weightedCrimeVal'].min()
-        max_val = consolidated_df['weightedCrimeVal'].max()
-        
-        if max_val > min_val:
-            consolidated_df['safetyScore'] = 1 - ((consolidated_df['weightedCrimeVal'] - min_val) / (max_val - min_val))
-        else:
-            consolidated_df['safetyScore'] = 1.0
-            
-        # 4. Add a Safety Rank (1 = Safest Precinct in NYC)
-        consolidated_df['safetyRank'] = consolidated_df['safetyScore'].rank(ascending=False, method='min').astype(int)
-
+        # Scores and safetyRank (1 = Safest Precinct in NYC) come from consolidate_all_data
         # Sort by safety for the final display
         consolidated_df = consolidated_df.sort_values('safetyRank')
 
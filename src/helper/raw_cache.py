@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Raw Download Cache
+Content-addressed store of the raw XLSX responses, so parsing changes can be replayed
+offline instead of re-downloading every sheet from nyc.gov. Blobs are stored once per
+sha256 (unchanged weeks cost nothing), indexed by URL and fetch date, and the oldest
+fetches are evicted once the store grows past a size limit.
+
+    python src/helper/raw_cache.py stats
+    python src/helper/raw_cache.py evict [--max-bytes N]
+    python src/helper/raw_cache.py replay [--date YYYY-MM-DD]   # rebuild the crime cache offline
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from datetime import date as Date
+
+RAW_CACHE_DIR = './.cache/raw'
+INDEX_FILE = 'index.json'
+# Evict old fetches once the blobs take more than this (the latest fetch of each URL is always kept)
+MAX_CACHE_BYTES = 512 * 2 ** 20
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def blob_path(digest, cache_dir=RAW_CACHE_DIR):
+    return Path(cache_dir) / 'blobs' / digest[:2] / digest
+
+
+def write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(f".tmp-{path.name}")
+    tmp_file.write_bytes(data)
+    os.replace(tmp_file, path)
+
+
+# --- Index: url -> [{'date', 'sha256', 'size'}, ...] oldest first ---
+
+def load_index(cache_dir=RAW_CACHE_DIR):
+    index_file = Path(cache_dir) / INDEX_FILE
+    if not index_file.exists():
+        return {}
+    try:
+        with open(index_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}  # Unreadable index: blobs are still there, they just can't be looked up
+
+
+def save_index(index, cache_dir=RAW_CACHE_DIR):
+    write_atomic(Path(cache_dir) / INDEX_FILE, json.dumps(index, indent=1, sort_keys=True).encode('utf-8'))
+
+
+# --- Reads / writes ---
+
+def store(url, content, fetched=None, cache_dir=RAW_CACHE_DIR, index=None):
+    """
+    Keep the raw bytes of a response. Identical content is stored once; a second fetch
+    of the same URL on the same day replaces that day's entry. Returns the sha256.
+    Pass a loaded `index` to batch several stores, then save_index it once.
+    """
+    digest = content_hash(content)
+    path = blob_path(digest, cache_dir)
+    if not path.exists():
+        write_atomic(path, content)
+
+    standalone = index is None
+    index = load_index(cache_dir) if standalone else index
+    fetched = (fetched or Date.today()).isoformat()
+    entries = [e for e in index.get(url, []) if e['date'] != fetched]
+    entries.append({'date': fetched, 'sha256': digest, 'size': len(content)})
+    index[url] = sorted(entries, key=lambda e: e['date'])
+
+    if standalone:
+        save_index(index, cache_dir)
+    return digest
+
+
+def lookup(url, on_or_before=None, cache_dir=RAW_CACHE_DIR, index=None):
+    """Index entry for the latest fetch of `url` (on or before a date, if given)"""
+    index = load_index(cache_dir) if index is None else index
+    entries = index.get(url, [])
+    if on_or_before is not None:
+        entries = [e for e in entries if e['date'] <= on_or_before.isoformat()]
+    return entries[-1] if entries else None
+
+
+def load(url, on_or_before=None, cache_dir=RAW_CACHE_DIR, index=None):
+    """Raw bytes of the latest cached fetch of `url`, or None"""
+    entry = lookup(url, on_or_before, cache_dir, index)
+    if entry is None:
+        return None
+    path = blob_path(entry['sha256'], cache_dir)
+    if not path.exists():
+        return None
+    content = path.read_bytes()
+    if content_hash(content) != entry['sha256']:
+        print(f"✗ Corrupt blob for {url} ({entry['sha256'][:12]}), ignoring")
+        return None
+    return content
+
+
+# --- Maintenance ---
+
+def blob_sizes(cache_dir=RAW_CACHE_DIR):
+    blobs = Path(cache_dir) / 'blobs'
+    if not blobs.exists():
+        return {}
+    return {p.name: p.stat().st_size for p in blobs.glob('*/*') if not p.name.startswith('.tmp-')}
+
+
+def stats(cache_dir=RAW_CACHE_DIR):
+    index = load_index(cache_dir)
+    sizes = blob_sizes(cache_dir)
+    fetches = sum(len(entries) for entries in index.values())
+    return {
+        'urls': len(index),
+        'fetches': fetches,
+        'blobs': len(sizes),
+        'bytes': sum(sizes.values()),
+        'logicalBytes': sum(e['size'] for entries in index.values() for e in entries),
+        'oldest': min((entries[0]['date'] for entries in index.values() if entries), default=None),
+        'newest': max((entries[-1]['date'] for entries in index.values() if entries), default=None),
+    }
+
+
+def evict(max_bytes=MAX_CACHE_BYTES, cache_dir=RAW_CACHE_DIR):
+    """
+    Drop the oldest fetches until the blobs fit in max_bytes. The latest fetch of every URL
+    is never dropped; a blob is deleted once no remaining entry refers to it.
+    Returns the number of bytes freed.
+    """
+    index = load_index(cache_dir)
+    sizes = blob_sizes(cache_dir)
+    referenced = {e['sha256'] for entries in index.values() for e in entries}
+
+    # Blobs nothing refers to (e.g. from an interrupted run) go first
+    freed = 0
+    for digest in set(sizes) - referenced:
+        blob_path(digest, cache_dir).unlink()
+        freed += sizes.pop(digest)
+
+    total = sum(sizes.values())
+    if total > max_bytes:
+        candidates = sorted(((e['date'], url, e) for url, entries in index.items() for e in entries[:-1]),
+                            key=lambda item: item[0])
+        refs = {}
+        for entries in index.values():
+            for e in entries:
+                refs[e['sha256']] = refs.get(e['sha256'], 0) + 1
+
+        for _, url, entry in candidates:
+            if total <= max_bytes:
+                break
+            index[url].remove(entry)
+            refs[entry['sha256']] -= 1
+            if refs[entry['sha256']] == 0 and entry['sha256'] in sizes:
+                blob_path(entry['sha256'], cache_dir).unlink()
+                size = sizes.pop(entry['sha256'])
+                total -= size
+                freed += size
+
+    save_index(index, cache_dir)
+    return freed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raw download cache")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('stats')
+    evict_parser = commands.add_parser('evict')
+    evict_parser.add_argument('--max-bytes', type=int, default=MAX_CACHE_BYTES)
+    replay_parser = commands.add_parser('replay', help="rebuild the crime cache from cached sheets, offline")
+    replay_parser.add_argument('--date', type=Date.fromisoformat, default=None,
+                               help="use the latest fetch on or before this date")
+    args = parser.parse_args()
+
+    if args.command == 'stats':
+        print(json.dumps(stats(), indent=2))
+    elif args.command == 'evict':
+        print(f"✓ Freed {evict(args.max_bytes) / 2 ** 20:.1f} MiB")
+    else:
+        from precinct_neighborhood_mapper import consolidate_all_data
+        df = consolidate_all_data(offline=True, replay_date=args.date)
+        return 0 if not df.empty else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
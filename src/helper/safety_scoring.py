@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Precinct Safety Scoring
+Turns the per-type crime counts into a severity-weighted value, a 0-1 safety score
+(1.0 = safest, min/max normalized across precincts) and a rank (1 = safest).
+Full scoring is one matrix-vector product; named profiles and what-if weight sweeps
+are one matrix-matrix product. ScoreBoard keeps the scores and ranks current when
+individual precincts change, without rescoring the whole table.
+"""
+
+from bisect import bisect_left, insort
+import numpy as np
+import pandas as pd
+from crime_cache import BREAKDOWN_COLUMNS, breakdown_matrix
+
+# Severity weights: Violent crimes carry much more weight than property theft
+SEVERITY_WEIGHTS = {
+    'Murder': 50,
+    'Rape': 25,
+    'Robbery': 10,
+    'Felony Assault': 8,
+    'Burglary': 5,
+    'Grand Larceny Auto': 3,
+    'Grand Larceny': 1
+}
+
+# Same weights in BREAKDOWN_COLUMNS order, for matrix products
+WEIGHT_VECTOR = np.array([SEVERITY_WEIGHTS[crime] for crime in BREAKDOWN_COLUMNS], dtype=float)
+
+# Named scoring profiles (crime type -> weight). Crime types left out of a profile count 0.
+SCORING_PROFILES = {
+    'severity': SEVERITY_WEIGHTS,
+    'violent': {'Murder': 50, 'Rape': 25, 'Robbery': 10, 'Felony Assault': 8},
+    'property': {'Robbery': 4, 'Burglary': 5, 'Grand Larceny Auto': 4, 'Grand Larceny': 3},
+}
+
+# Score thresholds for labels, highest first; anything at or below the last one is DEFAULT_LABEL
+LABEL_THRESHOLDS = (
+    (0.8, "Very Safe"),
+    (0.6, "Safe"),
+    (0.4, "Moderate"),
+    (0.2, "High Crime"),
+)
+DEFAULT_LABEL = "Extreme Alert"
+
+
+def get_safety_label(score, thresholds=LABEL_THRESHOLDS):
+    for threshold, label in thresholds:
+        if score > threshold:
+            return label
+    return DEFAULT_LABEL
+
+
+def safety_labels(scores, thresholds=LABEL_THRESHOLDS):
+    """Vectorized get_safety_label"""
+    scores = np.asarray(scores, dtype=float)
+    conditions = [scores > threshold for threshold, _ in thresholds]
+    return np.select(conditions, [label for _, label in thresholds], default=DEFAULT_LABEL)
+
+
+def calculate_weighted_score(breakdown):
+    """Weighted crime value for a single crimeBreakdown dict"""
+    if not isinstance(breakdown, dict):
+        return 0
+    return sum(breakdown.get(crime, 0) * weight for crime, weight in SEVERITY_WEIGHTS.items())
+
+
+def weighted_crime_values(breakdowns, weights=WEIGHT_VECTOR):
+    """(precincts x crime types) counts . weight vector -> weighted crime value per precinct"""
+    return np.asarray(breakdowns, dtype=float) @ weights
+
+
+def normalize_scores(values, min_val=None, max_val=None):
+    """Min/max normalize weighted values into safety scores (lowest crime -> 1.0)"""
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return values
+    min_val = values.min() if min_val is None else min_val
+    max_val = values.max() if max_val is None else max_val
+    if max_val > min_val:
+        return 1 - (values - min_val) / (max_val - min_val)
+    return np.ones(len(values))
+
+
+def safety_ranks(values):
+    """
+    Rank precincts by weighted value (1 = safest). Ties share the lowest rank, matching
+    safetyScore.rank(ascending=False, method='min').
+    """
+    values = np.asarray(values, dtype=float)
+    return np.searchsorted(np.sort(values), values, side='left') + 1
+
+
+def column_ranks(values):
+    """safety_ranks applied to every column of a (precincts x k) matrix at once"""
+    values = np.asarray(values, dtype=float)
+    n = values.shape[0]
+    order = np.argsort(values, axis=0, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=0)
+
+    # Within each column, tied values take the position of the first one in the run
+    positions = np.broadcast_to(np.arange(n)[:, None], values.shape)
+    starts = np.ones(values.shape, dtype=bool)
+    starts[1:] = ordered[1:] != ordered[:-1]
+    ordered_ranks = np.maximum.accumulate(np.where(starts, positions, 0), axis=0) + 1
+
+    ranks = np.empty(values.shape, dtype=np.int64)
+    np.put_along_axis(ranks, order, ordered_ranks, axis=0)
+    return ranks
+
+
+def normalize_columns(values):
+    """normalize_scores applied to every column of a (precincts x k) matrix"""
+    values = np.asarray(values, dtype=float)
+    if values.shape[0] == 0:
+        return values
+    min_val, max_val = values.min(axis=0), values.max(axis=0)
+    spread = max_val - min_val
+    return np.where(spread > 0, 1 - (values - min_val) / np.where(spread > 0, spread, 1), 1.0)
+
+
+def score_frame(df, weights=WEIGHT_VECTOR):
+    """Add weightedCrimeVal, safetyScore and safetyRank columns to a consolidated DataFrame"""
+    values = weighted_crime_values(breakdown_matrix(df), weights)
+    df['weightedCrimeVal'] = values
+    df['safetyScore'] = normalize_scores(values)
+    df['safetyRank'] = safety_ranks(values)
+    return df
+
+
+# --- Profiles and what-if sweeps ---
+
+def weight_vector(weights):
+    """Crime type -> weight dict as a BREAKDOWN_COLUMNS-ordered vector"""
+    unknown = set(weights) - set(BREAKDOWN_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown crime types in weights: {sorted(unknown)}")
+    return np.array([weights.get(crime, 0) for crime in BREAKDOWN_COLUMNS], dtype=float)
+
+
+def profile_weights(profiles=SCORING_PROFILES):
+    """(crime types x profiles) weight matrix, one column per profile"""
+    names = list(profiles)
+    matrix = np.column_stack([weight_vector(profiles[name]) for name in names]) if names \
+        else np.zeros((len(BREAKDOWN_COLUMNS), 0))
+    return names, matrix
+
+
+def score_profiles(breakdowns, profiles=SCORING_PROFILES):
+    """
+    Score every precinct under every profile in one matrix product.
+    Returns (profile names, weighted values, safety scores, safety ranks), each
+    array (precincts x profiles).
+    """
+    names, weights = profile_weights(profiles)
+    values = np.asarray(breakdowns, dtype=float) @ weights
+    return names, values, normalize_columns(values), column_ranks(values)
+
+
+def profile_frame(df, profiles=SCORING_PROFILES):
+    """Per-profile weightedCrimeVal / safetyScore / safetyRank columns, indexed by precinct"""
+    names, values, scores, ranks = score_profiles(breakdown_matrix(df), profiles)
+    columns = {}
+    for i, name in enumerate(names):
+        columns[(name, 'weightedCrimeVal')] = values[:, i]
+        columns[(name, 'safetyScore')] = scores[:, i]
+        columns[(name, 'safetyRank')] = ranks[:, i]
+    return pd.DataFrame(columns, index=pd.Index(df['precinct'].to_numpy(), name='precinct'))
+
+
+def what_if(breakdowns, candidate_weights):
+    """
+    Score every precinct under many candidate weight vectors at once.
+    candidate_weights is (candidates x crime types); returns (values, scores, ranks),
+    each (precincts x candidates).
+    """
+    candidate_weights = np.atleast_2d(np.asarray(candidate_weights, dtype=float))
+    if candidate_weights.shape[1] != len(BREAKDOWN_COLUMNS):
+        raise ValueError(f"candidate weights need {len(BREAKDOWN_COLUMNS)} columns ({BREAKDOWN_COLUMNS})")
+    values = np.asarray(breakdowns, dtype=float) @ candidate_weights.T
+    return values, normalize_columns(values), column_ranks(values)
+
+
+def perturbed_weights(n, spread=0.5, base=WEIGHT_VECTOR, seed=None):
+    """n candidate weight vectors: base scaled per crime type by log-normal noise of the given spread"""
+    rng = np.random.default_rng(seed)
+    return base * rng.lognormal(0.0, spread, size=(n, len(base)))
+
+
+def rank_sensitivity(breakdowns, candidate_weights, base=WEIGHT_VECTOR):
+    """
+    How much the ranking moves across a weight sweep. Returns per-precinct rank
+    min / max / mean / std over the candidates, and each candidate's Spearman
+    correlation with the ranking under `base`.
+    """
+    _, _, ranks = what_if(breakdowns, candidate_weights)
+    base_ranks = safety_ranks(weighted_crime_values(breakdowns, base)).astype(float)
+
+    centered = ranks - ranks.mean(axis=0)
+    base_centered = base_ranks - base_ranks.mean()
+    denominator = np.sqrt((centered ** 2).sum(axis=0) * (base_centered ** 2).sum())
+    correlation = np.divide(base_centered @ centered, denominator,
+                            out=np.ones(ranks.shape[1]), where=denominator > 0)
+
+    summary = {
+        'rankMin': ranks.min(axis=1),
+        'rankMax': ranks.max(axis=1),
+        'rankMean': ranks.mean(axis=1),
+        'rankStd': ranks.std(axis=1),
+    }
+    return summary, correlation
+
+
+class ScoreBoard:
+    """
+    Scores and ranks kept current under single-precinct updates.
+    Weighted values are held in a sorted list, so the extrema are its ends and a rank is
+    one bisection; an update re-weights one row instead of the whole table.
+    """
+    def __init__(self, precincts, breakdowns, weights=WEIGHT_VECTOR):
+        self.weights = np.asarray(weights, dtype=float)
+        self.values = {int(p): float(v) for p, v in zip(precincts, weighted_crime_values(breakdowns, self.weights))}
+        self.sorted_values = sorted(self.values.values())
+
+    @classmethod
+    def from_frame(cls, df, weights=WEIGHT_VECTOR):
+        return cls(df['precinct'].to_numpy(), breakdown_matrix(df), weights)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, precinct):
+        return int(precinct) in self.values
+
+    @property
+    def extrema(self):
+        if not self.sorted_values:
+            return None, None
+        return self.sorted_values[0], self.sorted_values[-1]
+
+    def update(self, precinct, breakdown):
+        """
+        Set one precinct's crime counts (a crimeBreakdown dict or a BREAKDOWN_COLUMNS vector).
+        Returns True if the min or max moved, i.e. every other precinct's score changed too.
+        """
+        if isinstance(breakdown, dict):
+            breakdown = [breakdown.get(crime, 0) for crime in BREAKDOWN_COLUMNS]
+        value = float(np.dot(np.asarray(breakdown, dtype=float), self.weights))
+
+        before = self.extrema
+        precinct = int(precinct)
+        if precinct in self.values:
+            del self.sorted_values[bisect_left(self.sorted_values, self.values[precinct])]
+        self.values[precinct] = value
+        insort(self.sorted_values, value)
+        return self.extrema != before
+
+    def remove(self, precinct):
+        """Drop a precinct. Returns True if the min or max moved"""
+        before = self.extrema
+        value = self.values.pop(int(precinct))
+        del self.sorted_values[bisect_left(self.sorted_values, value)]
+        return self.extrema != before
+
+    def weighted_value(self, precinct):
+        return self.values[int(precinct)]
+
+    def score(self, precinct):
+        min_val, max_val = self.extrema
+        return float(normalize_scores([self.values[int(precinct)]], min_val, max_val)[0])
+
+    def rank(self, precinct):
+        return bisect_left(self.sorted_values, self.values[int(precinct)]) + 1
+
+    def scores(self, precincts):
+        """Vectorized (weightedCrimeVal, safetyScore, safetyRank) for many precincts"""
+        values = np.array([self.values[int(p)] for p in precincts], dtype=float)
+        min_val, max_val = self.extrema
+        ranks = np.searchsorted(np.asarray(self.sorted_values), values, side='left') + 1
+        return values, normalize_scores(values, min_val, max_val), ranks
+
+    def apply(self, df):
+        """Write the current weightedCrimeVal / safetyScore / safetyRank into df (by precinct)"""
+        values, scores, ranks = self.scores(df['precinct'])
+        df['weightedCrimeVal'] = values
+        df['safetyScore'] = scores
+        df['safetyRank'] = ranks
+        return df
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Sparse Area Aggregation
+Projects unit-level metrics (precincts) onto target features (ZIP codes, census blocks,
+tax lots, ...) through a sparse assignment/weight matrix held as COO arrays, so every
+target metric comes out of a single sparse x dense product.
+"""
+
+import numpy as np
+
+
+def column_index(unit_ids, ids):
+    """Map unit ids to matrix columns (-1 where the id is not a known unit). unit_ids must be sorted"""
+    ids = np.asarray(ids)
+    if len(unit_ids) == 0:
+        return np.full(len(ids), -1, dtype=np.int64)
+    positions = np.searchsorted(unit_ids, ids).clip(0, len(unit_ids) - 1)
+    return np.where(unit_ids[positions] == ids, positions, -1)
+
+
+def sparse_matmul(rows, cols, values, matrix, n_rows):
+    """(n_rows x units) COO matrix times a dense (units x k) matrix -> dense (n_rows x k)"""
+    weighted = matrix[cols] * values[:, None]
+    result = np.empty((n_rows, matrix.shape[1]))
+    for j in range(matrix.shape[1]):
+        result[:, j] = np.bincount(rows, weights=weighted[:, j], minlength=n_rows)
+    return result
+
+
+def dominant_columns(rows, cols, values, n_rows):
+    """Column carrying the largest weight in each row (-1 for rows with no entries)"""
+    result = np.full(n_rows, -1, dtype=np.int64)
+    if len(rows) == 0:
+        return result
+
+    order = np.lexsort((-values, rows))
+    sorted_rows = rows[order]
+    first = np.r_[True, sorted_rows[1:] != sorted_rows[:-1]]
+    result[sorted_rows[first]] = cols[order][first]
+    return result
+
+
+def covered_rows(rows, n_rows):
+    """Boolean mask of rows that have at least one entry"""
+    return np.bincount(rows, minlength=n_rows) > 0
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+ZIP x Precinct Spatial Join
+Overlays the ZIP code polygons on Police Precincts.geojson with an STRtree index and
+stores the pairwise intersection areas, so crime values can be applied to ZIPs as
+area-weighted sums instead of a one-precinct-per-ZIP lookup. The overlap matrix is
+cached on disk and only recomputed when either boundary file changes.
+"""
+
+import os
+import hashlib
+import numpy as np
+import shapely
+from pathlib import Path
+from geojson_reader import iter_features, to_shapely
+
+PRECINCT_GEOJSON = './public/Police Precincts.geojson'
+ZIP_GEOJSON = './public/nyc-zip-code-tabulation-areas-polygons.geojson'
+# Derived data: kept with the other caches, not published with the site
+WEIGHTS_CACHE = './.cache/zip_precinct_weights.npz'
+
+# Overlaps smaller than this share of a ZIP are boundary slivers, not real coverage
+MIN_ZIP_SHARE = 0.01
+
+
+def file_hash(path):
+    """sha256 of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_geometries(geojson_file):
+    """Load a FeatureCollection as (properties list, array of shapely geometries)"""
+    properties, geometries = [], []
+    for feature in iter_features(geojson_file, packed=True):
+        properties.append(feature['properties'])
+        geometries.append(to_shapely(feature['geometry']))
+    geometries = np.array(geometries, dtype=object)
+    # Repair self-intersections so intersection areas are well defined
+    invalid = ~shapely.is_valid(geometries)
+    if invalid.any():
+        geometries[invalid] = shapely.make_valid(geometries[invalid])
+    return properties, geometries
+
+
+def compute_overlaps(zip_geometries, precinct_geometries):
+    """
+    Intersect every ZIP with the precincts whose bounding boxes it touches.
+    Returns COO arrays (zip row, precinct column, intersection area).
+    """
+    tree = shapely.STRtree(precinct_geometries)
+    zip_idx, precinct_idx = tree.query(zip_geometries, predicate='intersects')
+
+    overlap = shapely.area(shapely.intersection(zip_geometries[zip_idx], precinct_geometries[precinct_idx]))
+    keep = overlap > 0
+    return zip_idx[keep], precinct_idx[keep], overlap[keep]
+
+
+def build_weights(zip_geojson=ZIP_GEOJSON, precinct_geojson=PRECINCT_GEOJSON):
+    """Run the spatial join and return the overlap table"""
+    zip_props, zip_geometries = load_geometries(zip_geojson)
+    precinct_props, precinct_geometries = load_geometries(precinct_geojson)
+
+    rows, cols, overlap = compute_overlaps(zip_geometries, precinct_geometries)
+    print(f"✓ Spatial join: {len(zip_geometries)} ZIPs x {len(precinct_geometries)} precincts -> {len(overlap)} overlaps")
+
+    return {
+        'zip_codes': np.array([str(p.get('postalCode', '')) for p in zip_props]),
+        'precincts': np.array([int(float(p['precinct'])) for p in precinct_props], dtype=np.int32),
+        'rows': rows.astype(np.int32),
+        'cols': cols.astype(np.int32),
+        'overlap': overlap,
+        'zip_area': shapely.area(zip_geometries),
+        'zip_hash': np.array(file_hash(zip_geojson)),
+        'precinct_hash': np.array(file_hash(precinct_geojson)),
+    }
+
+
+def load_zip_precinct_weights(zip_geojson=ZIP_GEOJSON, precinct_geojson=PRECINCT_GEOJSON,
+                              cache_file=WEIGHTS_CACHE):
+    """Load the cached overlap table, rebuilding it if either boundary file changed"""
+    zip_hash, precinct_hash = file_hash(zip_geojson), file_hash(precinct_geojson)
+
+    if Path(cache_file).exists():
+        cached = dict(np.load(cache_file, allow_pickle=False))
+        if str(cached['zip_hash']) == zip_hash and str(cached['precinct_hash']) == precinct_hash:
+            print(f"✓ Loaded ZIP/precinct weights from {cache_file}")
+            return cached
+
+    weights = build_weights(zip_geojson, precinct_geojson)
+    Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = Path(cache_file).with_name(f".tmp-{Path(cache_file).name}")
+    np.savez(tmp_file, **weights)
+    os.replace(tmp_file, cache_file)
+    print(f"✓ Cached ZIP/precinct weights to {cache_file}")
+    return weights
+
+
+def zip_shares(weights, available_precincts=None):
+    """
+    Share of each ZIP's covered area that falls in each precinct, as COO arrays
+    (zip row, precinct id, share). Slivers are dropped, and when `available_precincts`
+    is given, shares are renormalized over the precincts that actually have data.
+    """
+    rows, cols, overlap = weights['rows'], weights['cols'], weights['overlap']
+    precinct_ids = weights['precincts'][cols]
+
+    keep = overlap / weights['zip_area'][rows] >= MIN_ZIP_SHARE
+    if available_precincts is not None:
+        keep &= np.isin(precinct_ids, list(available_precincts))
+    rows, precinct_ids, overlap = rows[keep], precinct_ids[keep], overlap[keep]
+
+    covered = np.bincount(rows, weights=overlap, minlength=len(weights['zip_codes']))
+    return rows, precinct_ids, overlap / covered[rows]
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+Vector Tile Pyramid
+Cuts the enriched ZIP / precinct layers into a z/x/y pyramid of Mapbox Vector Tiles (.pbf).
+Geometry is simplified once per zoom (Douglas-Peucker at roughly one tile pixel) and
+clipped per tile; tiles are encoded in parallel across a process pool.
+"""
+
+import json
+import math
+import shutil
+import numpy as np
+import shapely
+from pathlib import Path
+from geojson_reader import to_shapely
+from concurrent.futures import ProcessPoolExecutor
+
+TILES_DIR = './public/tiles'
+MIN_ZOOM = 8
+MAX_ZOOM = 14
+
+# MVT tile resolution and clip buffer (in tile units) so strokes don't show seams at edges
+EXTENT = 4096
+BUFFER = 64
+# Douglas-Peucker tolerance in tile units at each zoom
+SIMPLIFY_TOLERANCE = 4
+TILES_PER_JOB = 64
+
+# Web Mercator
+EARTH_HALF_CIRCUMFERENCE = 20037508.342789244
+
+
+# --- Projection / tiling ---
+
+def lonlat_to_mercator(coords):
+    """(n, 2) lon/lat degrees -> (n, 2) Web Mercator meters"""
+    lon = coords[:, 0]
+    lat = np.clip(coords[:, 1], -85.0511, 85.0511)
+    x = lon * EARTH_HALF_CIRCUMFERENCE / 180.0
+    y = np.log(np.tan((90.0 + lat) * np.pi / 360.0)) * EARTH_HALF_CIRCUMFERENCE / math.pi
+    return np.column_stack([x, y])
+
+
+def tile_size(z):
+    """Width of a tile at zoom z, in Mercator meters"""
+    return 2 * EARTH_HALF_CIRCUMFERENCE / (1 << z)
+
+
+def tile_bounds(z, x, y):
+    size = tile_size(z)
+    minx = -EARTH_HALF_CIRCUMFERENCE + x * size
+    maxy = EARTH_HALF_CIRCUMFERENCE - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def tiles_for_bounds(z, bounds):
+    """All (x, y) tiles at zoom z touching Mercator bounds (minx, miny, maxx, maxy)"""
+    size = tile_size(z)
+    last = (1 << z) - 1
+    minx, miny, maxx, maxy = bounds
+    x0 = min(max(int((minx + EARTH_HALF_CIRCUMFERENCE) // size), 0), last)
+    x1 = min(max(int((maxx + EARTH_HALF_CIRCUMFERENCE) // size), 0), last)
+    y0 = min(max(int((EARTH_HALF_CIRCUMFERENCE - maxy) // size), 0), last)
+    y1 = min(max(int((EARTH_HALF_CIRCUMFERENCE - miny) // size), 0), last)
+    return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+# --- Minimal protobuf / MVT encoding ---
+
+def varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def field_key(field, wire_type):
+    return varint((field << 3) | wire_type)
+
+
+def length_delimited(field, payload):
+    return field_key(field, 2) + varint(len(payload)) + payload
+
+
+def packed_varints(field, values):
+    return length_delimited(field, b''.join(varint(v) for v in values))
+
+
+def encode_value(value):
+    """MVT Value message for a scalar property"""
+    if isinstance(value, bool):
+        return field_key(7, 0) + varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        return field_key(6, 0) + varint(zigzag(int(value)))
+    if isinstance(value, (float, np.floating)):
+        return field_key(3, 1) + np.float64(value).tobytes()
+    return length_delimited(1, str(value).encode('utf-8'))
+
+
+def command(command_id, count):
+    return (command_id & 0x7) | (count << 3)
+
+
+def ring_area(ring):
+    """Shoelace area in tile coordinates (y down): exterior rings must be positive"""
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+def polygon_commands(polygons):
+    """Geometry command stream for a list of polygons given as lists of integer rings"""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for rings in polygons:
+        for ring_index, ring in enumerate(rings):
+            area = ring_area(ring)
+            exterior = ring_index == 0
+            if area == 0:
+                if exterior:
+                    break  # Degenerate exterior: drop the polygon along with its holes
+                continue
+            if (area > 0) != exterior:
+                ring = ring[::-1]
+
+            deltas = np.diff(np.vstack([cursor, ring]), axis=0)
+            cursor = ring[-1]
+            commands.append(command(1, 1))
+            commands.extend(zigzag(int(v)) for v in deltas[0])
+            commands.append(command(2, len(ring) - 1))
+            commands.extend(zigzag(int(v)) for v in deltas[1:].ravel())
+            commands.append(command(7, 1))
+    return commands
+
+
+def tile_rings(geometry, bounds):
+    """Clipped geometry -> list of polygons, each a list of integer (n, 2) tile-coordinate rings"""
+    minx, miny, maxx, maxy = bounds
+    scale = EXTENT / (maxx - minx)
+
+    def to_tile(coords):
+        points = np.rint(np.column_stack([(coords[:, 0] - minx) * scale, (maxy - coords[:, 1]) * scale]))
+        points = points.astype(np.int64)
+        keep = np.r_[True, np.any(points[1:] != points[:-1], axis=1)]
+        points = points[keep]
+        if len(points) > 1 and (points[0] == points[-1]).all():
+            points = points[:-1]
+        return points
+
+    polygons = []
+    for part in shapely.get_parts(geometry):
+        if part.geom_type != 'Polygon' or part.is_empty:
+            continue
+        rings = [to_tile(np.asarray(part.exterior.coords))]
+        if len(rings[0]) < 3:
+            continue
+        rings += [r for r in (to_tile(np.asarray(i.coords)) for i in part.interiors) if len(r) >= 3]
+        polygons.append(rings)
+    return polygons
+
+
+def encode_layer(name, features, bounds):
+    """Encode one MVT layer from (geometry, properties) pairs already clipped to the tile"""
+    keys, key_index = [], {}
+    values, value_index = [], {}
+    encoded_features = []
+
+    for feature_id, (geometry, properties) in features:
+        commands = polygon_commands(tile_rings(geometry, bounds))
+        if not commands:
+            continue
+
+        tags = []
+        for key, value in properties.items():
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            value_key = (type(value).__name__, value)
+            if value_key not in value_index:
+                value_index[value_key] = len(values)
+                values.append(value)
+            tags.extend([key_index[key], value_index[value_key]])
+
+        feature = field_key(1, 0) + varint(feature_id)
+        feature += packed_varints(2, tags)
+        feature += field_key(3, 0) + varint(3)  # GeomType POLYGON
+        feature += packed_varints(4, commands)
+        encoded_features.append(feature)
+
+    if not encoded_features:
+        return b''
+
+    layer = field_key(15, 0) + varint(2)
+    layer += length_delimited(1, name.encode('utf-8'))
+    layer += b''.join(length_delimited(2, f) for f in encoded_features)
+    layer += b''.join(length_delimited(3, k.encode('utf-8')) for k in keys)
+    layer += b''.join(length_delimited(4, encode_value(v)) for v in values)
+    layer += field_key(5, 0) + varint(EXTENT)
+    return length_delimited(3, layer)
+
+
+# --- Tile jobs (run in worker processes) ---
+
+def render_tiles(job):
+    """Clip, encode and write a batch of tiles at one zoom. Returns the number of tiles written"""
+    z, tiles, output_dir = job
+    written = 0
+    for (x, y), layers in tiles:
+        minx, miny, maxx, maxy = tile_bounds(z, x, y)
+        pad = (maxx - minx) * BUFFER / EXTENT
+        clip_box = (minx - pad, miny - pad, maxx + pad, maxy + pad)
+
+        data = b''
+        for name, features in layers.items():
+            geometries = shapely.clip_by_rect([g for _, (g, _) in features], *clip_box)
+            clipped = [(fid, (geom, props)) for (fid, (_, props)), geom in zip(features, geometries)
+                       if not geom.is_empty]
+            data += encode_layer(name, clipped, (minx, miny, maxx, maxy))
+
+        if data:
+            path = Path(output_dir) / str(z) / str(x) / f"{y}.pbf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            written += 1
+    return written
+
+
+# --- Pyramid build ---
+
+def tile_properties(properties):
+    """Flatten properties to MVT scalars (crimeBreakdown becomes one key per crime type)"""
+    flat = {}
+    for key, value in properties.items():
+        if isinstance(value, dict):
+            if key == 'crimeBreakdown':
+                flat.update(value)
+            continue
+        if value is None or isinstance(value, (list, tuple)):
+            continue
+        flat[key] = value
+    return flat
+
+
+def field_type(value):
+    """TileJSON field description for a property value"""
+    if isinstance(value, bool):
+        return 'Boolean'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return 'Number'
+    return 'String'
+
+
+def project_layer(features):
+    """GeoJSON features -> (Mercator geometries, flattened properties)"""
+    geometries = np.array([to_shapely(f['geometry']) for f in features], dtype=object)
+    geometries = shapely.transform(geometries, lonlat_to_mercator)
+    invalid = ~shapely.is_valid(geometries)
+    if invalid.any():
+        geometries[invalid] = shapely.make_valid(geometries[invalid])
+    return geometries, [tile_properties(f.get('properties', {})) for f in features]
+
+
+def build_tile_pyramid(layers, output_dir=TILES_DIR, min_zoom=MIN_ZOOM, max_zoom=MAX_ZOOM, workers=None):
+    """
+    Build the pyramid for `layers` (name -> list of GeoJSON features).
+    Replaces any existing pyramid in output_dir and writes a metadata.json next to the tiles.
+    """
+    output_dir = Path(output_dir)
+    if output_dir.exists():
+        shutil.rmtree(output_dir)
+    output_dir.mkdir(parents=True)
+
+    projected = {name: project_layer(features) for name, features in layers.items()}
+    total = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for z in range(min_zoom, max_zoom + 1):
+            tolerance = tile_size(z) / EXTENT * SIMPLIFY_TOLERANCE
+
+            # Assign simplified features to every tile their bounding box touches
+            tiles = {}
+            for name, (geometries, properties) in projected.items():
+                simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+                for fid, (geometry, bounds) in enumerate(zip(simplified, shapely.bounds(simplified))):
+                    if geometry.is_empty:
+                        continue
+                    for tile in tiles_for_bounds(z, bounds):
+                        tiles.setdefault(tile, {}).setdefault(name, []).append((fid, (geometry, properties[fid])))
+
+            items = sorted(tiles.items())
+            jobs = [(z, items[i:i + TILES_PER_JOB], str(output_dir)) for i in range(0, len(items), TILES_PER_JOB)]
+            written = sum(pool.map(render_tiles, jobs))
+            total += written
+            print(f"✓ z{z}: {written} tiles")
+
+    # Lon/lat bounds of everything tiled, for clients
+    all_bounds = np.vstack([shapely.bounds(g) for g, _ in projected.values()])
+    minx, miny = all_bounds[:, 0].min(), all_bounds[:, 1].min()
+    maxx, maxy = all_bounds[:, 2].max(), all_bounds[:, 3].max()
+    to_lonlat = lambda x, y: (x / EARTH_HALF_CIRCUMFERENCE * 180.0,
+                              math.degrees(2 * math.atan(math.exp(y / EARTH_HALF_CIRCUMFERENCE * math.pi)) - math.pi / 2))
+
+    metadata = {
+        'tilejson': '3.0.0',
+        'tiles': ['/tiles/{z}/{x}/{y}.pbf'],
+        'minzoom': min_zoom,
+        'maxzoom': max_zoom,
+        'bounds': [*to_lonlat(minx, miny), *to_lonlat(maxx, maxy)],
+        'vector_layers': [
+            {'id': name, 'fields': {key: field_type(value) for props in properties for key, value in props.items()}}
+            for name, (_, properties) in projected.items()
+        ]
+    }
+    with open(output_dir / 'metadata.json', 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    print(f"✓ Wrote {total} vector tiles to {output_dir}")
+    return total
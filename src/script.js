@@ -7,6 +7,8 @@ import gsap from 'gsap'
  */
 const NYC_CENTER = { lat: 40.7128, lon: -74.0060 }
 const DATA_PATH = '/nyc_zipcodes_with_crime.geojson'
+// Split output: immutable geometry + small per-refresh attributes (falls back to DATA_PATH)
+const LAYERS_PATH = '/zip_layers.json'
 
 // Select UI Elements
 const infoPanel = document.getElementById('infoPanel')
@@ -83,10 +85,49 @@ function createZipGeometry(coordinates, height = 0.5) {
     return geometry
 }
 
-async function loadData() {
+/**
+ * Merge the columnar attribute payload back onto the geometry features
+ */
+function applyAttributes(geoData, attributes) {
+    const byId = new Map(geoData.features.map(f => [f.id, f]))
+    const { ids, columns, breakdownFields } = attributes
+
+    ids.forEach((id, i) => {
+        const feature = byId.get(id)
+        if (!feature) return
+        const p = feature.properties
+
+        Object.entries(columns).forEach(([field, values]) => {
+            if (!breakdownFields.includes(field) && values[i] !== null) p[field] = values[i]
+        })
+        const hasBreakdown = breakdownFields.length && columns[breakdownFields[0]][i] !== null
+        p.crimeBreakdown = hasBreakdown
+            ? Object.fromEntries(breakdownFields.map(crime => [crime, columns[crime][i]]))
+            : {}
+        if (attributes.precinctShares && attributes.precinctShares[id]) {
+            p.precinctShares = attributes.precinctShares[id]
+        }
+    })
+    return geoData
+}
+
+async function fetchGeoData() {
     try {
+        const layers = await (await fetch(LAYERS_PATH, { cache: 'no-cache' })).json()
+        const [geometry, attributes] = await Promise.all([
+            fetch(`/${layers.geometry}`).then(r => r.json()),
+            fetch(`/${layers.attributes}`).then(r => r.json())
+        ])
+        return applyAttributes(geometry, attributes)
+    } catch (e) {
         const response = await fetch(DATA_PATH)
-        const geoData = await response.json()
+        return response.json()
+    }
+}
+
+async function loadData() {
+    try {
+        const geoData = await fetchGeoData()
 
         geoData.features.forEach(feature => {
     const p = feature.properties
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# The helper scripts import each other as top-level modules
+HELPER_DIR = Path(__file__).resolve().parent.parent / 'src' / 'helper'
+sys.path.insert(0, str(HELPER_DIR))
+
+from precinct_data_mapping import PRECINCT_DATA
+
+from .fixtures import MockSheetServer, make_sheet
+
+SEED = 20240101
+TEMPLATE_SHEETS = 8
+
+
+def sheet_path(precinct):
+    """Path a precinct's sheet is served at (matches MockSheetServer.url_template)"""
+    return f"cs-en-us-{int(precinct):03d}pct.xlsx"
+
+
+@pytest.fixture
+def rng():
+    # Seeded apart from `sheets`, so sheets made from it differ from the served ones
+    return np.random.default_rng(SEED + 1)
+
+
+@pytest.fixture(scope='session')
+def sheets():
+    """A generated sheet for every precinct in PRECINCT_DATA"""
+    rng = np.random.default_rng(SEED)
+    templates = [make_sheet(rng) for _ in range(TEMPLATE_SHEETS)]
+    return {sheet_path(data['Precinct']): templates[i % len(templates)] for i, data in enumerate(PRECINCT_DATA)}
+
+
+@pytest.fixture
+def sheet_server(sheets):
+    with MockSheetServer(dict(sheets)) as server:
+        yield server
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run from an empty directory, so the scripts' ./public and cache paths land in tmp_path"""
+    (tmp_path / 'public').mkdir()
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
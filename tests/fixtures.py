@@ -0,0 +1,99 @@
+"""
+Stand-ins for nyc.gov shared by the tests and the benchmarks: generated CompStat sheets and
+a local HTTP server that serves them.
+"""
+
+import io
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openpyxl
+
+# CompStat layout (0-based): crime rows 13-32, Week to Date / 28 Day / Year to Date in columns 2, 5, 8
+CRIME_ROW_NAMES = {13: 'Murder', 14: 'Rape', 15: 'Robbery', 16: 'Felony Assault', 17: 'Burglary',
+                   18: 'Grand Larceny', 19: 'Grand Larceny Auto'}
+CRIME_ROWS = range(13, 33)
+STAT_COLUMNS = (2, 5, 8)
+SHEET_ROWS = 33
+SHEET_COLS = 9
+
+
+def make_sheet(rng):
+    """XLSX bytes laid out like a CompStat sheet (header block, then crime rows 13-32)"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(row=1, column=1, value='CompStat')
+    for row in CRIME_ROWS:
+        sheet.cell(row=row + 1, column=1, value=CRIME_ROW_NAMES.get(row, f'Other {row}'))
+        for column in STAT_COLUMNS:
+            sheet.cell(row=row + 1, column=column + 1, value=int(rng.integers(0, 40 * (column + 1))))
+    sheet.cell(row=SHEET_ROWS + 5, column=SHEET_COLS + 5, value='footer')
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+class MockSheetServer:
+    """
+    Serves generated CompStat sheets on localhost: GET /cs-en-us-<precinct>pct.xlsx.
+    Like nyc.gov it sends an ETag and answers a matching If-None-Match with 304.
+    `failures` maps a path to how many 503s it returns before serving it; every request is
+    logged as (path, If-None-Match header, status) in `requests`.
+    """
+    def __init__(self, sheets, failures=None):
+        self.sheets = sheets
+        self.failures = dict(failures or {})
+        self.requests = []
+        self.lock = threading.Lock()
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.lstrip('/')
+                if_none_match = self.headers.get('If-None-Match')
+                with server.lock:
+                    failing = server.failures.get(path, 0) > 0
+                    if failing:
+                        server.failures[path] -= 1
+
+                body = server.sheets.get(path)
+                etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"' if body is not None else None
+                if failing:
+                    status, body = 503, b''
+                elif body is None:
+                    status, body = 404, b''
+                elif if_none_match == etag:
+                    status, body = 304, b''
+                else:
+                    status = 200
+                with server.lock:
+                    server.requests.append((path, if_none_match, status))
+
+                self.send_response(status)
+                if status in (200, 304):
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url_template(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/cs-en-us-{{precinct}}pct.xlsx"
+
+    def url(self, precinct):
+        return self.url_template.format(precinct=f'{int(precinct):03d}')
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
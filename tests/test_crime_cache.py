@@ -0,0 +1,52 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from crime_cache import BREAKDOWN_COLUMNS, CACHE_DTYPE, breakdown_matrix, ensure_cache, load_cache, \
+    load_cache_records, save_cache
+
+# The JSON-in-CSV cache the repo shipped before the binary cache
+LEGACY_CSV = Path(__file__).resolve().parent.parent / 'public' / 'crime_data_cache.csv'
+
+
+def legacy_frame():
+    df = pd.read_csv(LEGACY_CSV)
+    df['crimeBreakdown'] = df['crimeBreakdown'].apply(json.loads)
+    return df
+
+
+def test_legacy_csv_migrates_once(tmp_path):
+    cache_file = tmp_path / 'cache.npy'
+    assert ensure_cache(cache_file, LEGACY_CSV)
+    assert cache_file.exists()
+
+    expected = legacy_frame()
+    df = load_cache(cache_file)
+    assert df['precinct'].tolist() == expected['precinct'].tolist()
+    assert df['crimeBreakdown'].tolist() == expected['crimeBreakdown'].tolist()
+    for column in ('crimeCount', 'monthToDate', 'yearToDate'):
+        assert df[column].tolist() == expected[column].tolist()
+    np.testing.assert_allclose(df['safetyScore'], expected['safetyScore'])
+
+    # Already migrated: the CSV is not read again
+    assert ensure_cache(cache_file, tmp_path / 'missing.csv')
+
+
+def test_missing_cache_and_csv(tmp_path):
+    assert not ensure_cache(tmp_path / 'cache.npy', tmp_path / 'missing.csv')
+
+
+def test_save_load_round_trip(tmp_path):
+    df = legacy_frame()
+    cache_file = tmp_path / 'cache.npy'
+    save_cache(df, cache_file)
+
+    records = load_cache_records(cache_file)
+    assert records.dtype == CACHE_DTYPE
+    assert not records.flags.writeable  # memory-mapped read-only
+    reloaded = load_cache(cache_file)
+    np.testing.assert_array_equal(breakdown_matrix(reloaded), breakdown_matrix(df))
+    assert reloaded[BREAKDOWN_COLUMNS].to_dict('records') == reloaded['crimeBreakdown'].tolist()
+    assert not list(tmp_path.glob('*.tmp*'))
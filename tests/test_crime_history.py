@@ -0,0 +1,169 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import crime_history
+
+from crime_cache import BREAKDOWN_COLUMNS
+from crime_history import METRIC_COLUMNS, ROLLING_STATE_FILE, ROLLING_WINDOWS, append_snapshot, list_weeks, \
+    load_week, precinct_trend, rolling_aggregates, week_key, week_over_week
+
+FIRST_MONDAY = date(2025, 1, 6)
+PRECINCTS = np.arange(1, 21)
+
+
+def week_frame(rng, precincts=PRECINCTS):
+    """One week's consolidated table with random metrics, rows in shuffled order"""
+    n = len(precincts)
+    df = pd.DataFrame({
+        'precinct': rng.permutation(precincts),
+        'borough': 'Manhattan',
+        'neighborhoods': 'Somewhere',
+        'crimeCount': rng.integers(0, 100, n),
+        'monthToDate': rng.integers(0, 400, n),
+        'yearToDate': rng.integers(0, 4000, n),
+    })
+    df[BREAKDOWN_COLUMNS] = rng.integers(0, 30, size=(n, len(BREAKDOWN_COLUMNS)))
+    df['weightedCrimeVal'] = rng.random(n) * 500
+    df['safetyScore'] = rng.random(n)
+    return df
+
+
+def record_weeks(rng, history_dir, n_weeks, first=FIRST_MONDAY):
+    """Append n_weeks snapshots (some precincts missing some weeks). Returns {week: frame}"""
+    frames = {}
+    for i in range(n_weeks):
+        precincts = PRECINCTS if i % 5 else PRECINCTS[i % 3:]
+        day = first + timedelta(weeks=i)
+        df = week_frame(rng, precincts)
+        assert append_snapshot(df, day, history_dir)
+        frames[week_key(day)] = df
+    return frames
+
+
+def expected_means(frames, window):
+    """Per-precinct metric means over the last `window` weeks, recomputed from scratch"""
+    recent = pd.concat([frames[week] for week in sorted(frames)[-window:]])
+    grouped = recent.groupby('precinct')
+    means = grouped[METRIC_COLUMNS].mean().astype(float)
+    means['weeks'] = grouped.size()
+    return means.reset_index()
+
+
+def test_partitions_are_sorted_and_write_once(tmp_path, rng):
+    df = week_frame(rng)
+    assert append_snapshot(df, FIRST_MONDAY, tmp_path)
+    assert list_weeks(tmp_path) == [week_key(FIRST_MONDAY)]
+
+    records = load_week(week_key(FIRST_MONDAY), tmp_path)
+    assert records['precinct'].tolist() == sorted(PRECINCTS.tolist())
+    expected = df.set_index('precinct').loc[records['precinct']]
+    np.testing.assert_array_equal(records['crimeCount'], expected['crimeCount'])
+
+    # Same week again, or an older week: nothing written
+    assert not append_snapshot(week_frame(rng), FIRST_MONDAY + timedelta(days=2), tmp_path)
+    assert not append_snapshot(week_frame(rng), FIRST_MONDAY - timedelta(weeks=1), tmp_path)
+    assert list_weeks(tmp_path) == [week_key(FIRST_MONDAY)]
+    np.testing.assert_array_equal(load_week(week_key(FIRST_MONDAY), tmp_path), records)
+
+
+@pytest.mark.parametrize('n_weeks', [3, 20, 60])
+def test_rolling_windows_match_a_full_recomputation(tmp_path, rng, n_weeks):
+    frames = record_weeks(rng, tmp_path, n_weeks)
+    for window in ROLLING_WINDOWS:
+        expected = expected_means(frames, window)
+        actual = rolling_aggregates(window, tmp_path)
+        assert actual['precinct'].tolist() == expected['precinct'].tolist()
+        assert actual['weeks'].tolist() == expected['weeks'].tolist()
+        np.testing.assert_allclose(actual[METRIC_COLUMNS].to_numpy(), expected[METRIC_COLUMNS].to_numpy())
+
+
+def test_missing_rolling_state_is_rebuilt(tmp_path, rng):
+    record_weeks(rng, tmp_path, 15)
+    incremental = {window: rolling_aggregates(window, tmp_path) for window in ROLLING_WINDOWS}
+    (tmp_path / ROLLING_STATE_FILE).unlink()
+
+    for window in ROLLING_WINDOWS:
+        pd.testing.assert_frame_equal(rolling_aggregates(window, tmp_path), incremental[window])
+    assert (tmp_path / ROLLING_STATE_FILE).exists()
+
+
+def assert_rolling_matches(frames, history_dir):
+    for window in ROLLING_WINDOWS:
+        expected = expected_means(frames, window)
+        actual = rolling_aggregates(window, history_dir)
+        assert actual['weeks'].tolist() == expected['weeks'].tolist()
+        np.testing.assert_allclose(actual[METRIC_COLUMNS].to_numpy(), expected[METRIC_COLUMNS].to_numpy())
+
+
+def test_a_crash_before_the_state_save_is_caught_up(tmp_path, rng, monkeypatch):
+    frames = record_weeks(rng, tmp_path, 6)
+    day = FIRST_MONDAY + timedelta(weeks=6)
+    frames[week_key(day)] = week_frame(rng)
+
+    def crash(*args):
+        raise RuntimeError("killed between the partition write and the state save")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(crime_history, 'update_rolling_state', crash)
+        with pytest.raises(RuntimeError):
+            append_snapshot(frames[week_key(day)], day, tmp_path)
+    assert list_weeks(tmp_path) == sorted(frames)
+
+    # The re-run finds the week recorded and brings the state up to date with it
+    assert not append_snapshot(frames[week_key(day)], day, tmp_path)
+    state = crime_history.load_rolling_state(tmp_path)
+    assert all(state[window]['weeks'] == sorted(frames)[-window:] for window in ROLLING_WINDOWS)
+
+    # Later weeks slide on from there
+    frames.update(record_weeks(rng, tmp_path, 3, first=day + timedelta(weeks=1)))
+    assert_rolling_matches(frames, tmp_path)
+
+
+def test_a_state_left_behind_the_partitions_is_not_used(tmp_path, rng, monkeypatch):
+    frames = record_weeks(rng, tmp_path, 4)
+    day = FIRST_MONDAY + timedelta(weeks=4)
+    frames[week_key(day)] = week_frame(rng)
+    with monkeypatch.context() as patch:
+        patch.setattr(crime_history, 'update_rolling_state', lambda *args: None)
+        append_snapshot(frames[week_key(day)], day, tmp_path)
+
+    assert_rolling_matches(frames, tmp_path)
+
+
+def test_precinct_trend(tmp_path, rng):
+    frames = record_weeks(rng, tmp_path, 12)
+    weeks = sorted(frames)
+
+    trend = precinct_trend(2, weeks=4, history_dir=tmp_path)
+    present = [week for week in weeks[-4:] if 2 in set(frames[week]['precinct'])]
+    assert trend.index.tolist() == present
+    for week in present:
+        row = frames[week].set_index('precinct').loc[2]
+        assert trend.loc[week, 'crimeCount'] == row['crimeCount']
+        assert trend.loc[week, 'safetyScore'] == pytest.approx(row['safetyScore'])
+
+    # Ending earlier, and a precinct that was never recorded
+    assert precinct_trend(2, weeks=52, end_week=weeks[2], history_dir=tmp_path).index[-1] <= weeks[2]
+    assert precinct_trend(999, history_dir=tmp_path).empty
+
+
+def test_week_over_week(tmp_path, rng):
+    frames = record_weeks(rng, tmp_path, 6)
+    weeks = sorted(frames)
+
+    # The latest week is the default; it is missing precincts 1 and 2, which are left out
+    deltas = week_over_week(history_dir=tmp_path)
+    current = frames[weeks[-1]].set_index('precinct')
+    previous = frames[weeks[-2]].set_index('precinct')
+    common = sorted(set(current.index) & set(previous.index))
+    assert deltas['precinct'].tolist() == common
+    expected = (current.loc[common, METRIC_COLUMNS] - previous.loc[common, METRIC_COLUMNS]).to_numpy(dtype=float)
+    np.testing.assert_allclose(deltas[METRIC_COLUMNS].to_numpy(), expected)
+    assert common == PRECINCTS[2:].tolist()
+
+    assert week_over_week(weeks[1], tmp_path)['precinct'].tolist() == PRECINCTS.tolist()
+    assert week_over_week(weeks[0], tmp_path).empty
+    assert week_over_week(history_dir=tmp_path / 'empty').empty
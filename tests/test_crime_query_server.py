@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import crime_query_server
+from crime_cache import BREAKDOWN_COLUMNS, save_cache
+from precinct_data_mapping import PRECINCT_DATA
+from crime_query_server import CrimeQueryServer
+from safety_scoring import SCORING_PROFILES
+
+from .conftest import SEED
+
+
+def crime_table(rng):
+    df = pd.DataFrame({
+        'precinct': [int(p['Precinct']) for p in PRECINCT_DATA],
+        'borough': [p['Borough'] for p in PRECINCT_DATA],
+        'neighborhoods': [p['Neighborhoods'] for p in PRECINCT_DATA],
+        'crimeCount': rng.integers(0, 100, len(PRECINCT_DATA)),
+        'monthToDate': rng.integers(0, 400, len(PRECINCT_DATA)),
+        'yearToDate': rng.integers(0, 5000, len(PRECINCT_DATA)),
+        'weightedCrimeVal': rng.uniform(0, 500, len(PRECINCT_DATA)),
+    })
+    weighted = df['weightedCrimeVal']
+    df['safetyScore'] = 1 - (weighted - weighted.min()) / (weighted.max() - weighted.min())
+    for crime in BREAKDOWN_COLUMNS:
+        df[crime] = rng.integers(0, 50, len(df))
+    return df
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    path = tmp_path / 'crime_data_cache.npy'
+    save_cache(crime_table(np.random.default_rng(SEED)), path)
+    return path
+
+
+@pytest.fixture
+def server(cache_file):
+    server = CrimeQueryServer(cache_file=str(cache_file))
+    server.load()
+    return server
+
+
+async def exchange(server, raw_requests):
+    """Send raw requests down one connection and read back every response"""
+    listener = await asyncio.start_server(server.handle, '127.0.0.1', 0)
+    port = listener.sockets[0].getsockname()[1]
+    async with listener:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b''.join(raw_requests))
+        await writer.drain()
+
+        responses = []
+        for _ in raw_requests:
+            status_line = await reader.readline()
+            if not status_line:
+                break
+            headers = {}
+            while (line := await reader.readline()) not in (b'\r\n', b''):
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers['content-length']))
+            responses.append((int(status_line.split()[1]), headers, body))
+        writer.close()
+        return responses
+
+
+def get(target, **headers):
+    lines = [f"GET {target} HTTP/1.1", "Host: test"] + [f"{k.replace('_', '-')}: {v}" for k, v in headers.items()]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def fetch(server, target, **headers):
+    (status, response_headers, body), = asyncio.run(exchange(server, [get(target, **headers)]))
+    return status, response_headers, json.loads(body) if body else None
+
+
+def test_endpoints(server):
+    status, _, body = fetch(server, '/health')
+    assert (status, body) == (200, {'status': 'ok', 'precincts': len(PRECINCT_DATA)})
+
+    status, _, body = fetch(server, '/precinct/1')
+    assert status == 200 and body['precinct'] == 1 and body['borough'] == 'Manhattan'
+    assert set(body['crimeBreakdown']) == set(BREAKDOWN_COLUMNS)
+
+    status, _, body = fetch(server, '/zip/10004')
+    assert status == 200 and (body['zip'], body['precinct']) == ('10004', 1)
+
+    status, _, body = fetch(server, '/borough/staten%20island')
+    records = [r for r in server.index.by_precinct.values() if r['borough'] == 'Staten Island']
+    assert status == 200 and body['precincts'] == len(records)
+    assert body['crimeCount'] == sum(r['crimeCount'] for r in records)
+
+    status, _, body = fetch(server, '/ranking?top=5&order=least_safe')
+    scores = [p['safetyScore'] for p in body['precincts']]
+    assert status == 200 and len(scores) == 5 and scores == sorted(scores)
+    assert scores[0] == min(r['safetyScore'] for r in server.index.by_precinct.values())
+
+    assert fetch(server, '/precinct/abc')[0] == 400
+    assert fetch(server, '/ranking?top=x')[0] == 400
+    assert fetch(server, '/precinct/999')[0] == 404
+    assert fetch(server, '/zip/99999')[0] == 404
+    assert fetch(server, '/zip/100041')[0] == 404
+    assert fetch(server, '/nowhere')[0] == 404
+
+
+def test_every_scoring_profile_is_served_and_others_are_rejected(server):
+    for name in SCORING_PROFILES:
+        status, _, body = fetch(server, f'/ranking?top=3&profile={name}')
+        assert status == 200 and body['profile'] == name and len(body['precincts']) == 3
+    assert fetch(server, '/ranking?profile=per_capita')[0] == 400
+    assert fetch(server, '/ranking?profile=nonsense')[0] == 400
+
+
+def test_matching_etag_gets_304(server):
+    status, headers, body = fetch(server, '/precinct/1')
+    assert status == 200 and headers['etag']
+
+    status, repeat_headers, body = fetch(server, '/precinct/1', if_none_match=headers['etag'])
+    assert (status, body, repeat_headers['etag']) == (304, None, headers['etag'])
+    assert fetch(server, '/precinct/1', if_none_match='"stale"')[0] == 200
+
+
+def test_keep_alive_serves_several_requests_on_one_connection(server):
+    responses = asyncio.run(exchange(server, [get('/precinct/1'), get('/precinct/5'), get('/health')]))
+    assert [json.loads(body).get('precinct') for _, _, body in responses[:2]] == [1, 5]
+    assert all(status == 200 and headers['connection'] == 'keep-alive' for status, headers, _ in responses)
+
+
+def test_a_rejected_post_body_does_not_break_keep_alive(server):
+    body = b'{"precinct": 1}\r\n\r\nGET /nowhere HTTP/1.1\r\n\r\n'
+    post = (f"POST /precinct/1 HTTP/1.1\r\nHost: test\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body
+    responses = asyncio.run(exchange(server, [post, get('/precinct/1')]))
+    assert [status for status, _, _ in responses] == [405, 200]
+    assert responses[0][1]['allow'] == 'GET, HEAD'
+    assert json.loads(responses[1][2])['precinct'] == 1
+
+
+def test_a_body_that_cannot_be_skipped_closes_the_connection(server):
+    post = b"POST /precinct/1 HTTP/1.1\r\nHost: test\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhello\r\n0\r\n\r\n"
+    responses = asyncio.run(exchange(server, [post, get('/precinct/1')]))
+    assert [(status, headers['connection']) for status, headers, _ in responses] == [(405, 'close')]
+
+
+def test_lru_keeps_the_most_recent_responses(server):
+    server.lru_size = 2
+    for target in ('/precinct/1', '/precinct/5', '/precinct/1', '/precinct/6'):
+        server.respond(target)
+    assert list(server.responses) == ['/precinct/1', '/precinct/6']
+    # A hit returns the cached tuple itself
+    assert server.respond('/precinct/1') is server.responses['/precinct/1']
+
+
+def test_watcher_reloads_when_the_cache_changes(server, cache_file, monkeypatch, rng):
+    monkeypatch.setattr(crime_query_server, 'RELOAD_INTERVAL', 0.01)
+    before = server.respond('/precinct/1')
+
+    async def reload():
+        watcher = asyncio.create_task(server.watch())
+        await asyncio.sleep(0.05)
+        index = server.index
+        save_cache(crime_table(rng), cache_file)
+        # Make sure the mtime moves even on coarse-grained filesystems
+        stat = os.stat(cache_file)
+        os.utime(cache_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        for _ in range(200):
+            if server.index is not index:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+    asyncio.run(reload())
+    assert '/precinct/1' not in server.responses
+    after = server.respond('/precinct/1')
+    assert after[2] != before[2] and after[1] != before[1]
+
+
+def test_non_decimal_precinct_ids_are_rejected(server):
+    # '²'.isdigit() is True but int('²') raises
+    assert fetch(server, '/precinct/%C2%B2')[0] == 400
+
+
+def test_errors_answer_500_and_keep_the_connection(server, monkeypatch):
+    route = server.route
+
+    def broken(target):
+        if target == '/broken':
+            raise RuntimeError('boom')
+        return route(target)
+
+    monkeypatch.setattr(server, 'route', broken)
+    responses = asyncio.run(exchange(server, [get('/broken'), get('/health')]))
+    assert [status for status, _, _ in responses] == [500, 200]
@@ -0,0 +1,134 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from crime_cache import BREAKDOWN_COLUMNS, load_cache
+from dataset_batch import resolve_specs, run_batch
+from dataset_spec import DatasetSpec, SheetLayout, load_specs
+from precinct_data_mapping import PRECINCT_DATA
+from precinct_neighborhood_mapper import CACHE_FILE, CRIME_TYPES, NYPD_LAYOUT, NYPD_PRECINCTS, consolidate_all_data
+
+from .fixtures import make_sheet
+
+LAYOUT = {'crime_types': CRIME_TYPES, 'crime_row_start': 13, 'crime_row_end': 33, 'stat_columns': [2, 5, 8]}
+TRANSIT_UNITS = [{'Precinct': str(i), 'Borough': 'Manhattan', 'Neighborhoods': f'Transit District {i}'}
+                 for i in (1, 2, 3)]
+
+
+def transit_spec(server, cache_file=None):
+    return DatasetSpec('nypd_transit', server.url_template.replace('cs-en-us-{precinct}pct', 'td-{unit}'),
+                       TRANSIT_UNITS, SheetLayout.from_dict(LAYOUT), unit_digits=2,
+                       cache_file=cache_file and str(cache_file))
+
+
+# --- SheetLayout / DatasetSpec validation ---
+
+def test_layout_defaults_the_read_window():
+    layout = SheetLayout.from_dict(LAYOUT)
+    assert (layout.sheet_rows, layout.sheet_cols) == (33, 9)
+    assert layout.breakdown_rows.tolist() == list(CRIME_TYPES.values())
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'crime_types': {k: v for k, v in CRIME_TYPES.items() if k != 'Murder'}}, 'crime types must be exactly'),
+    ({'crime_types': {**CRIME_TYPES, 'Arson': 20}}, 'crime types must be exactly'),
+    ({'stat_columns': [2, 5]}, 'three stat columns'),
+    ({'crime_row_start': 33}, 'do not fit'),
+    ({'crime_row_end': 40, 'sheet_rows': 35}, 'do not fit'),
+    ({'crime_types': {**CRIME_TYPES, 'Murder': 40}, 'crime_row_end': 41}, None),
+    ({'crime_types': {**CRIME_TYPES, 'Murder': 5}}, 'outside the crime block'),
+    ({'stat_columns': [2, 5, 9], 'sheet_cols': 9}, 'Stat columns'),
+    ({'stat_columns': [-1, 5, 8]}, 'Stat columns'),
+])
+def test_layout_validation(change, message):
+    if message is None:
+        SheetLayout.from_dict({**LAYOUT, **change})
+        return
+    with pytest.raises(ValueError, match=message):
+        SheetLayout.from_dict({**LAYOUT, **change})
+
+
+@pytest.mark.parametrize('change, message', [
+    ({'url_template': 'https://example.test/sheet.xlsx'}, 'no {unit} placeholder'),
+    ({'units': []}, 'no units'),
+    ({'units': [{'Precinct': '1', 'Borough': 'Manhattan'}]}, 'need Precinct, Borough, Neighborhoods'),
+    ({'units': TRANSIT_UNITS + TRANSIT_UNITS[:1]}, 'duplicate unit ids'),
+])
+def test_spec_validation(change, message):
+    data = {'name': 'nypd_transit', 'url_template': 'https://example.test/td{unit}.xlsx', 'units': TRANSIT_UNITS,
+            'layout': LAYOUT, **change}
+    with pytest.raises(ValueError, match=message):
+        DatasetSpec.from_dict(data)
+
+
+def test_spec_urls_and_json_loading(tmp_path):
+    spec_file = tmp_path / 'transit.json'
+    spec_file.write_text(json.dumps({'name': 'nypd_transit', 'url_template': 'https://example.test/td{unit}.xlsx',
+                                     'unit_digits': 2, 'units': TRANSIT_UNITS, 'layout': LAYOUT}))
+    spec, = load_specs(spec_file)
+    assert spec.urls() == [f'https://example.test/td0{i}.xlsx' for i in (1, 2, 3)]
+    assert NYPD_PRECINCTS.url('1').endswith('cs-en-us-001pct.xlsx')
+    assert NYPD_PRECINCTS.layout is NYPD_LAYOUT
+
+
+def test_resolve_specs_rejects_clashes(tmp_path):
+    assert resolve_specs() == [NYPD_PRECINCTS]
+    with pytest.raises(ValueError, match='Unknown datasets'):
+        resolve_specs(['nypd_transit'])
+
+    def spec_file(file_name, **data):
+        path = tmp_path / f'{file_name}.json'
+        path.write_text(json.dumps({'name': 'nypd_transit', 'url_template': 'https://example.test/td{unit}.xlsx',
+                                    'units': TRANSIT_UNITS, 'layout': LAYOUT, **data}))
+        return path
+
+    with pytest.raises(ValueError, match='Duplicate dataset names'):
+        resolve_specs(spec_files=[spec_file('a'), spec_file('b', cache_file='./other.npy')])
+    with pytest.raises(ValueError, match='same cache file'):
+        resolve_specs(['nypd_precincts'], [spec_file('c', name='other', cache_file=NYPD_PRECINCTS.cache_file)])
+    with pytest.raises(ValueError, match='share sheet URLs'):
+        resolve_specs(['nypd_precincts'], [spec_file('d', name='other', url_template=NYPD_PRECINCTS.url_template)])
+
+
+# --- run_batch against the stand-in server ---
+
+def test_run_batch_scores_every_dataset_into_its_own_cache(workdir, sheet_server, rng):
+    precincts = DatasetSpec(NYPD_PRECINCTS.name, sheet_server.url_template, PRECINCT_DATA, NYPD_LAYOUT,
+                            cache_file=str(workdir / 'precinct_cache.npy'))
+    transit = transit_spec(sheet_server, workdir / 'transit_cache.npy')
+    for i in (1, 2, 3):
+        sheet_server.sheets[f'td-0{i}.xlsx'] = make_sheet(rng)
+
+    frames = run_batch([precincts, transit], rate=0)
+    assert sorted(frames) == ['nypd_precincts', 'nypd_transit']
+    assert len(frames['nypd_transit']) == 3
+
+    transit_cache = load_cache(transit.cache_file)
+    assert transit_cache['neighborhoods'].tolist() == [u['Neighborhoods'] for u in TRANSIT_UNITS]
+    assert set(BREAKDOWN_COLUMNS) <= set(transit_cache.columns)
+
+    # The precinct dataset comes out exactly as the single-dataset refresh writes it
+    consolidate_all_data(force_refresh=True, rate=0, url_template=sheet_server.url_template)
+    assert Path(precincts.cache_file).read_bytes() == Path(CACHE_FILE).read_bytes()
+
+
+def test_run_batch_skips_a_dataset_with_no_sheets(workdir, sheet_server):
+    precincts = DatasetSpec(NYPD_PRECINCTS.name, sheet_server.url_template, PRECINCT_DATA, NYPD_LAYOUT,
+                            cache_file=str(workdir / 'precinct_cache.npy'))
+    transit = transit_spec(sheet_server, workdir / 'transit_cache.npy')  # nothing served for it
+
+    frames = run_batch([precincts, transit], rate=0)
+    assert list(frames) == ['nypd_precincts']
+    assert not Path(transit.cache_file).exists()
+
+
+def test_specs_without_a_cache_file_are_scored_under_the_cache_dir(workdir, sheet_server, rng):
+    transit = transit_spec(sheet_server)
+    assert transit.cache_file == './.cache/nypd_transit_cache.npy'
+    for i in (1, 2, 3):
+        sheet_server.sheets[f'td-0{i}.xlsx'] = make_sheet(rng)
+
+    run_batch([transit], rate=0)
+    assert len(load_cache(workdir / '.cache' / 'nypd_transit_cache.npy')) == 3
+    assert not list((workdir / 'public').glob('*.npy'))
@@ -0,0 +1,292 @@
+"""
+The rewritten parsing, extraction, scoring and lookup paths against the implementations they replaced. The
+baseline_* functions are the pre-rewrite code, kept here as the reference.
+"""
+
+from io import BytesIO
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pytest
+
+from crime_cache import BREAKDOWN_COLUMNS
+from precinct_data_mapping import BOROUGH_TO_PRECINCTS, PRECINCT_DATA, PRECINCT_TO_ZIPS, precinct_rows, zip_precincts, \
+    zip_to_precinct
+from precinct_neighborhood_mapper import extract_crime_stats, extract_crime_stats_batch, parse_precinct_xlsx, \
+    stats_from_row
+from safety_scoring import LABEL_THRESHOLDS, SCORING_PROFILES, ScoreBoard, column_ranks, get_safety_label, \
+    safety_labels, safety_ranks, score_frame, score_profiles, weight_vector, what_if
+
+from .conftest import TEMPLATE_SHEETS
+
+
+# --- Baseline implementations ---
+
+def baseline_extract_crime_stats(df):
+    """extract_crime_stats before vectorization (iterrows and per-cell casts)"""
+    try:
+        crime_types = {
+            'Murder': 13,
+            'Rape': 14,
+            'Robbery': 15,
+            'Felony Assault': 16,
+            'Burglary': 17,
+            'Grand Larceny': 18,
+            'Grand Larceny Auto': 19
+        }
+
+        crime_breakdown = {}
+        for crime_name, row_idx in crime_types.items():
+            try:
+                count = int(float(df.iloc[row_idx, 2])) if pd.notna(df.iloc[row_idx, 2]) else 0
+                crime_breakdown[crime_name] = count
+            except (IndexError, ValueError):
+                crime_breakdown[crime_name] = 0
+
+        crime_data = df.iloc[13:33]
+
+        week_to_date_total = 0
+        month_to_date_total = 0
+        year_to_date_total = 0
+
+        for idx, row in crime_data.iterrows():
+            try:
+                week_val = int(float(row[2])) if pd.notna(row[2]) else 0
+                month_val = int(float(row[5])) if pd.notna(row[5]) else 0
+                year_val = int(float(row[8])) if pd.notna(row[8]) else 0
+
+                week_to_date_total += week_val
+                month_to_date_total += month_val
+                year_to_date_total += year_val
+            except (ValueError, TypeError):
+                continue
+
+        return {
+            'weekToDate': week_to_date_total,
+            'monthToDate': month_to_date_total,
+            'yearToDate': year_to_date_total,
+            'crimeBreakdown': crime_breakdown
+        }
+    except Exception as e:
+        print(f"Error extracting stats: {e}")
+        return None
+
+
+def baseline_calculate_weighted_score(breakdown):
+    weights = {
+        'Murder': 50,
+        'Rape': 25,
+        'Robbery': 10,
+        'Felony Assault': 8,
+        'Burglary': 5,
+        'Grand Larceny Auto': 3,
+        'Grand Larceny': 1
+    }
+
+    if not isinstance(breakdown, dict):
+        return 0
+
+    return sum(breakdown.get(crime, 0) * weight for crime, weight in weights.items())
+
+
+def baseline_score(df):
+    """Weighted value, min/max safety score and min-rank as consolidate_all_data computed them"""
+    df = df.copy()
+    df['weightedCrimeVal'] = df['crimeBreakdown'].apply(baseline_calculate_weighted_score)
+    min_val = df['weightedCrimeVal'].min()
+    max_val = df['weightedCrimeVal'].max()
+    if max_val > min_val:
+        df['safetyScore'] = 1 - ((df['weightedCrimeVal'] - min_val) / (max_val - min_val))
+    else:
+        df['safetyScore'] = 1.0
+    df['safetyRank'] = df['safetyScore'].rank(ascending=False, method='min').astype(int)
+    return df
+
+
+# --- Fixtures ---
+
+def xlsx(cells, rows=33, cols=9):
+    """Sheet bytes with a 0-based {(row, col): value} layout; other cells in the block are 0"""
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in range(rows):
+        for col in range(cols):
+            sheet.cell(row=row + 1, column=col + 1, value=cells.get((row, col), 0))
+    buffer = BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+MESSY_CELLS = {
+    'blank': {(13, 2): None, (20, 5): None, (32, 8): None},            # blank cells count as 0
+    'na-strings': {(14, 2): 'N/A', (21, 5): 'NaN', (22, 8): ''},       # read_excel NA strings
+    'numeric-text': {(15, 2): '7', (16, 5): '3.0', (17, 8): 4.9},      # numeric text and floats truncate
+    'text': {(18, 2): 'n.a.', (25, 5): 'closed'},                      # text drops the row from the totals
+    'extremes': {(13, 2): -2, (19, 8): 10 ** 6},
+}
+
+
+def messy_sheet(cells):
+    return xlsx({**{(r, c): r + c for r in range(13, 33) for c in (2, 5, 8)}, **cells})
+
+
+def crime_frame(rng, n, high=5):
+    """Consolidated-style frame with small counts, so weighted values tie often"""
+    counts = rng.integers(0, high, size=(n, len(BREAKDOWN_COLUMNS)))
+    df = pd.DataFrame({'precinct': np.arange(1, n + 1)})
+    df[BREAKDOWN_COLUMNS] = counts
+    df['crimeBreakdown'] = df[BREAKDOWN_COLUMNS].to_dict('records')
+    return df
+
+
+def assert_scores_match(df, expected):
+    np.testing.assert_array_equal(df['weightedCrimeVal'].to_numpy(dtype=float),
+                                  expected['weightedCrimeVal'].to_numpy(dtype=float))
+    np.testing.assert_allclose(df['safetyScore'].to_numpy(dtype=float), expected['safetyScore'].to_numpy(dtype=float))
+    np.testing.assert_array_equal(np.asarray(df['safetyRank'], dtype=int), expected['safetyRank'].to_numpy())
+
+
+# --- parse_precinct_xlsx (streaming openpyxl read) vs pd.read_excel ---
+
+def check_parse(content):
+    assert extract_crime_stats(parse_precinct_xlsx(content)) == \
+        extract_crime_stats(pd.read_excel(BytesIO(content), header=None))
+
+
+def test_parse_matches_read_excel_on_generated_sheets(sheets):
+    for content in list(dict.fromkeys(sheets.values()))[:TEMPLATE_SHEETS]:
+        check_parse(content)
+
+
+@pytest.mark.parametrize('cells', MESSY_CELLS.values(), ids=MESSY_CELLS.keys())
+def test_parse_matches_read_excel_on_messy_cells(cells):
+    check_parse(messy_sheet(cells))
+
+
+def test_parse_matches_read_excel_on_short_sheets():
+    check_parse(xlsx({(r, c): r * c for r in range(13, 20) for c in (2, 5, 8)}, rows=20))
+
+
+# --- extract_crime_stats (vectorized) vs the iterrows baseline ---
+
+def check_extract(content):
+    df = pd.read_excel(BytesIO(content), header=None)
+    assert extract_crime_stats(df) == baseline_extract_crime_stats(df)
+
+
+def test_extract_matches_baseline_on_generated_sheets(sheets):
+    for content in list(dict.fromkeys(sheets.values()))[:TEMPLATE_SHEETS]:
+        check_extract(content)
+
+
+@pytest.mark.parametrize('cells', MESSY_CELLS.values(), ids=MESSY_CELLS.keys())
+def test_extract_matches_baseline_on_messy_cells(cells):
+    check_extract(messy_sheet(cells))
+
+
+def test_extract_matches_baseline_on_short_sheets():
+    check_extract(xlsx({(r, c): r * c for r in range(13, 20) for c in (2, 5, 8)}, rows=20))
+
+
+def test_batch_matches_one_sheet_at_a_time(sheets):
+    contents = list(dict.fromkeys(sheets.values()))[:TEMPLATE_SHEETS] + [messy_sheet(c) for c in MESSY_CELLS.values()]
+    frames = [parse_precinct_xlsx(content) for content in contents]
+    batch = extract_crime_stats_batch(frames)
+    assert [stats_from_row(row) for row in batch] == [extract_crime_stats(df) for df in frames]
+
+
+# --- Scoring ---
+
+@pytest.mark.parametrize('n', [1, 2, 77, 500])
+def test_score_frame_matches_baseline(rng, n):
+    df = crime_frame(rng, n)
+    assert_scores_match(score_frame(df.copy()), baseline_score(df))
+
+
+def test_score_frame_all_tied(rng):
+    df = crime_frame(rng, 10, high=1)
+    scored = score_frame(df.copy())
+    assert_scores_match(scored, baseline_score(df))
+    assert (scored['safetyRank'] == 1).all()
+
+
+def test_scoreboard_updates_match_a_full_rescore(rng):
+    df = crime_frame(rng, 77)
+    board = ScoreBoard.from_frame(df)
+
+    # Random single-precinct edits (including new extrema and removals), checked after each
+    for step in range(200):
+        precinct = int(rng.integers(1, 78))
+        if step % 25 == 24 and precinct in board and len(board) > 2:
+            board.remove(precinct)
+            df = df[df['precinct'] != precinct].reset_index(drop=True)
+        else:
+            counts = rng.integers(0, 5 if step % 10 else 50, size=len(BREAKDOWN_COLUMNS))
+            breakdown = dict(zip(BREAKDOWN_COLUMNS, counts.tolist()))
+            board.update(precinct, breakdown)
+            row = {'precinct': precinct, **breakdown, 'crimeBreakdown': breakdown}
+            df = pd.concat([df[df['precinct'] != precinct], pd.DataFrame([row])], ignore_index=True)
+        assert_scores_match(board.apply(df.copy()), baseline_score(df))
+
+
+def test_safety_ranks_match_pandas_min_rank(rng):
+    values = rng.integers(0, 6, size=77).astype(float)
+    expected = pd.Series(values).rank(method='min').astype(int).to_numpy()
+    np.testing.assert_array_equal(safety_ranks(values), expected)
+
+
+def test_column_ranks_match_pandas_min_rank(rng):
+    values = rng.integers(0, 6, size=(77, 12)).astype(float)
+    expected = pd.DataFrame(values).rank(method='min').astype(int).to_numpy()
+    np.testing.assert_array_equal(column_ranks(values), expected)
+    for k in range(values.shape[1]):
+        np.testing.assert_array_equal(safety_ranks(values[:, k]), expected[:, k])
+
+
+def test_profiles_and_what_if_match_scoring_one_weight_vector_at_a_time(rng):
+    df = crime_frame(rng, 77)
+    names, values, scores, ranks = score_profiles(df[BREAKDOWN_COLUMNS])
+    assert names == list(SCORING_PROFILES)
+    candidates = np.vstack([weight_vector(SCORING_PROFILES[name]) for name in names])
+    batches = [(values, scores, ranks), what_if(df[BREAKDOWN_COLUMNS], candidates)]
+
+    for i, name in enumerate(names):
+        expected = score_frame(df.copy(), candidates[i])
+        for batch_values, batch_scores, batch_ranks in batches:
+            scored = pd.DataFrame({'weightedCrimeVal': batch_values[:, i], 'safetyScore': batch_scores[:, i],
+                                   'safetyRank': batch_ranks[:, i]})
+            assert_scores_match(scored, expected)
+
+
+def test_safety_labels_match_get_safety_label(rng):
+    scores = np.concatenate([rng.uniform(0, 1, 200), [threshold for threshold, _ in LABEL_THRESHOLDS], [0.0, 1.0]])
+    assert safety_labels(scores).tolist() == [get_safety_label(score) for score in scores]
+
+
+# --- Index layer against the dicts it is built from ---
+
+def test_zip_precincts_matches_the_dict():
+    zips = list(zip_to_precinct)
+    expected = [zip_to_precinct[z] for z in zips]
+    np.testing.assert_array_equal(zip_precincts(zips), expected)
+
+
+@pytest.mark.parametrize('zip_code', ['100011', '10001-1234', '1000', '', ' 10001', '10001 ', '00000', '99999'])
+def test_zip_precincts_rejects_what_the_dict_rejects(zip_code):
+    assert zip_precincts([zip_code])[0] == zip_to_precinct.get(zip_code, -1)
+
+
+def test_precinct_rows_match_precinct_data():
+    ids = [int(p['Precinct']) for p in PRECINCT_DATA]
+    np.testing.assert_array_equal(precinct_rows(ids), np.arange(len(ids)))
+    np.testing.assert_array_equal(precinct_rows([-1, 0, 2, 999]), [-1, -1, -1, -1])
+
+
+def test_reverse_maps_invert_the_dicts():
+    assert {z for zips in PRECINCT_TO_ZIPS.values() for z in zips} == set(zip_to_precinct)
+    assert all(zip_to_precinct[z] == p for p, zips in PRECINCT_TO_ZIPS.items() for z in zips)
+    assert {b: sorted(ps) for b, ps in BOROUGH_TO_PRECINCTS.items()} == {
+        b: sorted(int(p['Precinct']) for p in PRECINCT_DATA if p['Borough'] == b)
+        for b in {p['Borough'] for p in PRECINCT_DATA}
+    }
@@ -0,0 +1,95 @@
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+from shapely.geometry import shape
+
+from geojson_reader import PackedGeometry, iter_features, pack_geometry, read_feature_collection
+
+ZIP_GEOJSON = Path(__file__).resolve().parent.parent / 'public' / 'nyc-zip-code-tabulation-areas-polygons.geojson'
+
+SQUARE = [[0.0, 0.0], [4.0, 0.0], [4.0, 4.0], [0.0, 4.0], [0.0, 0.0]]
+HOLE = [[1.0, 1.0], [1.0, 2.0], [2.0, 2.0], [2.0, 1.0], [1.0, 1.0]]
+
+GEOMETRIES = [
+    {'type': 'Polygon', 'coordinates': [SQUARE, HOLE]},
+    {'type': 'MultiPolygon', 'coordinates': [[SQUARE, HOLE], [[[10.5, 10.5], [11.25, 10.5], [11.0, 12.0], [10.5, 10.5]]]]},
+    {'type': 'Polygon', 'coordinates': [[[0, 0, 5], [1, 0, 6], [1, 1, 7], [0, 0, 5]]]},
+    {'type': 'Polygon', 'coordinates': [[[0, 0], [1, 0, 6], [1, 1], [0, 0]]]},  # mixed 2D / 3D
+    {'type': 'Point', 'coordinates': [-73.98, 40.75]},
+    None,
+]
+
+PROPERTIES = [
+    {'postalCode': '10001', 'name': 'brace } and bracket ] in "quotes"', 'count': 12345678901234},
+    {'postalCode': '10002', 'name': 'café — \\ escaped', 'tiny': 1e-7, 'negative': -0.5},
+    {'nested': {'list': [1, [2, {'three': 3}]], 'empty': {}}, 'flag': True, 'missing': None},
+    {},
+    {'long': 'x' * 300},
+    {'precinct': 1},
+]
+
+
+def collection():
+    features = [{'type': 'Feature', 'properties': props, 'geometry': geometry}
+                for props, geometry in zip(PROPERTIES, GEOMETRIES)]
+    # Members before and after "features" that the reader has to skip
+    return {'type': 'FeatureCollection', 'crs': {'type': 'name', 'properties': {'name': 'EPSG:4326'}},
+            'bbox': [-74.26, 40.49, -73.7, 40.92], 'features': features, 'count': 6}
+
+
+@pytest.fixture(params=[None, 2], ids=['compact', 'indented'])
+def geojson_file(request, tmp_path):
+    path = tmp_path / 'features.geojson'
+    path.write_text(json.dumps(collection(), indent=request.param, ensure_ascii=False), encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 20])
+def test_iter_features_matches_json_load(geojson_file, chunk_size):
+    with open(geojson_file, encoding='utf-8') as f:
+        expected = json.load(f)['features']
+    assert list(iter_features(geojson_file, chunk_size=chunk_size)) == expected
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64])
+def test_packed_features_match_json_load(geojson_file, chunk_size):
+    with open(geojson_file, encoding='utf-8') as f:
+        expected = json.load(f)['features']
+    features = read_feature_collection(geojson_file, chunk_size=chunk_size)['features']
+
+    assert [f['properties'] for f in features] == [f['properties'] for f in expected]
+    for feature, original in zip(features, expected):
+        geometry = feature['geometry']
+        assert geometry == original['geometry']  # Mapping equality via 'type' / 'coordinates'
+        if isinstance(geometry, PackedGeometry):
+            assert geometry.to_geojson() == original['geometry']
+            assert geometry.to_shapely().equals_exact(shape(original['geometry']), 0)
+    packed = [isinstance(f['geometry'], PackedGeometry) for f in features]
+    assert packed == [True, True, True, False, False, False]
+
+
+def test_packed_layout_offsets():
+    packed = pack_geometry(GEOMETRIES[1])
+    assert packed.coords.dtype == np.float64 and packed.coords.shape == (14, 2)
+    assert packed.ring_offsets.tolist() == [0, 5, 10, 14]
+    assert packed.polygon_offsets.tolist() == [0, 2, 3]
+    assert [[ring.tolist() for ring in polygon] for polygon in packed.rings()] == GEOMETRIES[1]['coordinates']
+
+
+def test_repo_zip_polygons_match_json_load():
+    with open(ZIP_GEOJSON, encoding='utf-8') as f:
+        expected = json.load(f)['features']
+    features = list(iter_features(ZIP_GEOJSON, packed=True, chunk_size=4096))
+    assert len(features) == len(expected)
+    for feature, original in zip(features, expected):
+        assert feature['properties'] == original['properties']
+        assert feature['geometry'].to_geojson() == original['geometry']
+
+
+def test_truncated_file_raises(tmp_path):
+    path = tmp_path / 'truncated.geojson'
+    path.write_text(json.dumps(collection())[:-40])
+    with pytest.raises(ValueError):
+        list(iter_features(path, chunk_size=16))
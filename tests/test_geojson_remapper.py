@@ -0,0 +1,72 @@
+import gzip
+import json
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import geojson_remapper
+from crime_cache import BREAKDOWN_COLUMNS, save_cache
+from precinct_data_mapping import PRECINCT_DATA
+from geojson_remapper import OUTPUT_GEOJSON, ZIP_GEOJSON, load_zip_geojson, map_crime_to_zipcodes, \
+    save_enriched_geojson, stream_enriched_geojson
+from safety_scoring import score_frame
+from spatial_join import PRECINCT_GEOJSON, load_zip_precinct_weights
+
+from .conftest import HELPER_DIR, SEED
+
+REPO_ROOT = HELPER_DIR.parent.parent
+
+
+@pytest.fixture(scope='module')
+def crime_df():
+    rng = np.random.default_rng(SEED)
+    df = pd.DataFrame({
+        'precinct': [int(p['Precinct']) for p in PRECINCT_DATA],
+        'borough': [p['Borough'] for p in PRECINCT_DATA],
+        'neighborhoods': [p['Neighborhoods'] for p in PRECINCT_DATA],
+        'crimeCount': rng.integers(0, 100, len(PRECINCT_DATA)),
+        'monthToDate': rng.integers(0, 400, len(PRECINCT_DATA)),
+        'yearToDate': rng.integers(0, 5000, len(PRECINCT_DATA)),
+    })
+    df[BREAKDOWN_COLUMNS] = rng.integers(0, 30, size=(len(df), len(BREAKDOWN_COLUMNS)))
+    return score_frame(df)
+
+
+@pytest.fixture(scope='module')
+def weights(tmp_path_factory):
+    return load_zip_precinct_weights(REPO_ROOT / ZIP_GEOJSON, REPO_ROOT / PRECINCT_GEOJSON,
+                                     tmp_path_factory.mktemp('weights') / 'weights.npz')
+
+
+@pytest.mark.parametrize('spatial', [False, True])
+def test_streamed_output_matches_the_in_memory_export(crime_df, weights, spatial, tmp_path):
+    zip_file = REPO_ROOT / ZIP_GEOJSON
+    weights = weights if spatial else None
+    save_enriched_geojson(map_crime_to_zipcodes(crime_df, load_zip_geojson(zip_file), weights),
+                          tmp_path / 'loaded.geojson')
+    count = stream_enriched_geojson(crime_df, zip_file, tmp_path / 'streamed.geojson', weights)
+
+    assert count == len(json.loads((tmp_path / 'loaded.geojson').read_text())['features'])
+    assert (tmp_path / 'streamed.geojson').read_bytes() == (tmp_path / 'loaded.geojson').read_bytes()
+    assert gzip.decompress((tmp_path / 'streamed.geojson.gz').read_bytes()) == \
+        (tmp_path / 'loaded.geojson').read_bytes()
+
+
+def test_main_streams_only_the_geojson(crime_df, workdir, monkeypatch):
+    for source in (ZIP_GEOJSON, PRECINCT_GEOJSON):
+        shutil.copy(REPO_ROOT / source, workdir / source)
+    save_cache(crime_df, geojson_remapper.CRIME_CACHE)
+
+    def load_everything(*args):
+        raise AssertionError("--stream loaded the whole ZIP layer")
+
+    monkeypatch.setattr(geojson_remapper, 'load_zip_geojson', load_everything)
+    monkeypatch.setattr(sys, 'argv', ['geojson_remapper.py', '--stream'])
+    geojson_remapper.main()
+
+    features = json.loads((workdir / OUTPUT_GEOJSON).read_text())['features']
+    assert all('safetyLabel' in feature['properties'] for feature in features)
+    assert not (workdir / geojson_remapper.OUTPUT_TOPOJSON).exists()
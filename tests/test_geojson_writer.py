@@ -0,0 +1,109 @@
+import gzip
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import shape
+
+from geojson_writer import build_topology, write_geojson, write_topojson
+
+ZIP_GEOJSON = Path(__file__).resolve().parent.parent / 'public' / 'nyc-zip-code-tabulation-areas-polygons.geojson'
+
+
+@pytest.fixture(scope='module')
+def zip_features():
+    with open(ZIP_GEOJSON) as f:
+        return json.load(f)['features']
+
+
+def square(x, y, size=1.0, properties=None):
+    ring = [[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]
+    return {'type': 'Feature', 'properties': properties or {}, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+def decode_topology(topology):
+    """TopoJSON -> list of GeoJSON geometries (reference decoder, per the TopoJSON spec)"""
+    kx, ky = topology['transform']['scale']
+    x0, y0 = topology['transform']['translate']
+    arcs = [np.cumsum(np.asarray(arc, dtype=float), axis=0) * (kx, ky) + (x0, y0) for arc in topology['arcs']]
+
+    def ring(arc_ids):
+        points = []
+        for i, arc_id in enumerate(arc_ids):
+            arc = arcs[arc_id] if arc_id >= 0 else arcs[~arc_id][::-1]
+            points.extend(arc.tolist()[1 if i else 0:])
+        return points
+
+    geometries = []
+    for geometry in next(iter(topology['objects'].values()))['geometries']:
+        if geometry['type'] == 'Polygon':
+            coordinates = [ring(r) for r in geometry['arcs']]
+        else:
+            coordinates = [[ring(r) for r in polygon] for polygon in geometry['arcs']]
+        geometries.append({'type': geometry['type'], 'coordinates': coordinates})
+    return geometries
+
+
+def test_topology_round_trip_on_zip_polygons(zip_features):
+    features = zip_features[:60]
+    topology = build_topology(features)
+    kx, ky = topology['transform']['scale']
+    decoded = decode_topology(topology)
+    assert len(decoded) == len(features)
+
+    for feature, geometry in zip(features, decoded):
+        for ring in geometry['coordinates']:
+            assert ring[0] == ring[-1]  # closed
+            assert len(ring) >= 4
+        original, restored = shape(feature['geometry']), shape(geometry)
+        # Each vertex moves at most half a grid cell
+        tolerance = original.length * np.hypot(kx, ky) / 2
+        assert restored.area == pytest.approx(original.area, abs=tolerance)
+        assert restored.symmetric_difference(original).area <= tolerance
+    assert topology['objects']['zipcodes']['geometries'][0]['properties'] == features[0]['properties']
+
+
+def test_shared_borders_are_stored_once():
+    # Two unit squares sharing the x=1 edge
+    topology = build_topology([square(0, 0), square(1, 0)], quantization=3)
+    left, right = [g['arcs'][0] for g in topology['objects']['zipcodes']['geometries']]
+    shared = {a if a >= 0 else ~a for a in left} & {a if a >= 0 else ~a for a in right}
+    assert len(shared) == 1
+    # Used forwards by one square and backwards by the other
+    (arc,) = shared
+    assert (arc in left) != (arc in right)
+    assert (~arc in left) != (~arc in right)
+    decoded = decode_topology(topology)
+    assert [shapely.area(shape(g)) for g in decoded] == [pytest.approx(1.0), pytest.approx(1.0)]
+
+
+def test_geojson_gz_sibling_matches_plain_output(tmp_path, zip_features):
+    output = tmp_path / 'zips.geojson'
+    assert write_geojson({'features': zip_features[:20]}, output, compress=('gzip',)) == 20
+    assert gzip.decompress((tmp_path / 'zips.geojson.gz').read_bytes()) == output.read_bytes()
+
+    written = json.loads(output.read_text())['features']
+    assert [f['properties'] for f in written] == [f['properties'] for f in zip_features[:20]]
+    for feature, original in zip(written, zip_features):
+        ring = np.asarray(feature['geometry']['coordinates'][0])
+        assert np.all(np.round(ring, 5) == ring)
+        # Rounding moves each vertex at most half a unit in the last kept digit
+        tolerance = shape(original['geometry']).length * np.hypot(5e-6, 5e-6)
+        assert shape(feature['geometry']).symmetric_difference(shape(original['geometry'])).area <= tolerance
+
+
+def test_topojson_gz_sibling_matches_plain_output(tmp_path):
+    output = tmp_path / 'zips.topojson'
+    write_topojson({'features': [square(0, 0), square(1, 0)]}, output, compress=('gzip',))
+    assert gzip.decompress((tmp_path / 'zips.topojson.gz').read_bytes()) == output.read_bytes()
+    assert json.loads(output.read_text())['type'] == 'Topology'
+
+
+def test_brotli_sibling_matches_plain_output(tmp_path):
+    brotli = pytest.importorskip('brotli')
+    output = tmp_path / 'zips.geojson'
+    write_geojson({'features': [square(0, 0)]}, output, compress=('brotli',))
+    assert brotli.decompress((tmp_path / 'zips.geojson.br').read_bytes()) == output.read_bytes()
+    assert not (tmp_path / 'zips.geojson.gz').exists()
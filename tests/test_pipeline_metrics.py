@@ -0,0 +1,166 @@
+import json
+import re
+import threading
+import time
+import tracemalloc
+
+import pytest
+
+from pipeline_metrics import PROMETHEUS_PREFIX, PipelineMetrics
+
+# name{label="value",...} number
+SAMPLE = re.compile(r'^([a-z_]+)\{((?:[a-z]+="[^"]*",?)+)\} (-?[0-9.e+]+)$')
+
+
+def run(metrics):
+    with metrics.stage('download'):
+        metrics.count('bytesDownloaded', 1500)
+    with metrics.stage('parse'):
+        metrics.count('sheetsParsed', 3)
+    with metrics.stage('parse'):
+        metrics.count('sheetsParsed', 2)
+    return metrics
+
+
+def parse_prometheus(text):
+    """Exposition text -> ({metric: type}, [(metric, labels, value)])"""
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split()
+            types[name] = kind
+            continue
+        match = SAMPLE.match(line)
+        assert match, f"malformed sample line: {line!r}"
+        name, labels, value = match.groups()
+        assert name in types, f"{name} has no TYPE line before it"
+        samples.append((name, dict(re.findall(r'([a-z]+)="([^"]*)"', labels)), float(value)))
+    return types, samples
+
+
+def test_stages_accumulate_and_counters_add():
+    metrics = run(PipelineMetrics('refresh'))
+    assert metrics.stages['parse']['calls'] == 2 and metrics.stages['download']['calls'] == 1
+    assert all(entry['seconds'] >= 0 and entry['peakRssBytes'] > 0 for entry in metrics.stages.values())
+    assert metrics.counters == {'bytesDownloaded': 1500, 'sheetsParsed': 5}
+
+
+def test_json_output_appends_one_record_per_run(tmp_path):
+    json_file = tmp_path / 'metrics' / 'runs.jsonl'
+    first = run(PipelineMetrics('refresh', json_file=str(json_file))).flush()
+    run(PipelineMetrics('geojson', json_file=str(json_file))).flush()
+
+    records = [json.loads(line) for line in json_file.read_text().splitlines()]
+    assert [r['pipeline'] for r in records] == ['refresh', 'geojson']
+    assert records[0]['stages'] == first['stages']
+    assert records[0]['counters'] == {'bytesDownloaded': 1500, 'sheetsParsed': 5}
+    assert {'timestamp', 'durationSeconds', 'peakRssBytes', 'peakWorkerRssBytes'} <= set(records[0])
+
+
+def test_prometheus_output_is_valid_exposition_text(tmp_path):
+    prom_file = tmp_path / 'nyc_pipeline.prom'
+    metrics = run(PipelineMetrics('refresh', prometheus_file=str(prom_file)))
+    metrics.flush()
+    assert not list(tmp_path.glob('.tmp-*'))
+
+    types, samples = parse_prometheus(prom_file.read_text())
+    assert set(types.values()) == {'gauge'}
+    assert all(labels['pipeline'] == 'refresh' for _, labels, _ in samples)
+
+    stage_seconds = {labels['stage']: value for name, labels, value in samples
+                     if name == f'{PROMETHEUS_PREFIX}_stage_seconds'}
+    assert stage_seconds == pytest.approx({name: e['seconds'] for name, e in metrics.stages.items()}, abs=1e-6)
+    counters = {labels['counter']: value for name, labels, value in samples if name == f'{PROMETHEUS_PREFIX}_count'}
+    assert counters == {'bytesDownloaded': 1500, 'sheetsParsed': 5}
+    assert f'{PROMETHEUS_PREFIX}_duration_seconds' in {name for name, _, _ in samples}
+
+
+def test_from_env_selects_outputs_and_profiling(tmp_path, monkeypatch):
+    monkeypatch.setenv('PIPELINE_METRICS_JSON', str(tmp_path / 'runs.jsonl'))
+    monkeypatch.setenv('PIPELINE_PROFILE', 'parse')
+    monkeypatch.setenv('PIPELINE_TRACEMALLOC', 'all')
+    monkeypatch.setenv('PIPELINE_PROFILE_DIR', str(tmp_path / 'profiles'))
+
+    metrics = run(PipelineMetrics.from_env('refresh'))
+    metrics.flush()
+    assert (tmp_path / 'runs.jsonl').exists()
+    assert [p.name for p in (tmp_path / 'profiles').iterdir()] == ['refresh-parse.prof']
+    assert all('tracemallocPeakBytes' in entry for entry in metrics.stages.values())
+
+
+def test_overlapping_traced_stages_share_one_tracemalloc_session():
+    metrics = PipelineMetrics('refresh', trace={'all'})
+    entered, first_done = threading.Event(), threading.Event()
+    still_tracing = []
+
+    def second():
+        with metrics.stage('second'):
+            entered.set()
+            first_done.wait(5)
+            still_tracing.append(tracemalloc.is_tracing())
+
+    worker = threading.Thread(target=second)
+    with metrics.stage('first'):
+        worker.start()
+        entered.wait(5)
+    first_done.set()
+    worker.join()
+
+    assert still_tracing == [True]
+    assert not tracemalloc.is_tracing()
+    assert all(entry['tracemallocPeakBytes'] > 0 for entry in metrics.stages.values())
+
+
+def test_nested_stages_record_their_parent_and_self_time():
+    metrics = PipelineMetrics('geojson')
+    with metrics.stage('export'):
+        with metrics.stage('map'):
+            time.sleep(0.02)
+        with metrics.stage('write'):
+            with metrics.stage('compress'):
+                time.sleep(0.02)
+        time.sleep(0.01)
+
+    stages = metrics.stages
+    assert {name: entry['parent'] for name, entry in stages.items()} == {
+        'map': 'export', 'compress': 'write', 'write': 'export', 'export': None}
+    assert stages['export']['seconds'] >= stages['map']['seconds'] + stages['write']['seconds']
+    assert stages['write']['selfSeconds'] < 0.01
+    assert sum(entry['selfSeconds'] for entry in stages.values()) == pytest.approx(stages['export']['seconds'])
+
+    # Shares are of the top-level time: the outer stage is 100%, children are indented under it
+    lines = metrics.summary().splitlines()
+    assert [line.split()[0] for line in lines[:-1]] == ['export', 'map', 'write', 'compress']
+    assert lines[0].endswith('100.0%') and lines[3].startswith('      compress')
+
+    _, samples = parse_prometheus(metrics.prometheus_text())
+    self_seconds = {labels['stage']: value for name, labels, value in samples
+                    if name == f'{PROMETHEUS_PREFIX}_stage_self_seconds'}
+    assert sum(self_seconds.values()) == pytest.approx(stages['export']['seconds'], abs=1e-5)
+
+
+def test_one_stage_is_profiled_at_a_time(tmp_path):
+    metrics = PipelineMetrics('refresh', profile={'all'}, profile_dir=str(tmp_path))
+    entered, release = threading.Event(), threading.Event()
+
+    def parallel():
+        with metrics.stage('parallel'):
+            entered.set()
+            release.wait(5)
+
+    worker = threading.Thread(target=parallel)
+    worker.start()
+    entered.wait(5)
+    with metrics.stage('outer'):
+        with metrics.stage('inner'):
+            pass
+    release.set()
+    worker.join()
+
+    # The stage that got the profiler first is the only one dumped; the others still ran and were timed
+    assert [p.name for p in tmp_path.iterdir()] == ['refresh-parallel.prof']
+    assert sorted(metrics.stages) == ['inner', 'outer', 'parallel']
+
+    with metrics.stage('after'):
+        pass
+    assert (tmp_path / 'refresh-after.prof').exists()
@@ -0,0 +1,156 @@
+import functools
+import shutil
+from pathlib import Path
+
+import pytest
+
+import pipeline_runner
+from pipeline_metrics import PipelineMetrics
+from pipeline_runner import STAGES, PipelineRunner, Stage
+from dataset_spec import DatasetSpec
+from precinct_data_mapping import PRECINCT_DATA
+from precinct_neighborhood_mapper import NYPD_LAYOUT, NYPD_PRECINCTS, fetch_sheets, parse_sheets
+from spatial_join import PRECINCT_GEOJSON, ZIP_GEOJSON
+
+from .conftest import HELPER_DIR, sheet_path
+from .fixtures import make_sheet
+
+REPO_ROOT = HELPER_DIR.parent.parent
+
+
+# --- Synthetic stages ---
+
+class Recorder:
+    """Stages over small text files: a -> upper -> report, with b -> lower independent of a"""
+    def __init__(self, root):
+        self.root = Path(root)
+        self.calls = []
+        self.fail = set()
+
+    def path(self, name):
+        return str(self.root / name)
+
+    def transform(self, name, source, target, fn):
+        def run(metrics):
+            self.calls.append(name)
+            if name in self.fail:
+                raise RuntimeError(f"{name} broke")
+            Path(target).write_text(fn(Path(source).read_text()))
+        return run
+
+    def stages(self):
+        a, b, upper, lower, report = (self.path(n) for n in ('a.txt', 'b.txt', 'upper.txt', 'lower.txt', 'report.txt'))
+
+        def write_report(metrics):
+            self.calls.append('report')
+            Path(report).write_text(Path(upper).read_text() + Path(lower).read_text())
+
+        return [
+            Stage('upper', self.transform('upper', a, upper, str.upper), inputs=[a], outputs=[upper]),
+            Stage('lower', self.transform('lower', b, lower, str.lower), inputs=[b], outputs=[lower]),
+            Stage('report', write_report, inputs=[upper, lower], outputs=[report]),
+        ]
+
+    def runner(self, **kwargs):
+        return PipelineRunner(self.stages(), state_file=self.path('state.json'),
+                              metrics=PipelineMetrics('test'), **kwargs)
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = Recorder(tmp_path)
+    (tmp_path / 'a.txt').write_text('Alpha ')
+    (tmp_path / 'b.txt').write_text('Beta')
+    return recorder
+
+
+def test_second_run_is_all_cache_hits(recorder):
+    assert recorder.runner().run() == {'upper': 'ran', 'lower': 'ran', 'report': 'ran'}
+    assert Path(recorder.path('report.txt')).read_text() == 'ALPHA beta'
+    recorder.calls.clear()
+
+    assert recorder.runner().run() == {'upper': 'cached', 'lower': 'cached', 'report': 'cached'}
+    assert recorder.calls == []
+
+
+def test_changed_input_reruns_only_downstream_stages(recorder):
+    recorder.runner().run()
+    recorder.calls.clear()
+
+    Path(recorder.path('a.txt')).write_text('Gamma ')
+    assert recorder.runner().plan() == {'upper': 'stale', 'lower': 'up to date', 'report': 'after upper'}
+    assert recorder.runner().run() == {'upper': 'ran', 'lower': 'cached', 'report': 'ran'}
+    assert sorted(recorder.calls) == ['report', 'upper']
+    assert Path(recorder.path('report.txt')).read_text() == 'GAMMA beta'
+
+
+def test_unchanged_output_stops_the_rerun(recorder):
+    recorder.runner().run()
+    recorder.calls.clear()
+
+    # Different input, same upper-cased output: report stays cached
+    Path(recorder.path('a.txt')).write_text('ALPHA ')
+    assert recorder.runner().run() == {'upper': 'ran', 'lower': 'cached', 'report': 'cached'}
+
+
+def test_missing_output_and_force_rerun_a_stage(recorder):
+    recorder.runner().run()
+    recorder.calls.clear()
+
+    Path(recorder.path('lower.txt')).unlink()
+    assert recorder.runner().run()['lower'] == 'ran'
+    assert recorder.runner(force=['upper']).run()['upper'] == 'ran'
+
+
+def test_failed_stage_skips_its_dependents(recorder):
+    recorder.fail.add('upper')
+    assert recorder.runner().run() == {'upper': 'failed', 'lower': 'ran', 'report': 'skipped'}
+    recorder.fail.clear()
+    # The failure left no memo, so the next run retries it
+    assert recorder.runner().run() == {'upper': 'ran', 'lower': 'cached', 'report': 'ran'}
+
+
+def test_clashing_outputs_unknown_stages_and_cycles_are_rejected(recorder, tmp_path):
+    stages = recorder.stages()
+    with pytest.raises(ValueError, match='written by both'):
+        PipelineRunner(stages + [Stage('again', None, outputs=stages[0].outputs)], state_file=recorder.path('s'))
+    with pytest.raises(ValueError, match='Unknown stages'):
+        recorder.runner(force=['nope'])
+    x, y = str(tmp_path / 'x'), str(tmp_path / 'y')
+    with pytest.raises(ValueError, match='cycle'):
+        PipelineRunner([Stage('p', None, inputs=[x], outputs=[y]), Stage('q', None, inputs=[y], outputs=[x])],
+                       state_file=recorder.path('s'))
+
+
+# --- The real stages against the stand-in server ---
+
+@pytest.fixture
+def pipeline_workdir(workdir, sheet_server, monkeypatch):
+    for source in (ZIP_GEOJSON, PRECINCT_GEOJSON):
+        shutil.copy(REPO_ROOT / source, workdir / source)
+    spec = DatasetSpec(NYPD_PRECINCTS.name, sheet_server.url_template, PRECINCT_DATA, NYPD_LAYOUT,
+                       cache_file=NYPD_PRECINCTS.cache_file)
+    monkeypatch.setattr(pipeline_runner, 'fetch_sheets', functools.partial(fetch_sheets, [spec], rate=0))
+    monkeypatch.setattr(pipeline_runner, 'parse_sheets', functools.partial(parse_sheets, specs=[spec]))
+    return workdir
+
+
+def run_pipeline(**kwargs):
+    return PipelineRunner(STAGES, metrics=PipelineMetrics('test'), **kwargs).run()
+
+
+def test_pipeline_reruns_only_what_a_changed_sheet_affects(pipeline_workdir, sheet_server, rng):
+    assert set(run_pipeline().values()) == {'ran'}
+    assert set(run_pipeline().values()) == {'cached'}
+
+    # Within the week the download is memoized too; a forced one that only gets 304s changes nothing
+    sheet_server.requests.clear()
+    status = run_pipeline(force=['download'])
+    assert {s for _, _, s in sheet_server.requests} == {304}
+    assert status == {'download': 'ran', 'parse': 'cached', 'score': 'cached', 'history': 'cached',
+                      'join': 'cached', 'export': 'cached'}
+
+    sheet_server.sheets[sheet_path(1)] = make_sheet(rng)
+    status = run_pipeline(force=['download'])
+    assert status == {'download': 'ran', 'parse': 'ran', 'score': 'ran', 'history': 'ran',
+                      'join': 'cached', 'export': 'ran'}
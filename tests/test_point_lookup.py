@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+
+from point_lookup import LOOKUP_COLUMNS, MAX_PIECE_VERTICES, PointLookup, subdivide
+from precinct_data_mapping import PRECINCT_DATA
+from safety_scoring import get_safety_label, score_frame
+from spatial_join import PRECINCT_GEOJSON, ZIP_GEOJSON
+
+from .conftest import HELPER_DIR, SEED
+
+REPO_ROOT = HELPER_DIR.parent.parent
+NYC_BOUNDS = (-74.27, 40.48, -73.68, 40.93)
+
+
+@pytest.fixture(scope='module')
+def lookup():
+    return PointLookup(str(REPO_ROOT / PRECINCT_GEOJSON), str(REPO_ROOT / ZIP_GEOJSON))
+
+
+@pytest.fixture(scope='module')
+def crime_df():
+    rng = np.random.default_rng(SEED)
+    df = pd.DataFrame({
+        'precinct': [int(p['Precinct']) for p in PRECINCT_DATA],
+        'borough': [p['Borough'] for p in PRECINCT_DATA],
+        'neighborhoods': [p['Neighborhoods'] for p in PRECINCT_DATA],
+        'Murder': rng.integers(0, 5, len(PRECINCT_DATA)),
+        'Robbery': rng.integers(0, 40, len(PRECINCT_DATA)),
+    })
+    for crime in ('Rape', 'Felony Assault', 'Burglary', 'Grand Larceny', 'Grand Larceny Auto'):
+        df[crime] = rng.integers(0, 30, len(PRECINCT_DATA))
+    return score_frame(df)
+
+
+def brute_force(geometries, lon, lat):
+    """Lowest-row polygon covering each point (boundary included), by testing every polygon"""
+    points = shapely.points(lon, lat)
+    rows = np.full(len(points), -1, dtype=np.int64)
+    for row in range(len(geometries) - 1, -1, -1):
+        rows[shapely.intersects(geometries[row], points)] = row
+    return rows
+
+
+@pytest.fixture(scope='module')
+def points(lookup):
+    """Random points over NYC, polygon vertices (exactly on boundaries, many on shared edges), far-away and NaN points"""
+    rng = np.random.default_rng(SEED)
+    xmin, ymin, xmax, ymax = NYC_BOUNDS
+    lon, lat = rng.uniform(xmin, xmax, 3000), rng.uniform(ymin, ymax, 3000)
+
+    vertices = []
+    for layer in (lookup.precincts, lookup.zips):
+        coords = shapely.get_coordinates(shapely.boundary(layer.geometries))
+        vertices.append(coords[rng.choice(len(coords), 500, replace=False)])
+    vertices = np.vstack(vertices)
+
+    outside = np.array([[-73.5, 40.7], [-74.5, 40.7], [-74.0, 41.2], [-74.0, 40.3], [0.0, 0.0], [np.nan, 40.7],
+                        [-74.0, np.nan], [np.inf, 40.7]])
+    return np.concatenate([lon, vertices[:, 0], outside[:, 0]]), np.concatenate([lat, vertices[:, 1], outside[:, 1]])
+
+
+def test_subdivided_pieces_cover_their_polygons(lookup):
+    layer = lookup.precincts
+    assert shapely.get_num_coordinates(layer.pieces).max() <= MAX_PIECE_VERTICES
+    pieces_area = np.bincount(layer.parents, weights=shapely.area(layer.pieces), minlength=len(layer.geometries))
+    np.testing.assert_allclose(pieces_area, shapely.area(layer.geometries), rtol=1e-9)
+
+
+def test_subdivide_leaves_small_polygons_alone():
+    squares = np.array([shapely.box(0, 0, 1, 1), shapely.box(1, 0, 2, 1)])
+    pieces, parents = subdivide(squares)
+    assert parents.tolist() == [0, 1] and all(shapely.equals(pieces, squares))
+
+
+@pytest.mark.parametrize('layer_name', ['precincts', 'zips'])
+@pytest.mark.parametrize('chunk_size', [1 << 18, 97])
+def test_locate_matches_brute_force(lookup, points, layer_name, chunk_size):
+    layer = getattr(lookup, layer_name)
+    lon, lat = points
+    np.testing.assert_array_equal(layer.locate(lon, lat, chunk_size), brute_force(layer.geometries, lon, lat))
+
+
+def test_classify_matches_brute_force_and_the_crime_table(lookup, points, crime_df):
+    lon, lat = points
+    result = lookup.classify(lat, lon, crime_df)
+    assert list(result.columns) == LOOKUP_COLUMNS and len(result) == len(lon)
+
+    precinct_rows = brute_force(lookup.precincts.geometries, lon, lat)
+    zip_rows = brute_force(lookup.zips.geometries, lon, lat)
+    expected_precincts = np.where(precinct_rows >= 0, lookup.precincts.keys[precinct_rows], -1)
+    expected_zips = np.where(zip_rows >= 0, lookup.zips.keys[zip_rows], '')
+    np.testing.assert_array_equal(result['precinct'], expected_precincts)
+    np.testing.assert_array_equal(result['zip'], expected_zips)
+
+    by_precinct = crime_df.set_index('precinct')
+    for row in result.itertuples():
+        if row.precinct in by_precinct.index:
+            record = by_precinct.loc[row.precinct]
+            assert (row.borough, row.safetyScore, row.safetyRank) == (record['borough'], record['safetyScore'],
+                                                                       record['safetyRank'])
+            assert row.safetyLabel == get_safety_label(record['safetyScore'])
+        else:
+            assert (row.borough, row.safetyRank, row.safetyLabel) == ('', -1, '') and np.isnan(row.safetyScore)
+    # The random sample lands in most precincts, and the outside points in none
+    assert (expected_precincts >= 0).sum() > 1000 and (expected_precincts[-8:] == -1).all()
+
+
+def test_lookup_single_points(lookup, crime_df):
+    # Times Square (Midtown North, 18th precinct)
+    inside = lookup.lookup(40.758, -73.9855, crime_df)
+    row = lookup.classify([40.758], [-73.9855], crime_df).iloc[0]
+    assert inside['precinct'] == row['precinct'] == 18
+    assert inside['zip'] == row['zip'] and inside['safetyLabel'] == row['safetyLabel']
+    assert (inside['lat'], inside['lon']) == (40.758, -73.9855)
+
+    for lat, lon in [(40.7, -73.5), (np.nan, -74.0)]:  # Atlantic Ocean, missing coordinates
+        outside = lookup.lookup(lat, lon, crime_df)
+        assert all(outside[k] is None for k in LOOKUP_COLUMNS)
@@ -0,0 +1,94 @@
+import time
+import threading
+
+import precinct_downloader
+from precinct_downloader import TokenBucket, create_session, fetch_with_retry, iter_fetch
+
+from .conftest import sheet_path
+
+
+def test_token_bucket_allows_a_burst_then_holds_the_rate():
+    bucket = TokenBucket(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+
+    for _ in range(10):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.9 * 10 / 50
+
+
+def test_token_bucket_rate_is_shared_across_threads():
+    bucket = TokenBucket(rate=100, capacity=1)
+    start = time.monotonic()
+    threads = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # 20 tokens with a burst of one: at least 19 refills at 100/s
+    assert time.monotonic() - start >= 0.9 * 19 / 100
+
+
+def test_token_bucket_zero_rate_disables_limiting():
+    bucket = TokenBucket(rate=0)
+    start = time.monotonic()
+    for _ in range(1000):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+
+def test_retry_recovers_from_transient_errors(sheet_server):
+    path = sheet_path(1)
+    sheet_server.failures[path] = 2
+    with create_session() as session:
+        response, error = fetch_with_retry(session, sheet_server.url(1), TokenBucket(0), retries=3, backoff=0.01)
+    assert error is None
+    assert response.status_code == 200
+    assert response.content == sheet_server.sheets[path]
+    assert [(p, status) for p, _, status in sheet_server.requests] == [(path, 503), (path, 503), (path, 200)]
+
+
+def test_retry_gives_up_after_the_last_attempt(sheet_server):
+    sheet_server.failures[sheet_path(1)] = 5
+    with create_session() as session:
+        response, error = fetch_with_retry(session, sheet_server.url(1), TokenBucket(0), retries=2, backoff=0.01)
+    assert response is None
+    assert error == 'HTTP 503'
+    assert len(sheet_server.requests) == 3
+
+
+def test_retry_backoff_doubles(sheet_server, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(precinct_downloader.time, 'sleep', sleeps.append)
+    sheet_server.failures[sheet_path(1)] = 10
+    with create_session() as session:
+        fetch_with_retry(session, sheet_server.url(1), TokenBucket(0), retries=3, backoff=0.5)
+    assert sleeps == [0.5, 1.0, 2.0]
+
+
+def test_client_errors_are_not_retried(sheet_server):
+    with create_session() as session:
+        response, error = fetch_with_retry(session, sheet_server.url(999), TokenBucket(0), retries=3, backoff=0.01)
+    assert error is None
+    assert response.status_code == 404
+    assert len(sheet_server.requests) == 1
+
+
+def test_iter_fetch_yields_every_url_once(sheet_server):
+    urls = {p: sheet_server.url(p) for p in (1, 5, 6, 7, 999)}
+    results = {key: (response, error) for key, response, error in iter_fetch(urls, max_workers=4, rate=0)}
+    assert set(results) == set(urls)
+    assert {key: response.status_code for key, (response, _) in results.items()} == \
+        {1: 200, 5: 200, 6: 200, 7: 200, 999: 404}
+
+
+def test_iter_fetch_sends_conditional_headers(sheet_server):
+    url = sheet_server.url(1)
+    _, first, _ = next(iter_fetch({1: url}, rate=0))
+    etag = first.headers['ETag']
+
+    _, second, _ = next(iter_fetch({1: url}, rate=0, headers={1: {'If-None-Match': etag}}))
+    assert second.status_code == 304
+    assert sheet_server.requests[-1] == (sheet_path(1), etag, 304)
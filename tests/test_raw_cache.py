@@ -0,0 +1,68 @@
+from datetime import date
+
+import raw_cache
+from raw_cache import blob_path, evict, load, load_index, lookup, stats, store
+
+URL_A = 'https://example.test/a.xlsx'
+URL_B = 'https://example.test/b.xlsx'
+
+
+def test_identical_content_is_stored_once(tmp_path):
+    digest = store(URL_A, b'week one', date(2025, 1, 6), tmp_path)
+    assert store(URL_A, b'week one', date(2025, 1, 13), tmp_path) == digest
+    assert store(URL_B, b'week one', date(2025, 1, 13), tmp_path) == digest
+
+    summary = stats(tmp_path)
+    assert (summary['urls'], summary['fetches'], summary['blobs']) == (2, 3, 1)
+    assert summary['bytes'] == len(b'week one') and summary['logicalBytes'] == 3 * len(b'week one')
+
+
+def test_lookup_by_date_and_same_day_replacement(tmp_path):
+    store(URL_A, b'monday', date(2025, 1, 6), tmp_path)
+    store(URL_A, b'next monday', date(2025, 1, 13), tmp_path)
+    store(URL_A, b'next monday, again', date(2025, 1, 13), tmp_path)
+
+    assert [e['date'] for e in load_index(tmp_path)[URL_A]] == ['2025-01-06', '2025-01-13']
+    assert load(URL_A, cache_dir=tmp_path) == b'next monday, again'
+    assert load(URL_A, date(2025, 1, 10), tmp_path) == b'monday'
+    assert lookup(URL_A, date(2025, 1, 1), tmp_path) is None
+    assert load(URL_B, cache_dir=tmp_path) is None
+
+
+def test_corrupt_blob_is_ignored(tmp_path):
+    digest = store(URL_A, b'original', date(2025, 1, 6), tmp_path)
+    blob_path(digest, tmp_path).write_bytes(b'tampered')
+    assert load(URL_A, cache_dir=tmp_path) is None
+
+
+def test_batched_stores_share_one_index(tmp_path):
+    index = load_index(tmp_path)
+    store(URL_A, b'a', date(2025, 1, 6), tmp_path, index)
+    store(URL_B, b'b', date(2025, 1, 6), tmp_path, index)
+    assert load_index(tmp_path) == {}
+    raw_cache.save_index(index, tmp_path)
+    assert load(URL_B, cache_dir=tmp_path, index=load_index(tmp_path)) == b'b'
+
+
+def test_evict_keeps_the_latest_fetch_of_every_url(tmp_path):
+    for week, day in enumerate([6, 13, 20]):
+        store(URL_A, f'a week {week}'.encode() * 10, date(2025, 1, day), tmp_path)
+    store(URL_B, b'a week 0' * 10, date(2025, 1, 6), tmp_path)  # shares A's first blob
+    orphan = blob_path(raw_cache.content_hash(b'orphan'), tmp_path)
+    raw_cache.write_atomic(orphan, b'orphan')
+
+    freed = evict(max_bytes=0, cache_dir=tmp_path)
+    index = load_index(tmp_path)
+    assert not orphan.exists()
+    assert [e['date'] for e in index[URL_A]] == ['2025-01-20']
+    assert [e['date'] for e in index[URL_B]] == ['2025-01-06']
+    # Week 0's blob is still B's latest fetch, so only week 1's blob (and the orphan) go
+    assert load(URL_B, cache_dir=tmp_path) == b'a week 0' * 10
+    assert freed == len(b'orphan') + len(b'a week 1' * 10)
+
+
+def test_evict_under_the_limit_only_drops_orphans(tmp_path):
+    store(URL_A, b'old', date(2025, 1, 6), tmp_path)
+    store(URL_A, b'new', date(2025, 1, 13), tmp_path)
+    assert evict(max_bytes=1 << 20, cache_dir=tmp_path) == 0
+    assert len(load_index(tmp_path)[URL_A]) == 2
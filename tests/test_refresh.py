@@ -0,0 +1,152 @@
+from pathlib import Path
+
+import pandas as pd
+
+from crime_cache import save_cache
+from precinct_data_mapping import PRECINCT_DATA
+from precinct_neighborhood_mapper import CACHE_FILE, LEGACY_MANIFEST_FILE, MANIFEST_FILE, consolidate_all_data, \
+    extract_crime_stats, load_cached_data, parse_precinct_xlsx
+
+from .fixtures import make_sheet
+
+from .conftest import sheet_path
+
+PRECINCTS = len(PRECINCT_DATA)
+
+
+def refresh(server, **kwargs):
+    """One forced consolidate_all_data run against the stand-in server, unthrottled"""
+    return consolidate_all_data(force_refresh=True, rate=0, url_template=server.url_template, **kwargs)
+
+
+def expected_rows(sheets):
+    """Stats each precinct's row should carry, straight from the served sheets"""
+    rows = {}
+    for data in PRECINCT_DATA:
+        stats = extract_crime_stats(parse_precinct_xlsx(sheets[sheet_path(data['Precinct'])]))
+        rows[int(data['Precinct'])] = (stats['weekToDate'], stats['monthToDate'], stats['yearToDate'],
+                                       stats['crimeBreakdown'])
+    return rows
+
+
+def actual_rows(df):
+    return {int(row['precinct']): (row['crimeCount'], row['monthToDate'], row['yearToDate'], row['crimeBreakdown'])
+            for row in df.to_dict('records')}
+
+
+def statuses(server):
+    """Response status per requested path"""
+    return {path: status for path, _, status in server.requests}
+
+
+def test_full_refresh_fetches_every_sheet_from_the_server(workdir, sheet_server):
+    df = refresh(sheet_server)
+    assert len(df) == PRECINCTS
+    assert sorted(path for path, _, _ in sheet_server.requests) == sorted(sheet_server.sheets)
+    assert all(if_none_match is None for _, if_none_match, _ in sheet_server.requests)
+    assert actual_rows(df) == expected_rows(sheet_server.sheets)
+
+
+def test_refresh_skips_missing_sheets(workdir, sheet_server):
+    del sheet_server.sheets[sheet_path(1)]
+    df = refresh(sheet_server)
+    assert len(df) == PRECINCTS - 1
+    assert 1 not in set(df['precinct'])
+
+
+def test_unchanged_sheets_come_back_304_and_are_reused(workdir, sheet_server):
+    first = refresh(sheet_server)
+    before = Path(CACHE_FILE).read_bytes()
+    sheet_server.requests.clear()
+
+    second = refresh(sheet_server)
+    assert all(if_none_match is not None for _, if_none_match, _ in sheet_server.requests)
+    assert set(statuses(sheet_server).values()) == {304}
+    assert actual_rows(second) == actual_rows(first)
+    assert Path(CACHE_FILE).read_bytes() == before
+
+
+def test_manifest_is_kept_out_of_public_and_an_old_one_is_picked_up(workdir, sheet_server):
+    refresh(sheet_server)
+    assert Path(MANIFEST_FILE).exists() and not Path(LEGACY_MANIFEST_FILE).exists()
+
+    # A manifest left in public/ by an older run still makes the next refresh conditional
+    Path(MANIFEST_FILE).replace(LEGACY_MANIFEST_FILE)
+    sheet_server.requests.clear()
+    refresh(sheet_server)
+    assert set(statuses(sheet_server).values()) == {304}
+    assert Path(MANIFEST_FILE).exists() and not Path(LEGACY_MANIFEST_FILE).exists()
+
+
+def test_only_changed_sheets_are_downloaded_again(workdir, sheet_server, rng):
+    refresh(sheet_server)
+    sheet_server.sheets[sheet_path(1)] = make_sheet(rng)
+    sheet_server.requests.clear()
+
+    df = refresh(sheet_server)
+    codes = statuses(sheet_server)
+    assert codes.pop(sheet_path(1)) == 200
+    assert set(codes.values()) == {304}
+    assert actual_rows(df) == expected_rows(sheet_server.sheets)
+
+
+def test_failed_download_keeps_the_cached_row(workdir, sheet_server):
+    first = refresh(sheet_server)
+    del sheet_server.sheets[sheet_path(1)]
+    sheet_server.requests.clear()
+
+    second = refresh(sheet_server)
+    assert statuses(sheet_server)[sheet_path(1)] == 404
+    assert len(second) == PRECINCTS
+    assert actual_rows(second) == actual_rows(first)
+
+
+def test_cached_rows_are_matched_to_precincts_whatever_their_order(workdir, sheet_server):
+    first = refresh(sheet_server)
+    # A cache written in another order, with a precinct the table no longer knows
+    cached = load_cached_data().iloc[::-1]
+    stray = cached.iloc[[0]].assign(precinct=999)
+    save_cache(pd.concat([stray, cached], ignore_index=True), CACHE_FILE)
+    del sheet_server.sheets[sheet_path(1)]
+
+    second = refresh(sheet_server)
+    assert second['precinct'].tolist() == [int(data['Precinct']) for data in PRECINCT_DATA]
+    assert actual_rows(second) == actual_rows(first)
+
+
+def test_unparseable_sheet_keeps_the_cached_row_and_is_fetched_again(workdir, sheet_server, rng):
+    first = refresh(sheet_server)
+    sheet_server.sheets[sheet_path(1)] = b'not a workbook'
+    second = refresh(sheet_server)
+    assert actual_rows(second) == actual_rows(first)
+
+    # The manifest no longer vouches for the cached row, so the next refresh asks unconditionally
+    sheet_server.sheets[sheet_path(1)] = make_sheet(rng)
+    sheet_server.requests.clear()
+    third = refresh(sheet_server)
+    assert [(inm, status) for path, inm, status in sheet_server.requests if path == sheet_path(1)] == [(None, 200)]
+    assert actual_rows(third) == expected_rows(sheet_server.sheets)
+
+
+def test_offline_replay_rebuilds_the_cache_without_the_network(workdir, sheet_server):
+    refresh(sheet_server)
+    before = Path(CACHE_FILE).read_bytes()
+    served = dict(sheet_server.sheets)
+    Path(CACHE_FILE).unlink()
+    sheet_server.sheets.clear()
+    sheet_server.requests.clear()
+
+    df = consolidate_all_data(offline=True, url_template=sheet_server.url_template)
+    assert sheet_server.requests == []
+    assert actual_rows(df) == expected_rows(served)
+    assert Path(CACHE_FILE).read_bytes() == before
+
+
+def test_empty_replay_leaves_the_cache_alone(workdir, sheet_server):
+    refresh(sheet_server)
+    before = Path(CACHE_FILE).read_bytes()
+
+    # Nothing was ever cached for this URL template
+    df = consolidate_all_data(offline=True, url_template='http://127.0.0.1:9/nothing-{precinct}.xlsx')
+    assert df.empty
+    assert Path(CACHE_FILE).read_bytes() == before
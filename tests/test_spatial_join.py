@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pytest
+
+import spatial_join
+from spatial_join import WEIGHTS_CACHE, load_zip_precinct_weights, zip_shares
+
+
+def square(x0, y0, x1, y1):
+    return {'type': 'Polygon', 'coordinates': [[[x0, y0], [x1, y0], [x1, y1], [x0, y1], [x0, y0]]]}
+
+
+def write_layer(path, geometries, properties):
+    features = [{'type': 'Feature', 'properties': props, 'geometry': geometry}
+                for geometry, props in zip(geometries, properties)]
+    path.write_text(json.dumps({'type': 'FeatureCollection', 'features': features}))
+    return str(path)
+
+
+@pytest.fixture
+def layers(workdir):
+    # Two ZIPs side by side; precinct 1 covers the left ZIP and a quarter of the right one
+    zips = write_layer(workdir / 'zips.geojson', [square(0, 0, 2, 2), square(2, 0, 4, 2)],
+                       [{'postalCode': '10001'}, {'postalCode': '10002'}])
+    precincts = write_layer(workdir / 'precincts.geojson', [square(0, 0, 2.5, 2), square(2.5, 0, 4, 2)],
+                            [{'precinct': '1'}, {'precinct': '2.0'}])
+    return zips, precincts
+
+
+def test_weights_are_cached_outside_public_and_reused(layers, workdir, monkeypatch):
+    weights = load_zip_precinct_weights(*layers)
+    assert (workdir / WEIGHTS_CACHE).exists()
+    assert not list((workdir / 'public').iterdir())
+    assert weights['precincts'].tolist() == [1, 2]
+
+    def rebuild(*args):
+        raise AssertionError("weights rebuilt although neither layer changed")
+
+    monkeypatch.setattr(spatial_join, 'build_weights', rebuild)
+    cached = load_zip_precinct_weights(*layers)
+    assert set(cached) == set(weights)
+    for key in weights:
+        np.testing.assert_array_equal(cached[key], weights[key])
+
+
+def test_a_changed_layer_rebuilds_the_weights(layers, workdir):
+    zips, precincts = layers
+    load_zip_precinct_weights(zips, precincts)
+    write_layer(workdir / 'precincts.geojson', [square(0, 0, 4, 2)], [{'precinct': '7'}])
+    assert load_zip_precinct_weights(zips, precincts)['precincts'].tolist() == [7]
+
+
+def test_zip_shares_split_each_zip_by_overlap(layers):
+    rows, precinct_ids, shares = zip_shares(load_zip_precinct_weights(*layers))
+    assert sorted(zip(rows.tolist(), precinct_ids.tolist(), shares.round(6).tolist())) == [
+        (0, 1, 1.0), (1, 1, 0.25), (1, 2, 0.75)]
+
+    # Renormalized over the precincts with data
+    rows, precinct_ids, shares = zip_shares(load_zip_precinct_weights(*layers), available_precincts=[2])
+    assert list(zip(rows.tolist(), precinct_ids.tolist(), shares.tolist())) == [(1, 2, 1.0)]
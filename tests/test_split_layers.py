@@ -0,0 +1,110 @@
+import copy
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from crime_cache import BREAKDOWN_COLUMNS
+from precinct_data_mapping import PRECINCT_DATA
+from geojson_remapper import ATTRIBUTE_FIELDS, ZIP_GEOJSON, map_crime_to_zipcodes
+from geojson_writer import write_geojson, write_split_layers
+
+from .conftest import HELPER_DIR, SEED
+
+REPO_ROOT = HELPER_DIR.parent.parent
+
+
+@pytest.fixture(scope='module')
+def enriched():
+    """The repo's ZIP polygons enriched from a random precinct table (ZIP lookup, no spatial weights)"""
+    rng = np.random.default_rng(SEED)
+    crime_df = pd.DataFrame({
+        'precinct': [int(p['Precinct']) for p in PRECINCT_DATA],
+        'neighborhoods': [p['Neighborhoods'] for p in PRECINCT_DATA],
+        'weightedCrimeVal': rng.uniform(0, 500, len(PRECINCT_DATA)),
+        'safetyScore': rng.uniform(0, 1, len(PRECINCT_DATA)),
+        'crimeCount': rng.integers(0, 100, len(PRECINCT_DATA)),
+        'monthToDate': rng.integers(0, 400, len(PRECINCT_DATA)),
+        'yearToDate': rng.integers(0, 5000, len(PRECINCT_DATA)),
+    })
+    crime_df['crimeBreakdown'] = [dict(zip(BREAKDOWN_COLUMNS, map(int, rng.integers(0, 50, len(BREAKDOWN_COLUMNS)))))
+                                  for _ in range(len(crime_df))]
+    with open(REPO_ROOT / ZIP_GEOJSON) as f:
+        geojson = map_crime_to_zipcodes(crime_df, json.load(f))
+    # A few area-weighted ZIPs, as the spatial join would produce
+    for feature in geojson['features'][:3]:
+        feature['properties']['precinctShares'] = {'1': 0.75, '5': 0.25}
+    return geojson
+
+
+def apply_attributes(geometry, attributes):
+    """Python mirror of applyAttributes in src/script.js"""
+    by_id = {f['id']: f for f in geometry['features']}
+    columns, breakdown_fields = attributes['columns'], attributes['breakdownFields']
+    shares = attributes.get('precinctShares', {})
+    for i, feature_id in enumerate(attributes['ids']):
+        props = by_id[feature_id]['properties']
+        for field, values in columns.items():
+            if field not in breakdown_fields and values[i] is not None:
+                props[field] = values[i]
+        has_breakdown = breakdown_fields and columns[breakdown_fields[0]][i] is not None
+        props['crimeBreakdown'] = {crime: columns[crime][i] for crime in breakdown_fields} if has_breakdown else {}
+        if str(feature_id) in shares:
+            props['precinctShares'] = shares[str(feature_id)]
+    return geometry
+
+
+def rounded(props):
+    """The attribute table keeps four decimals of each float"""
+    return {k: round(v, 4) if isinstance(v, float) else v for k, v in props.items()}
+
+
+def test_split_layers_join_back_to_the_combined_geojson(tmp_path, enriched):
+    write_geojson(enriched, tmp_path / 'combined.geojson', compress=())
+    manifest = write_split_layers(enriched, tmp_path, 'zip', ATTRIBUTE_FIELDS, BREAKDOWN_COLUMNS, compress=())
+
+    geometry = json.loads((tmp_path / manifest['geometry']).read_text())
+    attributes_file, version = manifest['attributes'].split('?v=')
+    attributes = json.loads((tmp_path / attributes_file).read_text())
+    assert version and not any(field in f['properties'] for f in geometry['features']
+                               for field in ATTRIBUTE_FIELDS)
+
+    joined = apply_attributes(geometry, attributes)['features']
+    combined = json.loads((tmp_path / 'combined.geojson').read_text())['features']
+    assert len(joined) == len(combined)
+    for feature, expected in zip(joined, combined):
+        assert feature['geometry'] == expected['geometry']
+        assert rounded(feature['properties']) == rounded(expected['properties'])
+
+
+def test_unchanged_geometry_keeps_its_hashed_file(tmp_path, enriched):
+    first = write_split_layers(enriched, tmp_path, 'zip', ATTRIBUTE_FIELDS, BREAKDOWN_COLUMNS)
+    geometry_file = tmp_path / first['geometry']
+    mtime = geometry_file.stat().st_mtime_ns
+
+    changed = copy.deepcopy(enriched)
+    changed['features'][0]['properties']['crimeCount'] += 1
+    second = write_split_layers(changed, tmp_path, 'zip', ATTRIBUTE_FIELDS, BREAKDOWN_COLUMNS)
+    assert second['geometry'] == first['geometry']
+    assert geometry_file.stat().st_mtime_ns == mtime
+    assert second['attributes'] != first['attributes']
+    assert json.loads((tmp_path / 'zip_layers.json').read_text()) == second
+    assert not list(tmp_path.glob('.tmp-*'))
+
+
+def test_changed_geometry_deletes_old_hashed_versions(tmp_path, enriched):
+    first = write_split_layers(enriched, tmp_path, 'zip', ATTRIBUTE_FIELDS, BREAKDOWN_COLUMNS)
+    assert (tmp_path / f"{first['geometry']}.gz").exists()
+
+    changed = copy.deepcopy(enriched)
+    ring = changed['features'][0]['geometry']['coordinates'][0]
+    ring[0][0] += 0.001
+    ring[-1][0] += 0.001
+    second = write_split_layers(changed, tmp_path, 'zip', ATTRIBUTE_FIELDS, BREAKDOWN_COLUMNS)
+
+    assert second['geometry'] != first['geometry']
+    remaining = {p.name for p in tmp_path.glob('zip_geometry.*')}
+    assert {second['geometry'], f"{second['geometry']}.gz"} <= remaining
+    # Neither the old geometry nor its compressed siblings survive
+    assert all(name.startswith(second['geometry']) for name in remaining)
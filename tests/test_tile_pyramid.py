@@ -0,0 +1,184 @@
+import json
+import struct
+
+import numpy as np
+import pytest
+import shapely
+from shapely.geometry import Polygon, box
+
+from tile_pyramid import (EXTENT, build_tile_pyramid, encode_layer, lonlat_to_mercator, ring_area,
+                          tile_bounds, varint, zigzag)
+
+
+# --- Reference MVT decoder (vector-tile-spec 2.1) ---
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+
+def read_fields(data):
+    """Protobuf message -> list of (field, value); length-delimited values stay bytes"""
+    fields, pos = [], 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = data[pos:pos + 8], pos + 8
+        elif wire_type == 2:
+            length, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + length], pos + length
+        else:
+            raise ValueError(f"unexpected wire type {wire_type}")
+        fields.append((field, value))
+    return fields
+
+
+def read_packed(data):
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def decode_value(data):
+    (field, value), = read_fields(data)
+    if field == 1:
+        return value.decode('utf-8')
+    if field == 3:
+        return struct.unpack('<d', value)[0]
+    if field == 6:
+        return unzigzag(value)
+    if field == 7:
+        return bool(value)
+    raise ValueError(f"unexpected value field {field}")
+
+
+def decode_geometry(commands):
+    """Command stream -> list of closed rings in tile coordinates"""
+    rings, ring, cursor, i = [], [], (0, 0), 0
+    while i < len(commands):
+        command_id, count = commands[i] & 0x7, commands[i] >> 3
+        i += 1
+        if command_id == 7:
+            rings.append(ring + [ring[0]])
+            ring = []
+            continue
+        assert command_id in (1, 2)
+        for _ in range(count):
+            cursor = (cursor[0] + unzigzag(commands[i]), cursor[1] + unzigzag(commands[i + 1]))
+            i += 2
+            ring.append(cursor)
+    assert not ring, "ring without ClosePath"
+    return rings
+
+
+def decode_tile(data):
+    """Tile bytes -> {layer name: (extent, [(id, geom type, rings, properties)])}"""
+    layers = {}
+    for field, layer_bytes in read_fields(data):
+        assert field == 3
+        layer = read_fields(layer_bytes)
+        keys = [v.decode('utf-8') for f, v in layer if f == 3]
+        values = [decode_value(v) for f, v in layer if f == 4]
+        features = []
+        for f, feature_bytes in layer:
+            if f != 2:
+                continue
+            feature = dict(read_fields(feature_bytes))
+            tags = read_packed(feature[2])
+            properties = {keys[tags[j]]: values[tags[j + 1]] for j in range(0, len(tags), 2)}
+            features.append((feature[1], feature[3], decode_geometry(read_packed(feature[4])), properties))
+        layer = dict(layer)
+        assert layer[15] == 2
+        layers[layer[1].decode('utf-8')] = (layer[5], features)
+    return layers
+
+
+# --- Encoding primitives ---
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 2 ** 32 + 5])
+def test_varint_round_trip(value):
+    assert read_varint(varint(value), 0) == (value, len(varint(value)))
+
+
+@pytest.mark.parametrize('value, encoded', [(0, 0), (-1, 1), (1, 2), (-2, 3), (2, 4), (-4096, 8191)])
+def test_zigzag_matches_the_spec(value, encoded):
+    assert zigzag(value) == encoded
+    assert unzigzag(encoded) == value
+
+
+def test_encode_layer_decodes_to_the_input_rings_and_properties():
+    # Tile bounds equal to the extent, so a Mercator unit is one tile unit (y flipped)
+    bounds = (0, 0, EXTENT, EXTENT)
+    shell = [(100, 100), (1100, 100), (1100, 900), (100, 900)]
+    hole = [(300, 300), (300, 500), (500, 500), (500, 300)]
+    other = box(2000, 2000, 2600, 2300)
+    properties = [
+        {'postalCode': '10001', 'precinct': 13, 'delta': -7, 'safetyScore': 0.625, 'open': True},
+        {'postalCode': '10002', 'precinct': 13, 'delta': 3, 'safetyScore': 0.25, 'open': False},
+    ]
+    data = encode_layer('zipcodes', [(4, (Polygon(shell, [hole]), properties[0])), (9, (other, properties[1]))],
+                        bounds)
+
+    (extent, features), = [decode_tile(data)['zipcodes']]
+    assert extent == EXTENT
+    assert [(fid, geom_type) for fid, geom_type, _, _ in features] == [(4, 3), (9, 3)]
+    # Tag indices resolve back to the original properties; shared keys / values are stored once
+    assert [props for _, _, _, props in features] == properties
+    layer = read_fields(read_fields(data)[0][1])
+    assert len([v for f, v in layer if f == 3]) == 5
+    assert len([v for f, v in layer if f == 4]) == 9  # precinct 13 is shared
+
+    (exterior, interior), = [features[0][2]]
+    to_tile = lambda ring: {(x, EXTENT - y) for x, y in ring}
+    assert set(exterior) == to_tile(shell) and set(interior) == to_tile(hole)
+    # Winding: exterior positive, hole negative in tile space (y down)
+    assert ring_area(np.array(exterior[:-1])) > 0 > ring_area(np.array(interior[:-1]))
+    decoded = Polygon(exterior, [interior])
+    assert decoded.area == Polygon(shell, [hole]).area
+
+
+def test_pyramid_tiles_decode_to_the_source_polygons(tmp_path):
+    # Two adjacent blocks in lower Manhattan
+    features = [
+        {'type': 'Feature', 'properties': {'postalCode': '10004', 'crimeBreakdown': {'Murder': 1, 'Robbery': 4}},
+         'geometry': box(-74.02, 40.70, -74.01, 40.71).__geo_interface__},
+        {'type': 'Feature', 'properties': {'postalCode': '10005', 'crimeBreakdown': {'Murder': 0, 'Robbery': 2}},
+         'geometry': box(-74.01, 40.70, -74.00, 40.71).__geo_interface__},
+    ]
+    total = build_tile_pyramid({'zipcodes': features}, tmp_path / 'tiles', min_zoom=12, max_zoom=12, workers=1)
+    assert total == len(list((tmp_path / 'tiles').rglob('*.pbf'))) > 0
+    metadata = json.loads((tmp_path / 'tiles' / 'metadata.json').read_text())
+    assert metadata['vector_layers'][0]['fields'] == {'postalCode': 'String', 'Murder': 'Number', 'Robbery': 'Number'}
+
+    # Reassemble each feature from every tile it appears in and compare with the projected source
+    pieces = {0: [], 1: []}
+    for path in (tmp_path / 'tiles' / '12').rglob('*.pbf'):
+        x, y = int(path.parent.name), int(path.stem)
+        minx, miny, maxx, maxy = tile_bounds(12, x, y)
+        scale = (maxx - minx) / EXTENT
+        for fid, _, rings, props in decode_tile(path.read_bytes())['zipcodes'][1]:
+            assert props == {'postalCode': features[fid]['properties']['postalCode'],
+                             **features[fid]['properties']['crimeBreakdown']}
+            coords = [(minx + px * scale, maxy - py * scale) for px, py in rings[0]]
+            pieces[fid].append(shapely.clip_by_rect(Polygon(coords), minx, miny, maxx, maxy))
+
+    for fid, feature in enumerate(features):
+        source = shapely.transform(shapely.geometry.shape(feature['geometry']), lonlat_to_mercator)
+        merged = shapely.union_all(pieces[fid])
+        # Within a couple of tile units of the source outline
+        assert merged.symmetric_difference(source).area <= source.length * 2 * scale